@@ -10,6 +10,7 @@ from .flight_views import flight_views
 from .airports import airports
 from .details import details  
 from .auth import auth
+from .exports import exports
 
 def register_blueprints(app):
     app.register_blueprint(flights, url_prefix='/api')
@@ -21,4 +22,5 @@ def register_blueprints(app):
     app.register_blueprint(airports, url_prefix='/api')
     app.register_blueprint(details, url_prefix='/api')
     app.register_blueprint(auth, url_prefix='/api')
+    app.register_blueprint(exports, url_prefix='/api')
 
@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, request
 from models import db, Airport, Flight, AircraftType
-from services import calculate_distance, seat_plan_auto
+from services import calculate_distance, seat_plan_auto, response_cache, conditional_get
 from datetime import datetime, timedelta
 from sqlalchemy import cast, String 
 import pycountry
@@ -10,6 +10,8 @@ airports = Blueprint('airports', __name__)
 
 @airports.route('/airport_codes', methods=['GET'])
 @jwt_required()
+@conditional_get(tables=('airport',))
+@response_cache.cached(tables=('airport',))
 def get_airports():
   airports = Airport.query.all()
   airports_data = [  
@@ -23,6 +25,8 @@ import pycountry
 
 @airports.route('/airports', methods=['GET'])
 @jwt_required()
+@conditional_get(tables=('airport',))
+@response_cache.cached(tables=('airport',))
 def get_airport_details():
     airports = Airport.query.all()
     
@@ -1,26 +1,22 @@
 from flask import Blueprint, request, jsonify
 from models import CabinCrew, db
+from services import count_rows, filter_key, parse_count_mode, total_fields, column_field, select_fields, load_fields, serialize
 import random
 from flask_jwt_extended import jwt_required
 
 cabin_crew = Blueprint('cabin_crew', __name__)
 
-@cabin_crew.route('/cabin-crew', methods=['GET'])
-@jwt_required()
-def get_crew_members():
-    # Pagination parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-
+def filtered_cabin_crew(args):
+    # Cabin crew matching the list filters in args, sorted by attendant_id
     # Filtering parameters
-    attendant_id = request.args.get('attendant_id', type=int)
-    name = request.args.get('name', type=str)
-    min_age = request.args.get('min_age', type=int)
-    max_age = request.args.get('max_age', type=int)
-    gender = request.args.get('gender', type=str)
-    nationality = request.args.get('nationality', type=str)
-    attendant_type = request.args.get('attendant_type', type=str)
-    vehicle_type_ids = request.args.getlist('vehicle_type_ids', type=int)  # Assumes array input handling
+    attendant_id = args.get('attendant_id', type=int)
+    name = args.get('name', type=str)
+    min_age = args.get('min_age', type=int)
+    max_age = args.get('max_age', type=int)
+    gender = args.get('gender', type=str)
+    nationality = args.get('nationality', type=str)
+    attendant_type = args.get('attendant_type', type=str)
+    vehicle_type_ids = args.getlist('vehicle_type_ids', type=int)  # Assumes array input handling
 
     # Building the query
     query = CabinCrew.query
@@ -44,31 +40,50 @@ def get_crew_members():
         query = query.filter(CabinCrew.vehicle_type_ids.any(vehicle_type_id))
 
     # Sort by attendant_id
-    query = query.order_by(CabinCrew.attendant_id)
+    return query.order_by(CabinCrew.attendant_id)
+
+CABIN_CREW_FIELDS = {
+    'attendant_id': column_field(CabinCrew.attendant_id),
+    'name': column_field(CabinCrew.name),
+    'age': column_field(CabinCrew.age),
+    'gender': column_field(CabinCrew.gender),
+    'nationality': column_field(CabinCrew.nationality),
+    'known_languages': column_field(CabinCrew.known_languages),
+    'attendant_type': column_field(CabinCrew.attendant_type),
+    'vehicle_type_ids': column_field(CabinCrew.vehicle_type_ids),
+    'dish_recipes': column_field(CabinCrew.dish_recipes),
+    'scheduled_flights': column_field(CabinCrew.scheduled_flights),
+    'aircraft_types': ((CabinCrew.vehicle_type_ids,), lambda crew: ['Boeing 737' if id == 1 else 'Airbus A320' if id == 2 else 'Boeing 777' for id in crew.vehicle_type_ids]),
+}
+
+def cabin_crew_data(crew, fields=CABIN_CREW_FIELDS):
+    return serialize(crew, fields)
+
+@cabin_crew.route('/cabin-crew', methods=['GET'])
+@jwt_required()
+def get_crew_members():
+    # Pagination parameters
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, request.args.get('per_page', 20, type=int))
+    try:
+        count_mode = parse_count_mode(request.args.get('count'), 'cached')
+        fields = select_fields(CABIN_CREW_FIELDS, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = filtered_cabin_crew(request.args)
 
-    # Execute the query with pagination
-    paginated_crew = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Execute the query with pagination, the total is counted separately in the requested count mode
+    paginated_crew = load_fields(query, fields).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    total = count_rows(query, count_mode, filter_key('cabin_crew', request.args))
 
     # Serialize the result
-    crew_members = [{
-      'attendant_id': crew.attendant_id,
-      'name': crew.name,
-      'age': crew.age,
-      'gender': crew.gender,
-      'nationality': crew.nationality,
-      'known_languages': crew.known_languages,
-      'attendant_type': crew.attendant_type,
-      'vehicle_type_ids': crew.vehicle_type_ids,
-      'dish_recipes': crew.dish_recipes,
-      'scheduled_flights': crew.scheduled_flights,
-      'aircraft_types': ['Boeing 737' if id == 1 else 'Airbus A320' if id == 2 else 'Boeing 777' for id in crew.vehicle_type_ids]
-    } for crew in paginated_crew.items]
+    crew_members = [cabin_crew_data(crew, fields) for crew in paginated_crew.items]
 
     response = {
         'crew_members': crew_members,
-        'total': paginated_crew.total,
-        'pages': paginated_crew.pages,
-        'current_page': paginated_crew.page
+        'current_page': paginated_crew.page,
+        **total_fields(total, count_mode, per_page)
     }
 
     return jsonify(response)
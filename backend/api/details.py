@@ -2,11 +2,13 @@ from flask import Blueprint, request, jsonify
 from models import db, Flight, Passenger, Pilot, CabinCrew
 import random
 from flask_jwt_extended import jwt_required
+from services import response_cache
 
 details = Blueprint('details', __name__)
 
 @details.route('/details', methods=['GET'])
 @jwt_required()
+@response_cache.cached(rows=('flight', 'passenger', 'pilot', 'cabin_crew'))
 def get_details():
     print(request.headers)
     flights_count = Flight.query.count()
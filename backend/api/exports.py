@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required
+from services import select_fields, load_fields, serialize
+from .flights import FLIGHT_FIELDS, flights_for_fields, flight_data
+from .pilots import PILOT_FIELDS, filtered_pilots
+from .cabin_crew import CABIN_CREW_FIELDS, filtered_cabin_crew
+from .passengers import PASSENGER_FIELDS, filtered_passengers
+
+exports = Blueprint('exports', __name__)
+
+# Whole filtered lists in one streamed response, for bulk consumers that would otherwise page through them.
+# Each export takes the filters and ?fields= of its list endpoint and writes the same rows. Rows are read through a
+# server-side cursor EXPORT_BATCH_SIZE at a time and sent as each batch arrives, so memory stays flat however
+# many rows there are. ?format=ndjson (default) is one JSON object per line; csv has a header row and JSON for list values.
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def _ndjson_batches(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _csv_batches(rows):
+    buffer = io.StringIO()
+    writer = None
+    written = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow({name: _csv_value(value) for name, value in row.items()})
+        written += 1
+        if written == EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            written = 0
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def export_response(name, fields, rows_for, serialize_row):
+    # Streams serialize_row(row, selected fields) for every row of rows_for(selected fields) in the requested format
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        fields = select_fields(fields, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rows = (serialize_row(row, fields) for row in rows_for(fields).yield_per(EXPORT_BATCH_SIZE))
+    batches = _ndjson_batches(rows) if export_format == 'ndjson' else _csv_batches(rows)
+    return Response(stream_with_context(batches), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{name}.{export_format}"'})
+
+
+@exports.route('/export/flights', methods=['GET'])
+@jwt_required()
+def export_flights():
+    status = request.args.get('status')
+    now = datetime.now()
+    return export_response('flights', FLIGHT_FIELDS, lambda fields: flights_for_fields(request.args, now, fields),
+                           lambda row, fields: flight_data(row, now, status, fields))
+
+
+@exports.route('/export/pilots', methods=['GET'])
+@jwt_required()
+def export_pilots():
+    return export_response('pilots', PILOT_FIELDS, lambda fields: load_fields(filtered_pilots(request.args), fields), serialize)
+
+
+@exports.route('/export/cabin_crew', methods=['GET'])
+@jwt_required()
+def export_cabin_crew():
+    return export_response('cabin_crew', CABIN_CREW_FIELDS, lambda fields: load_fields(filtered_cabin_crew(request.args), fields), serialize)
+
+
+@exports.route('/export/passengers', methods=['GET'])
+@jwt_required()
+def export_passengers():
+    return export_response('passengers', PASSENGER_FIELDS, lambda fields: load_fields(filtered_passengers(request.args), fields), serialize)
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from models import db, CabinCrew, FlightSeatAssignment, Passenger, Pilot, Flight, SeatMap
+from models import db, CabinCrew, FlightSeatAssignment, Passenger, Pilot, Flight
+from services import seat_map_cache, conditional_get
 from flask_jwt_extended import jwt_required
 
 flight_views = Blueprint('flight_views', __name__)
@@ -7,6 +8,7 @@ flight_views = Blueprint('flight_views', __name__)
 
 @flight_views.route('/<int:flight_id>/tabular_view', methods=['GET'])
 @jwt_required()
+@conditional_get(tables=('pilot:profile', 'cabin_crew:profile', 'passenger:profile'), roster=True)
 def tabular_view(flight_id: int):
     with db.session.no_autoflush:
         flight = db.session.get(Flight, flight_id)
@@ -48,6 +50,7 @@ def tabular_view(flight_id: int):
 
 @flight_views.route('/<int:flight_id>/plane_view', methods=['GET'])
 @jwt_required()
+@conditional_get(tables=('pilot:profile', 'cabin_crew:profile', 'passenger:profile', 'seat_map'), roster=True)
 def plane_view(flight_id):
     with db.session.no_autoflush:
         flight = db.session.get(Flight, flight_id)
@@ -55,15 +58,15 @@ def plane_view(flight_id):
             return jsonify({"error": "Flight not found"}), 404
 
         # Fetch seat assignments for the specific flight
-        assignments = FlightSeatAssignment.query.filter(FlightSeatAssignment.flight_id == flight_id).join(SeatMap, FlightSeatAssignment.seat_map_id == SeatMap.id).all()
+        assignments = FlightSeatAssignment.query.filter(FlightSeatAssignment.flight_id == flight_id).all()
 
         data = []
         for assignment in assignments:
-            seat_map = assignment.seat_map  # Access the joined SeatMap object
+            seat_map = seat_map_cache.seat(assignment.seat_map_id)  # Seat maps are served from the process-wide cache
             person_type = assignment.seater_type
             seat_info = {
-                "seat_row": seat_map.seat_row,  # Correctly access seat_row from the SeatMap object
-                "seat_number": seat_map.seat_number,  # Correctly access seat_number from the SeatMap object
+                "seat_row": seat_map.seat_row,  # Correctly access seat_row from the cached seat
+                "seat_number": seat_map.seat_number,  # Correctly access seat_number from the cached seat
                 "seat_type": seat_map.seat_type
             }
 
@@ -102,6 +105,7 @@ def plane_view(flight_id):
 
 
 @flight_views.route('/<int:flight_id>/extended_view', methods=['GET'])
+@conditional_get(tables=('pilot:profile', 'cabin_crew:profile', 'passenger:profile'), roster=True, schedules=True)
 def extended_view(flight_id):
     with db.session.no_autoflush:
         flight = db.session.get(Flight, flight_id)
@@ -1,14 +1,32 @@
 from flask import Blueprint, jsonify, request
 from models import db, Airport, Flight, AircraftType
-from services import calculate_distance, seat_plan_auto
+from services import calculate_distance, seat_plan_auto, keyset_page, count_rows, filter_key, parse_count_mode, total_fields, response_cache, conditional_get, scope_versions_total, load_fields, select_fields, serialize
+from collections import namedtuple
 from datetime import datetime, timedelta
-from sqlalchemy import cast, String 
+from sqlalchemy import or_, false, select
 from sqlalchemy.orm import aliased
 from flask_jwt_extended import jwt_required
+from .roster import queue_roster_job
 
 
 flights = Blueprint('flights', __name__)
 
+FLIGHT_NUMBER_MAX = 2147483647  # flight_number is an integer column
+
+def flight_number_prefix_filter(prefix):
+    # Flight numbers whose decimal form starts with prefix, as one primary key range per length:
+    # "12" -> 12, 120-129, 1200-1299, ... instead of a LIKE over every number cast to text
+    if not prefix.isdigit():
+        return false()
+    if prefix.startswith('0'):
+        return Flight.flight_number == 0 if prefix == '0' else false()
+    low = high = int(prefix)
+    ranges = []
+    while low <= FLIGHT_NUMBER_MAX:
+        ranges.append(Flight.flight_number.between(low, min(high, FLIGHT_NUMBER_MAX)))
+        low, high = low * 10, high * 10 + 9
+    return or_(*ranges) if ranges else false()
+
 # Endpoint to create a flight
 @flights.route('/create_flight', methods=['POST'])
 @jwt_required()
@@ -54,6 +72,9 @@ def create_flight():
             return jsonify({"message": "Flight succesfully created", "flight_id": flight.flight_number}), 201
         
         elif data['create_roster'] == "Yes":
+          if data.get('async'):
+              # Roster is built by a background job, poll status_url for the outcome
+              return queue_roster_job([flight.flight_number], message="Flight created, roster job queued", flight_id=flight.flight_number)
           returnedMessage = seat_plan_auto(flight.flight_number, flight.aircraft_type_id)
           if returnedMessage != "Seats assigned successfully":
               return jsonify({"message": returnedMessage}), 500
@@ -72,37 +93,61 @@ from sqlalchemy.sql import func, and_
 from datetime import datetime, timedelta
 from sqlalchemy.sql import func, and_
 
-# Endpoint to get flights with filtering and pagination 
-@flights.route('/flights', methods=['GET'])
-@jwt_required()
-def get_flights():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+def flight_status_epoch():
+    # The latest departure and landing so far: no flight's status changes until one of them does.
+    # Two backward index scans, one on flight_date_time and one on flight_end_time_date_time
+    now = datetime.now()
+    return tuple(db.session.query(
+        select(func.max(Flight.date_time)).where(Flight.date_time <= now).scalar_subquery(),
+        select(func.max(Flight.end_time)).where(Flight.end_time <= now).scalar_subquery()
+    ).one())
+
+def flight_list_epoch():
+    # flight_status_epoch, plus every flight's roster version when the list shows menus: chefs add their dishes
+    # to flight_menu with the roster, which the 'flight' version does not follow
+    epoch = flight_status_epoch()
+    try:
+        fields = select_fields(FLIGHT_FIELDS, request.args.get('fields'))
+    except ValueError:
+        return epoch  # The view answers 400
+    return epoch + scope_versions_total('roster') if 'flight_menu' in fields else epoch
+
+# Airport columns a flight row can carry: name -> (airport, column)
+AIRPORT_COLUMNS = {
+    'source_country': ('source', 'country'),
+    'source_city': ('source', 'city'),
+    'destination_country': ('destination', 'country'),
+    'destination_city': ('destination', 'city'),
+}
+
+def filtered_flights(args, now, airport_columns=tuple(AIRPORT_COLUMNS)):
+    # Flights matching the list filters in args, sorted by flight_number. Rows are (Flight, *airport_columns),
+    # or Flight entities without airport columns. An airport is only joined when a column or filter needs it.
     # Filter parameters
-    flight_number_prefix = request.args.get('flight_number')
-    min_date_time = request.args.get('min_date_time')
-    max_date_time = request.args.get('max_date_time')
-    min_duration = request.args.get('min_duration', type=int)
-    max_duration = request.args.get('max_duration', type=int)
-    min_distance = request.args.get('min_distance', type=float)
-    max_distance = request.args.get('max_distance', type=float)
-
-    source_airport = request.args.get('source_airport')
-    destination_airport = request.args.get('destination_airport')
-
-    source_city = request.args.get('source_city')
-    destination_city = request.args.get('destination_city')
-
-    source_country = request.args.get('source_country')
-    destination_country = request.args.get('destination_country')
-    aircraft_type_id = request.args.get('aircraft_type_id', type=int)
-    status = request.args.get('status') # active, passed, pending
+    flight_number_prefix = args.get('flight_number')
+    min_date_time = args.get('min_date_time')
+    max_date_time = args.get('max_date_time')
+    min_duration = args.get('min_duration', type=int)
+    max_duration = args.get('max_duration', type=int)
+    min_distance = args.get('min_distance', type=float)
+    max_distance = args.get('max_distance', type=float)
+
+    source_airport = args.get('source_airport')
+    destination_airport = args.get('destination_airport')
+
+    source_city = args.get('source_city')
+    destination_city = args.get('destination_city')
+
+    source_country = args.get('source_country')
+    destination_country = args.get('destination_country')
+    aircraft_type_id = args.get('aircraft_type_id', type=int)
+    status = args.get('status') # active, passed, pending
 
     query = Flight.query
 
     # Apply filters
     if flight_number_prefix:
-        query = query.filter(cast(Flight.flight_number, String).like(f"{flight_number_prefix}%"))
+        query = query.filter(flight_number_prefix_filter(flight_number_prefix.strip()))
     if min_date_time:
         query = query.filter(Flight.date_time >= datetime.fromisoformat(min_date_time))
     if max_date_time:
@@ -116,83 +161,131 @@ def get_flights():
     if max_distance is not None:
         query = query.filter(Flight.distance <= max_distance)
     if source_airport:
-        query = query.filter(Flight.source_airport.ilike(source_airport))
+        query = query.filter(Flight.source_airport == source_airport.strip().upper())
     if destination_airport:
-        query = query.filter(Flight.destination_airport.ilike(destination_airport))
+        query = query.filter(Flight.destination_airport == destination_airport.strip().upper())
     if aircraft_type_id is not None:
         query = query.filter(Flight.aircraft_type_id == aircraft_type_id)
     if status:
-        now = datetime.now()
         if status == 'passed':
-            query = query.filter(Flight.date_time + func.make_interval(0, 0, 0, 0, 0, Flight.duration, 0) < now)
+            query = query.filter(Flight.end_time < now)
         elif status == 'active':
-            query = query.filter(and_(Flight.date_time <= now, Flight.date_time + func.make_interval(0, 0, 0, 0, 0, Flight.duration, 0) > now))
+            query = query.filter(and_(Flight.end_time >= now, Flight.date_time <= now))
         elif status == 'pending':
             query = query.filter(Flight.date_time > now)
 
-    # Join with Airport to filter by city or country
-    source_airport_alias = aliased(Airport)
-    destination_airport_alias = aliased(Airport)
-    
-    query = query.join(source_airport_alias, Flight.source_airport == source_airport_alias.airport_code)
-    query = query.join(destination_airport_alias, Flight.destination_airport == destination_airport_alias.airport_code)
+    # Join with Airport to filter by city or country, or to return them
+    joined = set(AIRPORT_COLUMNS[name][0] for name in airport_columns)
+    if source_city or source_country:
+        joined.add('source')
+    if destination_city or destination_country:
+        joined.add('destination')
+    airports = {side: aliased(Airport) for side in joined}
+    if 'source' in airports:
+        query = query.join(airports['source'], Flight.source_airport == airports['source'].airport_code)
+    if 'destination' in airports:
+        query = query.join(airports['destination'], Flight.destination_airport == airports['destination'].airport_code)
 
     if source_city:
-        query = query.filter(source_airport_alias.city.ilike(source_city))
+        query = query.filter(airports['source'].city.ilike(source_city))
     if source_country:
-        query = query.filter(source_airport_alias.country.ilike(source_country))
+        query = query.filter(airports['source'].country.ilike(source_country))
 
     if destination_city:
-        query = query.filter(destination_airport_alias.city.ilike(destination_city))
+        query = query.filter(airports['destination'].city.ilike(destination_city))
     if destination_country:
-        query = query.filter(destination_airport_alias.country.ilike(destination_country))
+        query = query.filter(airports['destination'].country.ilike(destination_country))
 
     # Select the fields you want to include in the result
-    query = query.add_columns(
-        source_airport_alias.country.label('source_country'),
-        source_airport_alias.city.label('source_city'),
-        destination_airport_alias.country.label('destination_country'),
-        destination_airport_alias.city.label('destination_city')
-    )
+    if airport_columns:
+        query = query.add_columns(*(getattr(airports[AIRPORT_COLUMNS[name][0]], AIRPORT_COLUMNS[name][1]).label(name)
+                                    for name in airport_columns))
 
     # Sort by flight_number
-    query = query.order_by(Flight.flight_number)
+    return query.order_by(Flight.flight_number)
 
-    # Pagination
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    flights = pagination.items
+FlightRow = namedtuple('FlightRow', ['Flight'])  # A Flight entity in the shape of a filtered_flights row
+
+def _flight_column(column):
+    return (column,), lambda row, *context: getattr(row.Flight, column.key)
+
+def _airport_column(name):
+    return (), lambda row, *context: getattr(row, name)
+
+# Fields of a flight row; getters take the row, the clock reading and the status filter
+FLIGHT_FIELDS = {
+    "flight_number": _flight_column(Flight.flight_number),
+    "airline_code": _flight_column(Flight.airline_code),
+    "date_time": ((Flight.date_time,), lambda row, *context: row.Flight.date_time.isoformat()),
+    "duration": _flight_column(Flight.duration),
+    "distance": _flight_column(Flight.distance),
+    "source_airport": _flight_column(Flight.source_airport),
+    "destination_airport": _flight_column(Flight.destination_airport),
+    "aircraft_type_id": _flight_column(Flight.aircraft_type_id),
+    "aircraft_type": ((Flight.aircraft_type_id,), lambda row, *context:
+                      "Boeing 737" if row.Flight.aircraft_type_id == 1
+                      else "Airbus A320" if row.Flight.aircraft_type_id == 2
+                      else "Boeing 777" if row.Flight.aircraft_type_id == 3
+                      else "Unknown"),
+    "status": ((Flight.date_time, Flight.end_time), lambda row, now, status:
+               status if status in ('passed', 'active', 'pending') else row.Flight.status_at(now)),
+    "source_country": _airport_column("source_country"),
+    "source_city": _airport_column("source_city"),
+    "destination_country": _airport_column("destination_country"),
+    "destination_city": _airport_column("destination_city"),
+    "flight_menu": _flight_column(Flight.flight_menu),
+}
+
+def flight_data(row, now, status=None, fields=FLIGHT_FIELDS):
+    # A filtered_flights row; status is the status filter, if any, which every row then has
+    return serialize(FlightRow(row) if isinstance(row, Flight) else row, fields, now, status)
+
+def flights_for_fields(args, now, fields):
+    # filtered_flights loading only what fields need
+    query = filtered_flights(args, now, tuple(name for name in fields if name in AIRPORT_COLUMNS))
+    return load_fields(query, fields, Flight.flight_number)
+
+# Endpoint to get flights with filtering and pagination 
+@flights.route('/flights', methods=['GET'])
+@jwt_required()
+@conditional_get(tables=('flight', 'airport'), extra=flight_list_epoch)
+@response_cache.cached(tables=('flight', 'airport'), vary=flight_status_epoch)
+def get_flights():
+    # Pages are keyset-paginated on flight_number: pass back next_cursor as ?cursor= for the following page.
+    # ?page= alone still works (as an offset) for jumping to a page. No total unless asked for with ?count=exact|cached|estimate
+    # (?include_total=true is count=exact)
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, request.args.get('per_page', 20, type=int))
+    cursor = request.args.get('cursor')
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
+    try:
+        count_mode = parse_count_mode(request.args.get('count'), 'exact' if include_total else 'none')
+        fields = select_fields(FLIGHT_FIELDS, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    status = request.args.get('status') # active, passed, pending
+    now = datetime.now()  # One clock reading for the status filter and every row's status
+    query = flights_for_fields(request.args, now, fields)
+
+    total = count_rows(query, count_mode, filter_key('flights', request.args))
+
+    try:
+        flights, next_cursor = keyset_page(query, Flight.flight_number, per_page, cursor=cursor, offset=(page - 1) * per_page,
+                                           key=lambda row: row.flight_number if isinstance(row, Flight) else row.Flight.flight_number)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
 
     # Serialize flights
-    flights_data = [{
-      "flight_number": flight.Flight.flight_number,
-      "airline_code": flight.Flight.airline_code,
-      "date_time": flight.Flight.date_time.isoformat(),
-      "duration": flight.Flight.duration,
-      "distance": flight.Flight.distance,
-      "source_airport": flight.Flight.source_airport,
-      "destination_airport": flight.Flight.destination_airport,
-      "aircraft_type_id": flight.Flight.aircraft_type_id,
-      "aircraft_type": "Boeing 737" if flight.Flight.aircraft_type_id == 1 
-               else "Airbus A320" if flight.Flight.aircraft_type_id == 2 
-               else "Boeing 777" if flight.Flight.aircraft_type_id == 3 
-               else "Unknown",
-      "status": "passed" if flight.Flight.date_time + timedelta(minutes=flight.Flight.duration) < datetime.now() 
-           else "active" if flight.Flight.date_time <= datetime.now() 
-           else "pending",
-      "source_country": flight.source_country,
-      "source_city": flight.source_city,
-      "destination_country": flight.destination_country,
-      "destination_city": flight.destination_city,
-      "flight_menu": flight.Flight.flight_menu
-    } for flight in flights]
+    flights_data = [flight_data(flight, now, status, fields) for flight in flights]
 
     # Response with pagination metadata
     response = {
         "flights": flights_data,
-        "total": pagination.total,
-        "pages": pagination.pages,
-        "current_page": pagination.page
+        "next_cursor": next_cursor,
+        "per_page": per_page,
+        "current_page": page
     }
+    response.update(total_fields(total, count_mode, per_page))
 
     return jsonify(response), 200
 
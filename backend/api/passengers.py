@@ -1,24 +1,19 @@
 from flask import Blueprint, jsonify, request
-from models import db, Passenger
+from models import db, Passenger, Flight, PersonSchedule
+from services import count_rows, filter_key, parse_count_mode, total_fields, column_field, select_fields, load_fields, serialize
 from flask_jwt_extended import jwt_required
 
 passengers = Blueprint('passengers', __name__)
 
-# Get passengers with optional filtering
-@passengers.route('/passengers', methods=['GET'])
-@jwt_required()
-def get_passengers():
-    # Pagination parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-
+def filtered_passengers(args):
+    # Passengers matching the list filters in args, sorted by passenger_id
     # Filtering parameters
-    passenger_id = request.args.get('passenger_id', type=int)
-    name = request.args.get('name', type=str)
-    min_age = request.args.get('min_age', type=int)
-    max_age = request.args.get('max_age', type=int)
-    gender = request.args.get('gender', type=str)
-    nationality = request.args.get('nationality', type=str)
+    passenger_id = args.get('passenger_id', type=int)
+    name = args.get('name', type=str)
+    min_age = args.get('min_age', type=int)
+    max_age = args.get('max_age', type=int)
+    gender = args.get('gender', type=str)
+    nationality = args.get('nationality', type=str)
 
     # Building the query
     query = Passenger.query
@@ -36,31 +31,49 @@ def get_passengers():
     if nationality:
         query = query.filter(Passenger.nationality.ilike(f'%{nationality}%'))
 
-    query = query.order_by(Passenger.passenger_id)
-
     # Sort by passenger_id
-    query = query.order_by(Passenger.passenger_id)
+    return query.order_by(Passenger.passenger_id)
+
+PASSENGER_FIELDS = {
+    'passenger_id': column_field(Passenger.passenger_id),
+    'name': column_field(Passenger.name),
+    'age': column_field(Passenger.age),
+    'gender': column_field(Passenger.gender),
+    'nationality': column_field(Passenger.nationality),
+    'parent_id': column_field(Passenger.parent_id),
+    'affiliated_passenger_ids': column_field(Passenger.affiliated_passenger_ids),
+    'scheduled_flights': column_field(Passenger.scheduled_flights),
+}
+
+def passenger_data(passenger, fields=PASSENGER_FIELDS):
+    return serialize(passenger, fields)
+
+# Get passengers with optional filtering
+@passengers.route('/passengers', methods=['GET'])
+@jwt_required()
+def get_passengers():
+    # Pagination parameters
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, request.args.get('per_page', 20, type=int))
+    try:
+        count_mode = parse_count_mode(request.args.get('count'), 'cached')
+        fields = select_fields(PASSENGER_FIELDS, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = filtered_passengers(request.args)
 
-    # Execute the query with pagination
-    paginated_passengers = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Execute the query with pagination, the total is counted separately in the requested count mode
+    paginated_passengers = load_fields(query, fields).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    total = count_rows(query, count_mode, filter_key('passengers', request.args))
 
     # Prepare detailed result
-    passengers = [{
-        'passenger_id': passenger.passenger_id,
-        'name': passenger.name,
-        'age': passenger.age,
-        'gender': passenger.gender,
-        'nationality': passenger.nationality,
-        'parent_id': passenger.parent_id,
-        'affiliated_passenger_ids': passenger.affiliated_passenger_ids,
-        'scheduled_flights': passenger.scheduled_flights
-    } for passenger in paginated_passengers.items]
+    passengers = [passenger_data(passenger, fields) for passenger in paginated_passengers.items]
 
     response = {
         'passengers': passengers,
-        'total': paginated_passengers.total,
-        'pages': paginated_passengers.pages,
-        'current_page': paginated_passengers.page
+        'current_page': paginated_passengers.page,
+        **total_fields(total, count_mode, per_page)
     }
     return jsonify(response), 200
 
@@ -90,6 +103,11 @@ def create_passenger():
     # Add new passenger to the database session and commit it
     db.session.add(new_passenger)
     try:
+        db.session.flush()
+        # Mirror any initial schedule into person_schedule, which enforces non-overlapping flights
+        flights = Flight.query.filter(Flight.flight_number.in_(new_passenger.scheduled_flights)).all()
+        for flight in flights:
+            db.session.add(PersonSchedule.for_flight(Passenger.schedule_type, new_passenger.passenger_id, flight))
         db.session.commit()
     except Exception as e:
         db.session.rollback()  # Rollback in case of error
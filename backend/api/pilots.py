@@ -1,27 +1,23 @@
 from flask import Blueprint, jsonify, request
 from models import db, Pilot
+from services import count_rows, filter_key, parse_count_mode, total_fields, column_field, select_fields, load_fields, serialize
 from flask_jwt_extended import jwt_required
 
 pilots = Blueprint('pilots', __name__)
 
-@pilots.route('/pilots', methods=['GET'])
-@jwt_required()
-def get_pilots():
-    # Pagination parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
+def filtered_pilots(args):
+    # Pilots matching the list filters in args, sorted by pilot_id
     # Filter parameters
-    pilot_id = request.args.get('pilot_id', type=int)
-    name = request.args.get('name', type=str)
-    min_age = request.args.get('min_age', type=int)
-    max_age = request.args.get('max_age', type=int)
-    gender = request.args.get('gender', type=str)
-    nationality = request.args.get('nationality', type=str)
-    vehicle_type_id = request.args.get('vehicle_type_id', type=int)
-    min_allowed_range = request.args.get('min_allowed_range', type=int)
-    max_allowed_range = request.args.get('max_allowed_range', type=int)
-    seniority_level = request.args.get('seniority_level', type=str)
+    pilot_id = args.get('pilot_id', type=int)
+    name = args.get('name', type=str)
+    min_age = args.get('min_age', type=int)
+    max_age = args.get('max_age', type=int)
+    gender = args.get('gender', type=str)
+    nationality = args.get('nationality', type=str)
+    vehicle_type_id = args.get('vehicle_type_id', type=int)
+    min_allowed_range = args.get('min_allowed_range', type=int)
+    max_allowed_range = args.get('max_allowed_range', type=int)
+    seniority_level = args.get('seniority_level', type=str)
     
     # Build query base
     query = Pilot.query
@@ -50,29 +46,48 @@ def get_pilots():
     
 
     # Sort by pilot_id
-    query = query.order_by(Pilot.pilot_id)
+    return query.order_by(Pilot.pilot_id)
+
+PILOT_FIELDS = {
+    'pilot_id': column_field(Pilot.pilot_id),
+    'name': column_field(Pilot.name),
+    'age': column_field(Pilot.age),
+    'gender': column_field(Pilot.gender),
+    'nationality': column_field(Pilot.nationality),
+    'vehicle_type_id': column_field(Pilot.vehicle_type_id),
+    'aircraft_type': ((Pilot.vehicle_type_id,), lambda pilot: 'Boeing 737' if pilot.vehicle_type_id == 1 else 'Airbus A320' if pilot.vehicle_type_id == 2 else 'Boeing 777'),
+    'allowed_range': column_field(Pilot.allowed_range),
+    'seniority_level': column_field(Pilot.seniority_level),
+    'known_languages': column_field(Pilot.known_languages),
+    'scheduled_flights': column_field(Pilot.scheduled_flights),
+}
+
+def pilot_data(pilot, fields=PILOT_FIELDS):
+    return serialize(pilot, fields)
+
+@pilots.route('/pilots', methods=['GET'])
+@jwt_required()
+def get_pilots():
+    # Pagination parameters
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, request.args.get('per_page', 20, type=int))
+    try:
+        count_mode = parse_count_mode(request.args.get('count'), 'cached')
+        fields = select_fields(PILOT_FIELDS, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = filtered_pilots(request.args)
     
-    # Pagination
-    paginated_pilots = query.paginate(page=page, per_page=per_page, error_out=False)
-    pilots = [{
-      'pilot_id': pilot.pilot_id,
-      'name': pilot.name,
-      'age': pilot.age,
-      'gender': pilot.gender,
-      'nationality': pilot.nationality,
-      'vehicle_type_id': pilot.vehicle_type_id,
-      'aircraft_type': 'Boeing 737' if pilot.vehicle_type_id == 1 else 'Airbus A320' if pilot.vehicle_type_id == 2 else 'Boeing 777',
-      'allowed_range': pilot.allowed_range,
-      'seniority_level': pilot.seniority_level,
-      'known_languages': pilot.known_languages,
-      'scheduled_flights': pilot.scheduled_flights
-    } for pilot in paginated_pilots.items]
+    # Pagination, the total is counted separately in the requested count mode
+    paginated_pilots = load_fields(query, fields).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    total = count_rows(query, count_mode, filter_key('pilots', request.args))
+    pilots = [pilot_data(pilot, fields) for pilot in paginated_pilots.items]
     
     return jsonify({
         'pilots': pilots,
-        'total': paginated_pilots.total,
-        'pages': paginated_pilots.pages,
-        'current_page': page
+        'current_page': paginated_pilots.page,
+        **total_fields(total, count_mode, per_page)
     }), 200
 
 @pilots.route('/create_pilot', methods=['POST'])
@@ -1,10 +1,13 @@
-from flask import Blueprint, jsonify, request
-from models import Flight, FlightSeatAssignment
-from services import seat_plan_auto
+from datetime import datetime
+from flask import Blueprint, jsonify, request, url_for
+from models import db, Flight, FlightSeatAssignment, RosterJob, Pilot, CabinCrew
+from services import seat_plan_auto, create_rosters, roster_jobs, repair_rosters, load_distribution, workload_window
 from flask_jwt_extended import jwt_required
 
 roster = Blueprint('roster', __name__)
 
+CREW_PERSON_TYPES = {'pilot': Pilot, 'cabin_crew': CabinCrew}
+
 @roster.route('/create_roster_auto', methods=['POST'])
 @jwt_required()
 def create_roster_auto():
@@ -24,9 +27,157 @@ def create_roster_auto():
 
     vehicle_type_id = flight.aircraft_type_id
 
-    returnedMessage = seat_plan_auto(flight_number, vehicle_type_id)
+    # Optional seed, the same seed reproduces the same roster
+    seed = data.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+      return jsonify({'error': 'seed must be an integer'}), 400
+
+    if data.get('dry_run'):
+      # Proposed roster against the current schedules, nothing is written
+      result = create_rosters([flight_number], dry_run=True, seed=seed)[0]
+      if result["status"] != "proposed":
+        return jsonify({"message": result["message"]}), 500
+      return jsonify(result["roster"]), 200
+
+    if data.get('async'):
+      return queue_roster_job([flight_number], seed=seed)
+
+    returnedMessage = seat_plan_auto(flight_number, vehicle_type_id, seed=seed)
     
-    if returnedMessage != "Roster successfully assigned":
+    if returnedMessage != "Seats assigned successfully":
       return jsonify({"message": returnedMessage}), 500
     else:
       return jsonify({"message": returnedMessage}), 201
+
+@roster.route('/create_roster_batch', methods=['POST'])
+@jwt_required()
+def create_roster_batch():
+    data = request.get_json()
+    required_fields = ['flight_numbers']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({'error': 'Missing fields', 'missing': missing_fields}), 400
+
+    flight_numbers = data['flight_numbers']
+    if not isinstance(flight_numbers, list) or not all(isinstance(item, int) for item in flight_numbers):
+        return jsonify({'error': 'flight_numbers must be an array of integers'}), 400
+
+    chunk_size = data.get('chunk_size', 50)
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+
+    seed = data.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        return jsonify({'error': 'seed must be an integer'}), 400
+
+    if data.get('dry_run'):
+        results = create_rosters(flight_numbers, dry_run=True, seed=seed)
+        proposed = sum(1 for result in results if result['status'] == 'proposed')
+        return jsonify({"results": results, "proposed": proposed, "failed": len(results) - proposed}), 200
+
+    results = create_rosters(flight_numbers, chunk_size=chunk_size, seed=seed)
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({"results": results, "created": created, "failed": len(results) - created}), 200
+
+def job_json(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "flight_numbers": job.flight_numbers,
+        "seed": job.seed,
+        "results": job.results,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def queue_roster_job(flight_numbers, chunk_size=50, seed=None, **extra):
+    # 202 with the job and where to poll it, or 503 when this process has too many jobs waiting
+    job = roster_jobs.submit(flight_numbers, chunk_size=chunk_size, seed=seed)
+    if job is None:
+        return jsonify({"error": "Roster job queue is full, try again later"}), 503
+    status_url = url_for('roster.get_roster_job', job_id=job.id)
+    response = jsonify({**extra, **job_json(job), "status_url": status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
+@roster.route('/roster_jobs', methods=['POST'])
+@jwt_required()
+def create_roster_job():
+    data = request.get_json()
+    required_fields = ['flight_numbers']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({'error': 'Missing fields', 'missing': missing_fields}), 400
+
+    flight_numbers = data['flight_numbers']
+    if not isinstance(flight_numbers, list) or not all(isinstance(item, int) for item in flight_numbers):
+        return jsonify({'error': 'flight_numbers must be an array of integers'}), 400
+
+    chunk_size = data.get('chunk_size', 50)
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+
+    seed = data.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        return jsonify({'error': 'seed must be an integer'}), 400
+
+    return queue_roster_job(flight_numbers, chunk_size=chunk_size, seed=seed)
+
+@roster.route('/roster_jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_roster_job(job_id):
+    job = db.session.get(RosterJob, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_json(job)), 200
+
+@roster.route('/repair_roster', methods=['POST'])
+@jwt_required()
+def repair_roster():
+    # A crew member is unavailable in [start_time, end_time): their seats on the flights in that window are reassigned
+    data = request.get_json()
+    required_fields = ['person_type', 'person_id', 'start_time', 'end_time']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({'error': 'Missing fields', 'missing': missing_fields}), 400
+
+    person_type = CREW_PERSON_TYPES.get(data['person_type'])
+    if person_type is None:
+        return jsonify({'error': 'person_type must be pilot or cabin_crew'}), 400
+    if not isinstance(data['person_id'], int):
+        return jsonify({'error': 'person_id must be an integer'}), 400
+    try:
+        start_time = datetime.fromisoformat(data['start_time'])
+        end_time = datetime.fromisoformat(data['end_time'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start_time and end_time must be ISO 8601 datetimes'}), 400
+    if end_time <= start_time:
+        return jsonify({'error': 'end_time must be after start_time'}), 400
+
+    seed = data.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        return jsonify({'error': 'seed must be an integer'}), 400
+
+    results = repair_rosters(person_type, data['person_id'], start_time, end_time, seed=seed)
+    repaired = sum(1 for result in results if result['status'] == 'repaired')
+    return jsonify({"results": results, "repaired": repaired, "failed": len(results) - repaired}), 200
+
+@roster.route('/crew_workload', methods=['GET'])
+@jwt_required()
+def crew_workload():
+    # Load distribution of pilots or cabin crew over the rolling workload window ending in the week of ?date= (default today)
+    person_type = CREW_PERSON_TYPES.get(request.args.get('person_type', 'pilot'))
+    if person_type is None:
+        return jsonify({'error': 'person_type must be pilot or cabin_crew'}), 400
+    try:
+        day = datetime.fromisoformat(request.args['date']) if 'date' in request.args else datetime.now()
+    except ValueError:
+        return jsonify({'error': 'date must be an ISO 8601 date'}), 400
+    weeks = request.args.get('weeks', type=int)
+    if weeks is not None and weeks < 1:
+        return jsonify({'error': 'weeks must be a positive integer'}), 400
+
+    first, last = workload_window(day, weeks) if weeks else workload_window(day)
+    return jsonify(load_distribution(person_type, first, last)), 200
@@ -7,6 +7,8 @@ from flask_jwt_extended import JWTManager, create_access_token, jwt_required, ge
 import os
 from dotenv import load_dotenv
 from api import register_blueprints
+from migrations import run_migrations
+from services import roster_jobs, response_cache, compression, init_json_provider
 
 load_dotenv()
 
@@ -18,6 +20,9 @@ def create_app(config_class=Config):
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=1)
 
     db.init_app(app)
+    response_cache.init_app(app)
+    init_json_provider(app)
+    compression.init_app(app)
 
     jwt = JWTManager(app)
 
@@ -25,6 +30,8 @@ def create_app(config_class=Config):
         # Import models here to ensure they are known to SQLAlchemy
         from models import Flight, SeatMap, AircraftType, Airport, Pilot, CabinCrew, Passenger, FlightSeatAssignment, User  
         db.create_all()
+        run_migrations()
+        roster_jobs.init_app(app)
         # Populate the tables if they are empty
         if not app.config['TESTING']:  # Only populate for non-test environments
             if AircraftType.query.first() is None:
@@ -0,0 +1,110 @@
+from models import db, Pilot, CabinCrew, Passenger, PersonSchedule, SeatMap, CrewWorkload, FlightSeatAssignment
+from models.flight import FLIGHT_END_TIME_SQL
+from models.data_version import VERSIONED_TABLES, VERSION_FUNCTIONS, RETIRED_TRIGGERS, version_triggers
+from sqlalchemy import text, update
+
+# Idempotent migrations for databases created before the current models.
+# db.create_all() only creates missing tables, anything that changes existing data or tables lives here.
+
+def migrate_schedules_off_arrays():
+    # Backfill person_schedule from the scheduled_flights arrays, one set-based insert per person type.
+    # Overlapping array entries are skipped by the exclusion constraint instead of failing the migration.
+    if PersonSchedule.query.first() is not None:
+        return
+    for person_type, id_column in ((Pilot, Pilot.pilot_id), (CabinCrew, CabinCrew.attendant_id), (Passenger, Passenger.passenger_id)):
+        db.session.execute(text(f"""
+            INSERT INTO person_schedule (person_type, person_id, flight_id, during)
+            SELECT DISTINCT :person_type, p.{id_column.key}, f.flight_number,
+                   tsrange(f.date_time, f.date_time + make_interval(mins => f.duration))
+            FROM {person_type.__tablename__} p
+            CROSS JOIN LATERAL unnest(p.scheduled_flights) AS s(flight_number)
+            JOIN flight f ON f.flight_number = s.flight_number
+            ON CONFLICT DO NOTHING
+        """), {'person_type': person_type.schedule_type})
+    db.session.commit()
+
+# Roles of pilot and crew seats in seat id order, as the fixed offsets in assign_seats used to hand them out
+_NARROW_BODY_ROLES = {'pilot': ['senior', 'junior', 'trainee', 'trainee'], 'crew': ['chief'] * 2 + ['regular'] * 8 + ['chef'] * 2}
+_WIDE_BODY_ROLES = {'pilot': ['senior'] * 2 + ['junior'] * 2 + ['trainee'] * 2, 'crew': ['chief'] * 4 + ['regular'] * 10 + ['chef'] * 2}
+LEGACY_SEAT_ROLES = {1: _NARROW_BODY_ROLES, 2: _NARROW_BODY_ROLES, 3: _WIDE_BODY_ROLES}
+
+def migrate_seat_roles():
+    # seat_role replaced the fixed seat offsets; backfill it for seat maps populated before the column existed
+    db.session.execute(text("ALTER TABLE seat_map ADD COLUMN IF NOT EXISTS seat_role VARCHAR(50)"))
+    seats = {}
+    for seat_id, aircraft_type_id, seat_type, seat_role in db.session.query(
+            SeatMap.id, SeatMap.aircraft_type_id, SeatMap.seat_type, SeatMap.seat_role
+            ).filter(SeatMap.seat_type.in_(['pilot', 'crew'])).order_by(SeatMap.id).all():
+        seats.setdefault((aircraft_type_id, seat_type), []).append((seat_id, seat_role))
+
+    updates = []
+    for (aircraft_type_id, seat_type), type_seats in seats.items():
+        roles = LEGACY_SEAT_ROLES.get(aircraft_type_id, {}).get(seat_type, [])
+        if any(seat_role is not None for _, seat_role in type_seats):
+            continue
+        updates += [{'id': seat_id, 'seat_role': seat_role} for (seat_id, _), seat_role in zip(type_seats, roles)]
+    if updates:
+        db.session.execute(update(SeatMap), updates)
+    db.session.commit()
+
+def migrate_roster_job_seed():
+    db.session.execute(text("ALTER TABLE roster_job ADD COLUMN IF NOT EXISTS seed BIGINT"))
+    db.session.commit()
+
+def migrate_roster_job_owner():
+    db.session.execute(text("ALTER TABLE roster_job ADD COLUMN IF NOT EXISTS owner INTEGER"))
+    db.session.commit()
+
+def migrate_crew_workload():
+    # Backfill the workload counters from person_schedule for rosters written before crew_workload existed
+    if CrewWorkload.query.first() is not None:
+        return
+    db.session.execute(text("""
+        INSERT INTO crew_workload (person_type, person_id, period_start, flights, minutes)
+        SELECT person_type, person_id, date_trunc('week', lower(during))::date,
+               count(*), sum(extract(epoch FROM upper(during) - lower(during)) / 60)::integer
+        FROM person_schedule
+        WHERE person_type IN ('pilot', 'cabin_crew')
+        GROUP BY 1, 2, 3
+    """))
+    db.session.commit()
+
+def migrate_flight_filter_indexes():
+    # create_all() does not add indexes to existing tables
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS flight_source_airport ON flight (source_airport)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS flight_destination_airport ON flight (destination_airport)"))
+    db.session.commit()
+
+def migrate_flight_end_time():
+    db.session.execute(text(f"ALTER TABLE flight ADD COLUMN IF NOT EXISTS end_time TIMESTAMP GENERATED ALWAYS AS ({FLIGHT_END_TIME_SQL}) STORED"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS flight_end_time_date_time ON flight (end_time, date_time)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS flight_date_time ON flight (date_time)"))
+    db.session.commit()
+
+def migrate_data_versions():
+    # Version triggers for tables created before data_version existed; create_all() only adds them to new tables.
+    # CREATE and DROP TRIGGER lock the table against writes, so only missing triggers are created and only
+    # retired ones dropped, and a boot against an up to date database takes no table locks.
+    for statement in VERSION_FUNCTIONS:
+        db.session.execute(text(statement))
+    existing = {(table_name, trigger) for table_name, trigger in db.session.execute(text(
+        "SELECT c.relname, t.tgname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+        "WHERE NOT t.tgisinternal AND c.relnamespace = to_regnamespace(current_schema())"))}
+    for table in [model.__table__ for model in VERSIONED_TABLES] + [FlightSeatAssignment.__table__]:
+        for trigger, statement in version_triggers(table).items():
+            if (table.name, trigger) not in existing:
+                db.session.execute(text(statement))
+    for table_name, trigger in RETIRED_TRIGGERS:
+        if (table_name, trigger) in existing:
+            db.session.execute(text(f"DROP TRIGGER {trigger} ON {table_name}"))
+    db.session.commit()
+
+def run_migrations():
+    migrate_seat_roles()
+    migrate_roster_job_seed()
+    migrate_roster_job_owner()
+    migrate_schedules_off_arrays()
+    migrate_crew_workload()
+    migrate_flight_filter_indexes()
+    migrate_flight_end_time()
+    migrate_data_versions()
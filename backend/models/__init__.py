@@ -7,4 +7,8 @@ from .pilot import Pilot
 from .cabin_crew import CabinCrew
 from .passenger import Passenger
 from .seat_assignment import FlightSeatAssignment
-from .user import User
\ No newline at end of file
+from .user import User
+from .person_schedule import PersonSchedule
+from .roster_job import RosterJob
+from .crew_workload import CrewWorkload
+from .data_version import DataVersion
@@ -3,6 +3,7 @@ from sqlalchemy.dialects.postgresql import ARRAY
 
 class CabinCrew(db.Model):
     __tablename__ = 'cabin_crew'
+    schedule_type = 'cabin_crew' # PersonSchedule.person_type value
     attendant_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     age = db.Column(db.Integer, nullable=False)
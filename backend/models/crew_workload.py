@@ -0,0 +1,24 @@
+from .base import db
+from datetime import timedelta
+
+class CrewWorkload(db.Model):
+    __tablename__ = 'crew_workload'
+
+    # Flights and minutes flown per person and week, kept up to date by every roster write
+    person_type = db.Column(db.String(50), primary_key=True)  # 'pilot', 'cabin_crew'
+    person_id = db.Column(db.Integer, primary_key=True)  # pilot_id or attendant_id
+    period_start = db.Column(db.Date, primary_key=True)  # Monday of the week the flights depart in
+    flights = db.Column(db.Integer, nullable=False, default=0)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+
+    # Sums over a window of weeks are answered by an index-only scan
+    __table_args__ = (
+        db.Index('crew_workload_window', person_type, period_start, person_id, postgresql_include=['flights', 'minutes']),
+    )
+
+    @staticmethod
+    def period_of(date_time):
+        return (date_time - timedelta(days=date_time.weekday())).date()
+
+    def __repr__(self):
+        return f'<CrewWorkload {self.person_type} {self.person_id} - {self.period_start}>'
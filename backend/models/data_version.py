@@ -0,0 +1,92 @@
+from .base import db
+from .flight import Flight
+from .airport import Airport
+from .seat_map import SeatMap
+from .pilot import Pilot
+from .cabin_crew import CabinCrew
+from .passenger import Passenger
+from .seat_assignment import FlightSeatAssignment
+from sqlalchemy import DDL, event
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    # Counters the database bumps in the same transaction as every write, so readers in any process can tell
+    # whether data changed with one primary key lookup. Kept by triggers, never written by the application.
+    scope = db.Column(db.String(64), primary_key=True)  # table name, '<table>:profile', or 'roster'
+    key = db.Column(db.Integer, primary_key=True, default=0)  # 0 for tables, flight_number for 'roster'
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.scope} {self.key} - {self.version}>'
+
+# Roster writes update columns that no table-wide counter may follow: a counter bumped by them would hold its row
+# lock until commit, queueing every roster transaction behind the next. People tables only have '<table>:profile',
+# which ignores updates of scheduled_flights alone, and 'flight' ignores updates of flight_menu alone, which chefs
+# add dishes to. Both change with the flight's 'roster' version instead.
+PROFILE_TABLES = (Pilot, CabinCrew, Passenger)
+VERSIONED_TABLES = (Flight, Airport, SeatMap) + PROFILE_TABLES
+ROSTER_COLUMNS = {'pilot': 'scheduled_flights', 'cabin_crew': 'scheduled_flights', 'passenger': 'scheduled_flights',
+                  'flight': 'flight_menu'}
+
+# Triggers of earlier versions that migrations drop, as (table, trigger)
+RETIRED_TRIGGERS = tuple((model.__tablename__, f"{model.__tablename__}_data_version") for model in PROFILE_TABLES + (Flight,))
+
+# Versions start from the clock in microseconds, so they keep growing when the tables are dropped and recreated
+_VERSION_CLOCK = """
+CREATE OR REPLACE FUNCTION data_version_clock() RETURNS bigint AS $$
+    SELECT (extract(epoch FROM clock_timestamp()) * 1000000)::bigint
+$$ LANGUAGE sql
+"""
+
+_BUMP_TABLE_VERSION = """
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_version (scope, key, version) VALUES (TG_ARGV[0], 0, data_version_clock())
+    ON CONFLICT (scope, key) DO UPDATE SET version = GREATEST(data_version.version + 1, EXCLUDED.version);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+# One bump per flight a statement touched; changed_rows (and old_rows for updates) are the statement's transition tables
+_BUMP_ROSTER_VERSIONS = """
+CREATE OR REPLACE FUNCTION bump_roster_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO data_version (scope, key, version)
+        SELECT 'roster', flight_id, data_version_clock() FROM (SELECT flight_id FROM changed_rows UNION SELECT flight_id FROM old_rows) AS flights
+        ON CONFLICT (scope, key) DO UPDATE SET version = GREATEST(data_version.version + 1, EXCLUDED.version);
+    ELSE
+        INSERT INTO data_version (scope, key, version)
+        SELECT DISTINCT 'roster', flight_id, data_version_clock() FROM changed_rows
+        ON CONFLICT (scope, key) DO UPDATE SET version = GREATEST(data_version.version + 1, EXCLUDED.version);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+
+VERSION_FUNCTIONS = (_VERSION_CLOCK, _BUMP_TABLE_VERSION, _BUMP_ROSTER_VERSIONS)
+
+
+def version_triggers(table):
+    # {trigger name: CREATE TRIGGER statement} for the version triggers of one table
+    name = table.name
+    if name == FlightSeatAssignment.__tablename__:
+        return {f"{name}_roster_{event_name}": f"CREATE TRIGGER {name}_roster_{event_name} AFTER {event_name.upper()} ON {name} "
+                                               f"REFERENCING {transitions} FOR EACH STATEMENT EXECUTE FUNCTION bump_roster_versions()"
+                for event_name, transitions in (('insert', 'NEW TABLE AS changed_rows'), ('delete', 'OLD TABLE AS changed_rows'),
+                                                ('update', 'OLD TABLE AS old_rows NEW TABLE AS changed_rows'))}
+
+    if name in ROSTER_COLUMNS:
+        # Generated columns cannot be assigned, they change with the columns they are computed from
+        columns = ', '.join(column.name for column in table.columns if column.name != ROSTER_COLUMNS[name] and column.computed is None)
+        trigger, scope = (f"{name}_profile_version", f"{name}:profile") if name != 'flight' else ("flight_columns_version", name)
+        return {trigger: f"CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OF {columns} OR DELETE OR TRUNCATE ON {name} "
+                         f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{scope}')"}
+    return {f"{name}_data_version": f"CREATE TRIGGER {name}_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {name} "
+                                    f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{name}')"}
+
+for table in [model.__table__ for model in VERSIONED_TABLES] + [FlightSeatAssignment.__table__]:
+    for statement in VERSION_FUNCTIONS + tuple(version_triggers(table).values()):
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
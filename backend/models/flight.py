@@ -4,12 +4,16 @@ from sqlalchemy import Sequence, Integer
 
 flight_number_seq = Sequence('flight_number_seq', start=1000, increment=1)
 
+FLIGHT_END_TIME_SQL = "date_time + duration * interval '1 minute'"
+
 
 class Flight(db.Model):
     flight_number = db.Column(db.Integer, flight_number_seq, primary_key=True, server_default=flight_number_seq.next_value())
     airline_code = db.Column(db.String(2), nullable=False) # AE
     date_time = db.Column(db.DateTime, nullable=False)
     duration = db.Column(db.Integer, nullable=False)
+    # Arrival, kept by the database so status filters are index range scans
+    end_time = db.Column(db.DateTime, db.Computed(FLIGHT_END_TIME_SQL, persisted=True))
     distance = db.Column(db.Integer, nullable=False)
     source_airport = db.Column(db.String, db.ForeignKey('airport.airport_code'), nullable=False)
     destination_airport = db.Column(db.String, db.ForeignKey('airport.airport_code'), nullable=False)
@@ -19,5 +23,19 @@ class Flight(db.Model):
     source = db.relationship('Airport', foreign_keys=[source_airport], backref='departures')
     destination = db.relationship('Airport', foreign_keys=[destination_airport], backref='arrivals')
 
+    # Airport code filters are equality matches on upper-case IATA codes; passed and active flights are
+    # ranges over end_time, pending flights over date_time
+    __table_args__ = (
+        db.Index('flight_source_airport', 'source_airport'),
+        db.Index('flight_destination_airport', 'destination_airport'),
+        db.Index('flight_end_time_date_time', 'end_time', 'date_time'),
+        db.Index('flight_date_time', 'date_time'),
+    )
+
+    def status_at(self, now):
+        if self.end_time < now:
+            return 'passed'
+        return 'active' if self.date_time <= now else 'pending'
+
     def __repr__(self):
         return f'<Flight {self.flight_number}>'
\ No newline at end of file
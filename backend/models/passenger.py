@@ -3,6 +3,7 @@ from sqlalchemy.dialects.postgresql import ARRAY
 
 class Passenger(db.Model):
     __tablename__ = 'passenger'
+    schedule_type = 'passenger' # PersonSchedule.person_type value
     passenger_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     age = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,36 @@
+from .base import db
+from datetime import timedelta
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import TSRANGE, Range, ExcludeConstraint
+
+class PersonSchedule(db.Model):
+    __tablename__ = 'person_schedule'
+
+    person_type = db.Column(db.String(50), primary_key=True)  # 'pilot', 'cabin_crew', 'passenger'
+    person_id = db.Column(db.Integer, primary_key=True)  # pilot_id, attendant_id or passenger_id
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.flight_number', ondelete='CASCADE'), primary_key=True)
+    during = db.Column(TSRANGE, nullable=False)  # [date_time, date_time + duration)
+
+    # The database rejects double-booking, and the GiST index answers "who is busy in [t1, t2)"
+    __table_args__ = (
+        ExcludeConstraint(
+            (person_type, '='), (person_id, '='), (during, '&&'),
+            using='gist', name='person_schedule_no_overlap'
+        ),
+    )
+
+    @staticmethod
+    def flight_range(flight):
+        end_time = flight.date_time + timedelta(minutes=flight.duration)
+        return Range(flight.date_time, end_time, bounds='[)')
+
+    @classmethod
+    def for_flight(cls, person_type, person_id, flight):
+        return cls(person_type=person_type, person_id=person_id, flight_id=flight.flight_number,
+                   during=cls.flight_range(flight))
+
+    def __repr__(self):
+        return f'<PersonSchedule {self.person_type} {self.person_id} - Flight {self.flight_id}>'
+
+# btree_gist provides the '=' operator classes the exclusion constraint needs for plain columns
+event.listen(PersonSchedule.__table__, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS btree_gist'))
@@ -3,6 +3,7 @@ from sqlalchemy.dialects.postgresql import ARRAY
 
 class Pilot(db.Model):
     __tablename__ = 'pilot'
+    schedule_type = 'pilot' # PersonSchedule.person_type value
     pilot_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     age = db.Column(db.Integer, nullable=False)
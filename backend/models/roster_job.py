@@ -0,0 +1,20 @@
+from .base import db
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+class RosterJob(db.Model):
+    __tablename__ = 'roster_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    flight_numbers = db.Column(ARRAY(db.Integer), nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False, default=50)
+    seed = db.Column(db.BigInteger, nullable=True)  # Makes the job's rosters reproducible when set
+    owner = db.Column(db.Integer, nullable=True)  # Token of the process running the job, see services/roster_jobs.py
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, finished, failed
+    results = db.Column(JSONB, nullable=True)  # One {"flight_number", "status", "message"} per flight once finished
+    error = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<RosterJob {self.id} {self.status}>'
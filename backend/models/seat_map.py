@@ -9,4 +9,5 @@ class SeatMap(db.Model):
     seat_number = db.Column(db.String(3), nullable=False)  # Including letters for seat designation
     seat_type = db.Column(db.String(50), nullable=False)  # business, economy, crew, etc.
     seat_group = db.Column(db.Integer, nullable=True)  # Group number for seat groups, for adjacent seats
-    seat_group_size = db.Column(db.Integer, nullable=True)  # Number of seats in the group
\ No newline at end of file
+    seat_group_size = db.Column(db.Integer, nullable=True)  # Number of seats in the group
+    seat_role = db.Column(db.String(50), nullable=True)  # Pilot and crew seats: senior, junior, trainee, chief, regular or chef
\ No newline at end of file
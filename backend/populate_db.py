@@ -4,7 +4,7 @@ import random
 import numpy as np
 import airportsdata
 from sqlalchemy.orm.attributes import flag_modified
-from services import seat_plan_auto, calculate_distance
+from services import calculate_distance, build_season_rosters
 from datetime import datetime, timedelta
 
 nationality_locale_mapping = {
@@ -38,68 +38,41 @@ nationality_locale_mapping = {
     'Argentine': ('es_AR', 'Spanish'),
 }
 
+# Cabin layout per aircraft type: pilot and crew roles with their seat counts in seating order,
+# then passenger sections as (seat_type, rows, seat group sizes across a row)
+NARROW_BODY_LAYOUT = {  # Boeing 737 and Airbus A320
+    "pilot": [("senior", 1), ("junior", 1), ("trainee", 2)],
+    "crew": [("chief", 2), ("regular", 8), ("chef", 2)],
+    "sections": [("business", 'ABCDEFGH', [2, 2]), ("economy", 'ABCDEFGHIJKLMNO', [3, 3])],
+}
+WIDE_BODY_LAYOUT = {  # Boeing 777
+    "pilot": [("senior", 2), ("junior", 2), ("trainee", 2)],
+    "crew": [("chief", 4), ("regular", 10), ("chef", 2)],
+    "sections": [("business", 'ABCDEFGHIJ', [2, 2]), ("economy", 'ABCDEFGHIJKLMNO', [2, 4, 2])],
+}
+CABIN_LAYOUTS = {1: NARROW_BODY_LAYOUT, 2: NARROW_BODY_LAYOUT, 3: WIDE_BODY_LAYOUT}
+
 def populate_seatmaps():
-        
-    # Populate Boeing 737 and Airbus A320 seat map
-    for i in range(1,3):
-        for k in range(1, 5):  # 4 Pilot seats
-            db.session.add(SeatMap(aircraft_type_id = i, seat_row="PL", seat_number=k, seat_type="pilot"))
-        for k in range(1, 13):  # 12 Crew seats
-            db.session.add(SeatMap(aircraft_type_id = i, seat_row="CR", seat_number=k, seat_type="crew"))
+    for aircraft_type_id, layout in CABIN_LAYOUTS.items():
+        for seat_type, seat_row in (("pilot", "PL"), ("crew", "CR")):
+            seat_number = 1
+            for seat_role, count in layout[seat_type]:
+                for _ in range(count):
+                    db.session.add(SeatMap(aircraft_type_id = aircraft_type_id, seat_row=seat_row, seat_number=seat_number, seat_type=seat_type, seat_role=seat_role))
+                    seat_number += 1
 
         seat_group_idx = 1
-
-        # 32 Businnes seats
-        for row in 'ABCDEFGH':  
-            for num in range(1, 3):  
-                db.session.add(SeatMap(aircraft_type_id = i, seat_row=row, seat_number=num, seat_type="business", seat_group= seat_group_idx, seat_group_size=2))
-            seat_group_idx += 1
-            for num in range(3, 5):  
-                db.session.add(SeatMap(aircraft_type_id = i, seat_row=row, seat_number=num, seat_type="business", seat_group= seat_group_idx, seat_group_size=2))
-            seat_group_idx += 1
-
-        # 90 Economy seats
-        for row in 'ABCDEFGHIJKLMNO':  
-            for num in range(1, 4):  
-                db.session.add(SeatMap(aircraft_type_id = i, seat_row=row, seat_number=num, seat_type="economy", seat_group= seat_group_idx, seat_group_size=3))
-            seat_group_idx += 1
-            for num in range(4, 7):  
-                db.session.add(SeatMap(aircraft_type_id = i, seat_row=row, seat_number=num, seat_type="economy", seat_group= seat_group_idx, seat_group_size=3))
-            seat_group_idx += 1
+        for seat_type, rows, group_sizes in layout["sections"]:
+            for row in rows:
+                seat_number = 1
+                for group_size in group_sizes:
+                    for _ in range(group_size):
+                        db.session.add(SeatMap(aircraft_type_id = aircraft_type_id, seat_row=row, seat_number=seat_number, seat_type=seat_type, seat_group= seat_group_idx, seat_group_size=group_size))
+                        seat_number += 1
+                    seat_group_idx += 1
 
         db.session.commit()
 
-    # Populate Boeing 777 seat map
-    for k in range(1, 7):  # 6 Pilot seats
-        db.session.add(SeatMap(aircraft_type_id = 3, seat_row="PL", seat_number=k, seat_type="pilot"))
-        
-    for k in range(1, 17):  # 16 Crew seats
-        db.session.add(SeatMap(aircraft_type_id = 3, seat_row="CR", seat_number=k, seat_type="crew"))
-    
-    seat_group_idx = 1
-    # 40 Businnes seats
-    for row in 'ABCDEFGHIJ':  
-        for num in range(1, 3):  
-            db.session.add(SeatMap(aircraft_type_id = 3, seat_row=row, seat_number=num, seat_type="business", seat_group= seat_group_idx, seat_group_size=2))
-        seat_group_idx += 1
-        for num in range(3, 5):  
-            db.session.add(SeatMap(aircraft_type_id = 3, seat_row=row, seat_number=num, seat_type="business", seat_group= seat_group_idx, seat_group_size=2))
-        seat_group_idx += 1
-
-    # 120 Economy seats
-    for row in 'ABCDEFGHIJKLMNO':  
-        for num in range(1, 3):  
-            db.session.add(SeatMap(aircraft_type_id = 3, seat_row=row, seat_number=num, seat_type="economy", seat_group= seat_group_idx, seat_group_size=2))
-        seat_group_idx += 1
-        for num in range(3, 7):  
-            db.session.add(SeatMap(aircraft_type_id = 3, seat_row=row, seat_number=num, seat_type="economy", seat_group= seat_group_idx, seat_group_size=4))
-        seat_group_idx += 1
-        for num in range(7, 9):  
-            db.session.add(SeatMap(aircraft_type_id = 3, seat_row=row, seat_number=num, seat_type="economy", seat_group= seat_group_idx, seat_group_size= 2))
-
-
-    db.session.commit()
-
 def populate_aircraft_types():
     db.session.add(AircraftType(
         name="Boeing 737",
@@ -309,17 +282,20 @@ def populate_airports():
     
     db.session.commit()
 
-def populate_flights_with_rosters(start_date, end_date, num_flights):
-    all_airports = Airport.query.all()
+def populate_flights_with_rosters(start_date, end_date, num_flights, workers=None, seed=None, matching=False):
+    # A seed makes both the generated flights and their rosters reproducible on a fresh database.
+    # matching plans the crew of the whole season at once instead of flight by flight
+    rng = random.Random(seed) if seed is not None else random
+    all_airports = Airport.query.order_by(Airport.airport_code).all()
     if len(all_airports) < 2:
         return "Not enough airports to create flights."
 
-    flight_counter = 0  # 
+    flights = []
 
     for _ in range(num_flights):
-        source_airport = random.choice(all_airports)
-        destination_airport = random.choice([airport for airport in all_airports if airport != source_airport])
-        vehicle_type_id = random.randint(1, 3)  # Assuming these IDs correspond to different aircraft types
+        source_airport = rng.choice(all_airports)
+        destination_airport = rng.choice([airport for airport in all_airports if airport != source_airport])
+        vehicle_type_id = rng.randint(1, 3)  # Assuming these IDs correspond to different aircraft types
 
         # Calculate distance and duration
         distance = calculate_distance(
@@ -335,9 +311,9 @@ def populate_flights_with_rosters(start_date, end_date, num_flights):
 
         # Generate a random datetime between the start_date and end_date
         time_between_dates = end_date - start_date
-        random_seconds = random.randrange(time_between_dates.total_seconds())
+        random_seconds = rng.randrange(int(time_between_dates.total_seconds()))
         flight_date = start_date + timedelta(seconds=random_seconds)
-        flight_date = flight_date.replace(hour=random.randint(0, 23), minute=0, second=0)
+        flight_date = flight_date.replace(hour=rng.randint(0, 23), minute=0, second=0)
 
         # Create the flight
         flight = Flight(
@@ -351,18 +327,22 @@ def populate_flights_with_rosters(start_date, end_date, num_flights):
             flight_menu=aircraft_type.standard_menu.copy()
         )
         db.session.add(flight)
-        db.session.flush()  # Flush to get the flight_number generated
+        flights.append(flight)
 
-        flight_counter += 1  # Increment the counter
-        if flight_counter % 25 == 0:  # If the counter is a multiple of 25
-            print(f"Created {flight_counter} flights")  # Print to the console
+    db.session.flush()  # Flush to get the flight_numbers generated
+    flight_numbers = [flight.flight_number for flight in flights]
+    db.session.commit()
+    print(f"Created {len(flight_numbers)} flights")
 
-        # Auto generate seat plan for this flight
-        result = seat_plan_auto(flight.flight_number, vehicle_type_id)
-        if result != "Seats assigned successfully":
-            db.session.rollback()  # Rollback if seat assignment fails
-            continue
+    # Roster the whole season at once, partitions are planned in parallel worker processes
+    outcome = build_season_rosters(flight_numbers, workers=workers, seed=seed, matching=matching)
+    print(f"Rostered {sum(1 for result in outcome['results'] if result['status'] == 'created')} flights, "
+          f"{outcome['replaced']} cross-partition bookings reconciled, {len(outcome['unfilled'])} crew slots unfilled")
 
-        db.session.commit()  # Commit after each flight and its seat assignments are successfully processed
+    # Flights whose roster could not be built are dropped, like before
+    failed = [result['flight_number'] for result in outcome['results'] if result['status'] != 'created']
+    if failed:
+        Flight.query.filter(Flight.flight_number.in_(failed)).delete(synchronize_session=False)
+        db.session.commit()
 
     return "Flights with rosters populated successfully."
\ No newline at end of file
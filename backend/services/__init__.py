@@ -1,3 +1,17 @@
+from .schedule_index import schedule_index
+from .seat_map_cache import seat_map_cache
 from .availability_service import find_available_pilots, find_available_cabin_crew, find_available_passengers, scheduleIsAvailable
 from .distance_service import calculate_distance
 from .seat_assignment_service import seat_plan_auto, assign_seats, assign_seats_for_passengers
+from .roster_batch import RosterContext, create_rosters
+from .season_roster import build_season_rosters
+from .roster_jobs import roster_jobs
+from .roster_repair import repair_rosters
+from .workload_service import load_distribution, workload_window
+from .pagination import encode_cursor, decode_cursor, keyset_page
+from .count_service import count_cache, count_rows, filter_key, parse_count_mode, total_fields
+from .response_cache import response_cache
+from .conditional_get import conditional_get, current_versions, scope_versions_total
+from .fieldsets import column_field, select_fields, load_fields, serialize
+from .json_provider import init_json_provider
+from .compression import compression
@@ -1,69 +1,94 @@
+import random
 from datetime import  timedelta
-from models import db, Flight, Pilot, CabinCrew, Passenger
+from flask import current_app
+from sqlalchemy import exists, any_, literal
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import db, Flight, Pilot, CabinCrew, Passenger, PersonSchedule
+from .schedule_index import schedule_index
+from .workload_service import CREW_TYPES, least_loaded_ids, workload_window
 
 def scheduleIsAvailable(start_time, end_time, person_type, id):
-    scheduled_flights = person_type.query.get(id).scheduled_flights
-    for flight_number in scheduled_flights:
-        flight = Flight.query.get(flight_number)
-        if flight.date_time < end_time and flight.date_time + timedelta(minutes = flight.duration) > start_time:
-            return False
-    return True
+    # Answered from the in-memory schedule index, no queries once the person type is loaded
+    return schedule_index.is_available(person_type, id, start_time, end_time)
 
-def find_available_pilots(flight_id, pilot_type, num_needed):
-    flight_start_time = Flight.query.get(flight_id).date_time
-    flight_end_time = flight_start_time + timedelta(minutes = Flight.query.get(flight_id).duration)
-    flight_distance = Flight.query.get(flight_id).distance
-    vehicle_type_id = Flight.query.get(flight_id).aircraft_type_id
+def schedule_conflict(person_type, id_column, start_time, end_time):
+    # Correlated EXISTS over person_schedule, resolved by the GiST index behind its exclusion constraint
+    return exists().where(
+        PersonSchedule.person_type == person_type.schedule_type,
+        PersonSchedule.person_id == id_column,
+        PersonSchedule.during.op('&&')(db.func.tsrange(start_time, end_time))
+    )
 
-    unavailable_pilots = set()
-    found_pilots = []
-    while(len(found_pilots) != num_needed):
-        pilot = Pilot.query.filter(Pilot.seniority_level == pilot_type, Pilot.vehicle_type_id == vehicle_type_id
-        ).filter(Pilot.pilot_id.notin_(unavailable_pilots)
-        ).order_by(db.func.random()).first()
-        if pilot is None:
-            return "Error"
-        if (pilot.allowed_range < flight_distance) or (not scheduleIsAvailable(flight_start_time, flight_end_time, Pilot, pilot.pilot_id)):
-            unavailable_pilots.add(pilot.pilot_id)
-        else:
-          found_pilots.append(pilot.pilot_id)
-    return found_pilots
+# Probe rounds before falling back to sampling every match; each round draws SAMPLE_GROWTH times more ids
+SAMPLE_ROUNDS = 3
+SAMPLE_GROWTH = 4
 
-def find_available_cabin_crew(flight_id, cabin_crew_type, num_needed):
-    flight_start_time = Flight.query.get(flight_id).date_time
-    flight_end_time = flight_start_time + timedelta(minutes=Flight.query.get(flight_id).duration)
-    vehicle_type_id = Flight.query.get(flight_id).aircraft_type_id
+def _sample_ids(id_column, num_needed, *criteria, rng=random):
+    # Draws random ids from the primary key range and keeps the ones matching criteria, so a search costs
+    # a few index lookups instead of sorting the whole table. Sparse matches fall back to sampling every match.
+    # All randomness comes from rng, rows are sorted before use, so a seeded rng gives the same picks every run.
+    low, high = db.session.query(db.func.min(id_column), db.func.max(id_column)).one()
+    if low is None:
+        return []
+    found = []
+    tried = set()
+    batch = num_needed * SAMPLE_GROWTH
+    for _ in range(SAMPLE_ROUNDS):
+        untried = high - low + 1 - len(tried)
+        if untried <= 0:
+            break
+        probe = []
+        while len(probe) < min(batch, untried):
+            candidate = rng.randint(low, high)
+            if candidate not in tried:
+                tried.add(candidate)
+                probe.append(candidate)
+        rows = sorted(row[0] for row in db.session.query(id_column).filter(
+            id_column == any_(literal(probe, ARRAY(db.Integer))), *criteria).all())
+        rng.shuffle(rows)
+        found += rows[:num_needed - len(found)]
+        if len(found) == num_needed:
+            return found
+        batch *= SAMPLE_GROWTH
 
-    unavailable_cabin_crew = set()
-    found_cabin_crew = []
-    while(len(found_cabin_crew) != num_needed):
-        cabin_crew = CabinCrew.query.filter(
-            CabinCrew.attendant_type == cabin_crew_type,
-            CabinCrew.vehicle_type_ids.op('@>')([vehicle_type_id])
-        ).filter(CabinCrew.attendant_id.notin_(unavailable_cabin_crew)
-        ).order_by(db.func.random()).first()
+    rest = [row[0] for row in db.session.query(id_column).filter(
+        *criteria, id_column.notin_(found)
+    ).order_by(id_column).all()]
+    return found + rng.sample(rest, min(len(rest), num_needed - len(found)))
 
-        if cabin_crew is None:
-            return "Error"
-        if (not scheduleIsAvailable(flight_start_time, flight_end_time, CabinCrew, cabin_crew.attendant_id)):
-            unavailable_cabin_crew.add(cabin_crew.attendant_id)
-        else:
-          found_cabin_crew.append(cabin_crew.attendant_id)
-    return found_cabin_crew
+def crew_selection_policy():
+    # 'random' (default) samples eligible crew, 'least_loaded' takes whoever flew least in the workload window
+    return current_app.config.get('CREW_SELECTION_POLICY', 'random')
 
-def find_available_passengers(flight_id, num_needed):
-    flight_start_time = Flight.query.get(flight_id).date_time
-    flight_end_time = flight_start_time + timedelta(minutes = Flight.query.get(flight_id).duration)
+def _find_available(flight, person_type, id_column, num_needed, *criteria, rng=random):
+    # Eligibility and schedule overlap are both resolved in SQL, over randomly sampled ids or by workload
+    if num_needed <= 0:
+        return []
+    flight_start_time = flight.date_time
+    flight_end_time = flight_start_time + timedelta(minutes = flight.duration)
 
-    unavailable_passengers = set()
-    found_passengers = []
-    while(len(found_passengers) != num_needed):
-        passenger = Passenger.query.filter(Passenger.passenger_id.notin_(unavailable_passengers)
-        ).order_by(db.func.random()).first()
-        if passenger is None:
-            return "Error"
-        if (not scheduleIsAvailable(flight_start_time, flight_end_time, Passenger, passenger.passenger_id)):
-            unavailable_passengers.add(passenger.passenger_id)
-        else:
-          found_passengers.append(passenger.passenger_id)
-    return found_passengers
\ No newline at end of file
+    criteria += (~schedule_conflict(person_type, id_column, flight_start_time, flight_end_time),)
+    if person_type in CREW_TYPES and crew_selection_policy() == 'least_loaded':
+        ids = least_loaded_ids(person_type, id_column, num_needed, workload_window(flight_start_time), *criteria)
+    else:
+        ids = _sample_ids(id_column, num_needed, *criteria, rng=rng)
+    if len(ids) < num_needed:
+        return "Error"
+    return ids
+
+def find_available_pilots(flight_id, pilot_type, num_needed, rng=random):
+    flight = db.session.get(Flight, flight_id)
+    return _find_available(flight, Pilot, Pilot.pilot_id, num_needed,
+                           Pilot.seniority_level == pilot_type,
+                           Pilot.vehicle_type_id == flight.aircraft_type_id,
+                           Pilot.allowed_range >= flight.distance, rng=rng)
+
+def find_available_cabin_crew(flight_id, cabin_crew_type, num_needed, rng=random):
+    flight = db.session.get(Flight, flight_id)
+    return _find_available(flight, CabinCrew, CabinCrew.attendant_id, num_needed,
+                           CabinCrew.attendant_type == cabin_crew_type,
+                           CabinCrew.vehicle_type_ids.op('@>')([flight.aircraft_type_id]), rng=rng)
+
+def find_available_passengers(flight_id, num_needed, rng=random):
+    flight = db.session.get(Flight, flight_id)
+    return _find_available(flight, Passenger, Passenger.passenger_id, num_needed, rng=rng)
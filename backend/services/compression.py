@@ -0,0 +1,70 @@
+import gzip
+from flask import request
+
+# Response compression negotiated from Accept-Encoding: brotli when the client takes it and the brotli package is
+# installed, else gzip. Only bodies of at least COMPRESS_MIN_SIZE bytes (default 1024) in a text-like mimetype are
+# compressed; small bodies gain little and streamed exports are sent as they are. COMPRESS_GZIP_LEVEL (default 4)
+# and COMPRESS_BROTLI_QUALITY (default 3) trade CPU for size; higher settings shrink /airports by about 4% for
+# twice the CPU. A compressed body is another representation of the resource, so a strong ETag on it is made
+# weak, as If-None-Match compares weakly anyway.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+
+
+def _encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+class Compression:
+
+    def __init__(self):
+        self.min_size = 1024
+        self.gzip_level = 4
+        self.brotli_quality = 3
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 4)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 3)
+        if app.config.get('COMPRESS_RESPONSES', True):
+            app.after_request(self.compress)
+
+    def encoding_for(self, accept_encodings):
+        # The encoding the client weights highest among those we have; None for identity
+        best, best_quality = None, 0
+        for encoding in _encodings():
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def encode(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def compress(self, response):
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304) or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        encoding = self.encoding_for(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.set_data(self.encode(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compression = Compression()
@@ -0,0 +1,75 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response, Response
+from sqlalchemy import and_, case, tuple_
+from models import db, DataVersion, FlightSeatAssignment, PersonSchedule
+
+# Strong ETags from the data_version counters: a response's tag hashes the endpoint, its normalized query string
+# and the versions of everything it is built from, read before the view runs in one primary key lookup, plus a join
+# for views showing people's schedules. A request whose If-None-Match holds the current tag gets a 304 without the
+# view's queries. Versions are read first, so a write landing while the view runs can only make the tag older than
+# the body, which costs a refetch, never a stale 304.
+
+
+def current_versions(tables=(), flight_id=None):
+    # [version] of each table scope, then of the flight's roster; 0 where nothing was written yet
+    keys = [(scope, 0) for scope in tables]
+    if flight_id is not None:
+        keys.append(('roster', flight_id))
+    if not keys:
+        return []
+    rows = dict(((scope, key), version) for scope, key, version in db.session.query(
+        DataVersion.scope, DataVersion.key, DataVersion.version).filter(tuple_(DataVersion.scope, DataVersion.key).in_(keys)))
+    return [rows.get(key, 0) for key in keys]
+
+
+def scheduled_roster_versions(flight_id):
+    # ['flight:version'] of the rosters of every flight the people on flight_id are booked on, in flight order.
+    # A person's scheduled_flights only change with a roster, so this list changes whenever any of theirs does.
+    person_type = case((FlightSeatAssignment.seater_type == 'Passenger', 'passenger'),
+                       (FlightSeatAssignment.seater_type.like('%Pilot'), 'pilot'), else_='cabin_crew')
+    rows = db.session.query(PersonSchedule.flight_id, db.func.coalesce(DataVersion.version, 0)).select_from(FlightSeatAssignment).join(
+        PersonSchedule, and_(PersonSchedule.person_type == person_type, PersonSchedule.person_id == FlightSeatAssignment.seater_id)
+    ).outerjoin(DataVersion, and_(DataVersion.scope == 'roster', DataVersion.key == PersonSchedule.flight_id)
+    ).filter(FlightSeatAssignment.flight_id == flight_id).distinct().order_by(PersonSchedule.flight_id)
+    return [f"{flight}:{version}" for flight, version in rows]
+
+
+def scope_versions_total(scope):
+    # (keys, sum of versions) of a per-key scope such as 'roster'. Versions only grow, so the sum changes with
+    # every commit that bumps one, whatever order concurrent writers commit in
+    return tuple(db.session.query(db.func.count(), db.func.coalesce(db.func.sum(DataVersion.version), 0)).filter(
+        DataVersion.scope == scope).one())
+
+
+def request_etag(versions, *extra):
+    args = sorted((name, value) for name, value in request.args.items(multi=True) if value.strip())
+    parts = [request.endpoint, repr(args)] + [str(version) for version in versions] + [str(value) for value in extra]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()[:32]
+
+
+def conditional_get(tables=(), roster=False, schedules=False, extra=None):
+    # ETag and If-None-Match for a GET view built from tables (data_version scopes) and, with roster=True, the
+    # roster of its flight_id; schedules=True adds the scheduled flights of everyone on that roster.
+    # extra() adds whatever else the body depends on, such as the clock. Goes under
+    # @jwt_required() and above @response_cache.cached so a 304 skips the response cache too.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = current_versions(tables, kwargs.get('flight_id') if roster else None)
+            if schedules:
+                versions += scheduled_roster_versions(kwargs.get('flight_id'))
+            etag = request_etag(versions, *(extra() if extra else ()))
+            # Weak comparison, as for any If-None-Match: compression hands out the same tag weakened
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Clients may keep the body but must ask before reusing it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
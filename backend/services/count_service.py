@@ -0,0 +1,110 @@
+import json
+import time
+from collections import OrderedDict
+from threading import RLock
+from flask import current_app
+from sqlalchemy.sql.util import find_tables
+from models import db
+from .write_tracker import on_committed_writes
+
+# Totals for list endpoints, in the mode a client asks for with ?count=:
+#   exact     a COUNT(*) with the list's filters, every time
+#   cached    the exact count, kept per list and normalized filter set for COUNT_CACHE_TTL seconds (default 60)
+#             and dropped as soon as a commit writes to any table the list reads; the least recently used
+#             counts go first past 1024 entries, so one-off searches do not pile up
+#   estimate  the planner's row estimate for the filtered query, from EXPLAIN; no rows are read
+#   none      no total at all
+
+COUNT_MODES = ('exact', 'cached', 'estimate', 'none')
+
+# Request arguments that page through a list or pick its fields without changing which rows it has
+PAGING_ARGS = ('page', 'per_page', 'cursor', 'count', 'include_total', 'fields')
+
+class CountCache:
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = RLock()
+        self._entries = OrderedDict()  # key -> (count, expires_at, tables), least recently used first
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, count, tables, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (count, time.monotonic() + ttl, frozenset(tables))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables=None):
+        # Drops the counts that read any of the given tables, or everything
+        with self._lock:
+            if tables is None:
+                self._entries.clear()
+                return
+            self._entries = OrderedDict((key, entry) for key, entry in self._entries.items() if not entry[2] & tables)
+
+
+count_cache = CountCache()
+
+
+def parse_count_mode(value, default):
+    # ValueError for modes we do not know
+    mode = (value or default).lower()
+    if mode not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+    return mode
+
+
+def filter_key(list_name, args):
+    # Same filters in any order, with or without paging arguments or blank values, give the same key
+    filters = sorted((name, value.strip()) for name, value in args.items(multi=True)
+                     if name not in PAGING_ARGS and value.strip())
+    return list_name, json.dumps(filters)
+
+
+def estimated_count(query):
+    statement = query.order_by(None).statement
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True})
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(query, mode, key=None):
+    # Total of a filtered list query in the given mode, None for mode 'none'
+    if mode == 'none':
+        return None
+    if mode == 'estimate':
+        return estimated_count(query)
+    query = query.order_by(None)
+    if mode == 'cached' and key is not None:
+        count = count_cache.get(key)
+        if count is None:
+            count = query.count()
+            tables = {table.name for table in find_tables(query.statement)}
+            count_cache.put(key, count, tables, current_app.config.get('COUNT_CACHE_TTL', 60))
+        return count
+    return query.count()
+
+
+def total_fields(total, mode, per_page):
+    # Response fields for a total; empty when no total was counted
+    if total is None:
+        return {}
+    return {"total": total, "pages": -(-total // per_page), "total_mode": mode}
+
+
+@on_committed_writes
+def _invalidate_counts(writes):
+    count_cache.invalidate(None if writes is None else frozenset(writes))
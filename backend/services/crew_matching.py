@@ -0,0 +1,268 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from models import Pilot, CabinCrew
+from .roster_batch import RosterContext
+from .seat_assignment_service import crew_requirements, roster_rng
+
+# Horizon-level crew assignment. Flights are taken in departure order in cliques of mutually overlapping flights,
+# where nobody can fly two of them, so each clique and role is a transportation problem: flights ask for head
+# counts, crew classes (people who can fly the same flights) offer the members who are free. It is solved as a
+# min-cost flow where using a class costs the demand of later flights it is needed for and that the flight
+# would keep it away from. Long-range pilots therefore go to short flights only when nobody else can, or when
+# they are back before the long-haul flights need them.
+
+# (requirements key, person type, pilot seniority or attendant type, error when it cannot be filled)
+CREW_ROLES = (
+    ("senior_pilots", Pilot, "senior", "Not enough available senior pilots"),
+    ("junior_pilots", Pilot, "junior", "Not enough available junior pilots"),
+    ("trainee_pilots", Pilot, "trainee", None),
+    ("chief_cabin_crews", CabinCrew, "chief", "Not enough available senior cabin crew"),
+    ("regular_cabin_crews", CabinCrew, "regular", "Not enough available regular cabin crew"),
+    ("chefs", CabinCrew, "chef", None),
+)
+
+_COST_SCALE = 1000  # costs are kept integral so the solver is exact
+
+
+def crew_classes(pools, person_type, kind):
+    # {(vehicle type ids, allowed range or None): [person_id]} for one role of a snapshot pool set, in id order
+    members = {}
+    for key, pool in pools.items():
+        if key[0] != person_type.schedule_type or key[1] != kind:
+            continue
+        for entry in pool:
+            if person_type is Pilot:
+                person_id, allowed_range = entry
+                members[person_id] = ((key[2],), allowed_range)
+            else:
+                vehicle_types, _ = members.get(entry, ((), None))
+                members[entry] = (vehicle_types + (key[2],), None)
+    classes = {}
+    for person_id in sorted(members):
+        vehicle_types, allowed_range = members[person_id]
+        classes.setdefault((tuple(sorted(vehicle_types)), allowed_range), []).append(person_id)
+    return classes
+
+
+def _eligible(crew_class, slot):
+    vehicle_types, allowed_range = crew_class
+    return slot.aircraft_type_id in vehicle_types and (allowed_range is None or allowed_range >= slot.distance)
+
+
+class MinCostFlow:
+    # Successive shortest paths with SPFA; graphs here are a clique's flights and a role's classes, a few hundred edges
+
+    def __init__(self, num_nodes):
+        self._graph = [[] for _ in range(num_nodes)]
+        self._edges = []  # [to, capacity, cost], the reverse edge of edge e is e ^ 1
+
+    def add_edge(self, source, target, capacity, cost):
+        self._graph[source].append(len(self._edges))
+        self._edges.append([target, capacity, cost])
+        self._graph[target].append(len(self._edges))
+        self._edges.append([source, 0, -cost])
+        return len(self._edges) - 2
+
+    def flow(self, edge):
+        return self._edges[edge ^ 1][1]
+
+    def solve(self, source, sink):
+        total = 0
+        while True:
+            distance = [None] * len(self._graph)
+            parent = [None] * len(self._graph)
+            in_queue = [False] * len(self._graph)
+            distance[source] = 0
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                in_queue[node] = False
+                for e in self._graph[node]:
+                    target, capacity, cost = self._edges[e]
+                    if capacity > 0 and (distance[target] is None or distance[node] + cost < distance[target]):
+                        distance[target] = distance[node] + cost
+                        parent[target] = e
+                        if not in_queue[target]:
+                            in_queue[target] = True
+                            queue.append(target)
+            if distance[sink] is None:
+                return total
+            push = None
+            node = sink
+            while node != source:
+                e = parent[node]
+                push = self._edges[e][1] if push is None else min(push, self._edges[e][1])
+                node = self._edges[e ^ 1][0]
+            node = sink
+            while node != source:
+                e = parent[node]
+                self._edges[e][1] -= push
+                self._edges[e ^ 1][1] += push
+                node = self._edges[e ^ 1][0]
+            total += push
+
+
+class _RolePool:
+    # Members of one role by class: free ones, and busy ones sorted by the end of their last flight in the horizon
+
+    def __init__(self, person_type, classes, slots, needs, context):
+        self.person_type = person_type
+        self.classes = list(classes)
+        self.sizes = [len(classes[crew_class]) for crew_class in self.classes]
+        self.free = [list(classes[crew_class]) for crew_class in self.classes]
+        self.busy = [[] for _ in self.classes]
+        self._context = context
+        self._starts = [slot.start for slot in slots]
+        self.eligible = [[c for c, crew_class in enumerate(self.classes) if _eligible(crew_class, slot)] for slot in slots]
+
+        # Demand pressure of each flight, its head count over everyone who could fly it, summed per class in departure order
+        self._pressure = [[0.0] * (len(slots) + 1) for _ in self.classes]
+        for i, eligible in enumerate(self.eligible):
+            supply = sum(self.sizes[c] for c in eligible)
+            weight = needs[i] / supply if supply else 0.0
+            for c, prefix in enumerate(self._pressure):
+                prefix[i + 1] = prefix[i] + (weight if c in eligible else 0.0)
+
+    def cost(self, c, slot, horizon_start):
+        # Pressure of the later flights (from index horizon_start on) that leave while the class member is away on slot
+        end = bisect_left(self._starts, slot.end)
+        if end <= horizon_start:
+            return 0
+        return int(round((self._pressure[c][end] - self._pressure[c][horizon_start]) * _COST_SCALE))
+
+    def advance(self, time):
+        for c, busy in enumerate(self.busy):
+            back = bisect_right(busy, (time, float('inf')))
+            if back:
+                self.free[c] += [person_id for _, person_id in busy[:back]]
+                del busy[:back]
+
+    def available(self, c, time):
+        return len(self.free[c]) + bisect_right(self.busy[c], (time, float('inf')))
+
+    def take(self, c, slot, num_needed, rng):
+        free = self.free[c]
+        taken, skipped = [], []
+        while len(taken) < num_needed and free:
+            i = rng.randrange(len(free))
+            free[i], free[-1] = free[-1], free[i]
+            person_id = free.pop()
+            # Schedules committed before the horizon still count
+            if self._context.is_available(self.person_type, person_id, slot.start, slot.end):
+                taken.append(person_id)
+            else:
+                skipped.append(person_id)
+        free += skipped
+        for person_id in taken:
+            insort(self.busy[c], (slot.end, person_id))
+        return taken
+
+    def give_back(self, c, slot, person_ids):
+        for person_id in person_ids:
+            self.busy[c].remove((slot.end, person_id))
+            self.free[c].append(person_id)
+
+
+def _cliques(slots):
+    # Consecutive runs of flights, in departure order, that all overlap each other
+    clique = []
+    clique_end = None
+    for i, slot in enumerate(slots):
+        if clique and slot.start >= clique_end:
+            yield clique
+            clique = []
+        clique_end = slot.end if not clique else min(clique_end, slot.end)
+        clique.append(i)
+    if clique:
+        yield clique
+
+
+def _solve_clique(pool, slots, clique, needs, rng_for):
+    # needs: {index: head count} for the clique. Returns {index: [(class, person_id)]} and {index: missing head count}
+    source, sink = 0, len(clique) + len(pool.classes) + 1
+    solver = MinCostFlow(sink + 1)
+    latest = max(slots[i].start for i in clique)
+    for c in range(len(pool.classes)):
+        solver.add_edge(len(clique) + 1 + c, sink, pool.available(c, latest), 0)
+    allocations = []
+    for f, i in enumerate(clique):
+        solver.add_edge(source, f + 1, needs[i], 0)
+        for c in pool.eligible[i]:
+            edge = solver.add_edge(f + 1, len(clique) + 1 + c, pool.available(c, slots[i].start), pool.cost(c, slots[i], clique[-1] + 1))
+            allocations.append((i, c, edge))
+    solver.solve(source, sink)
+
+    picks, missing = {}, {}
+    for i in clique:
+        slot = slots[i]
+        pool.advance(slot.start)
+        rng = rng_for(slot.flight_number)
+        chosen = []
+        for j, c, edge in allocations:
+            if j == i and solver.flow(edge):
+                chosen += [(c, person_id) for person_id in pool.take(c, slot, solver.flow(edge), rng)]
+        # Counts are estimates when committed schedules get in the way, so shortfalls spill over to the other eligible classes
+        for c in sorted(pool.eligible[i], key=lambda c: pool.cost(c, slot, clique[-1] + 1)):
+            if len(chosen) >= needs[i]:
+                break
+            chosen += [(c, person_id) for person_id in pool.take(c, slot, needs[i] - len(chosen), rng)]
+        picks[i] = chosen
+        if len(chosen) < needs[i]:
+            missing[i] = needs[i] - len(chosen)
+    return picks, missing
+
+
+def plan_horizon(slots, pools, schedules, seed):
+    # Plans the crew of every flight at once, then passengers. Returns ({flight_number: assign_seats arguments or
+    # error message}, unfilled slots) before anything is written, so callers can report what cannot be staffed.
+    slots = sorted(slots, key=lambda slot: (slot.start, slot.flight_number))
+    context = RosterContext(pools=pools, schedules=schedules)
+    context.add_flights(slots)
+    rngs = {slot.flight_number: roster_rng(seed, slot.flight_number) for slot in slots}
+
+    plans = {}
+    requirements = []
+    for slot in slots:
+        requirement = crew_requirements(slot.aircraft_type_id, rngs[slot.flight_number])
+        if requirement is None:
+            plans[slot.flight_number] = "Invalid vehicle type ID"
+        requirements.append(requirement or {})
+
+    role_pools = []
+    for key, person_type, kind, error in CREW_ROLES:
+        needs = [requirement.get(key, 0) for requirement in requirements]
+        role_pools.append(_RolePool(person_type, crew_classes(pools, person_type, kind), slots, needs, context))
+
+    rosters = {slot.flight_number: {} for slot in slots}
+    unfilled = []
+    for clique in _cliques(slots):
+        taken = {i: [] for i in clique}  # index -> [(role pool, class, person_ids)] to give back if the flight fails
+        for (key, person_type, kind, error), pool in zip(CREW_ROLES, role_pools):
+            open_flights = [i for i in clique if slots[i].flight_number not in plans]
+            needs = {i: requirements[i].get(key, 0) for i in open_flights}
+            picks, missing = _solve_clique(pool, slots, open_flights, needs, rngs.get) if open_flights else ({}, {})
+            for i, chosen in picks.items():
+                slot = slots[i]
+                rosters[slot.flight_number][key] = [person_id for _, person_id in chosen]
+                for c in set(c for c, _ in chosen):
+                    taken[i].append((pool, c, [person_id for class_index, person_id in chosen if class_index == c]))
+                if i in missing:
+                    unfilled.append({"flight_number": slot.flight_number, "role": key, "missing": missing[i]})
+                    if error is not None:
+                        plans[slot.flight_number] = error
+                        for role_pool, c, person_ids in taken[i]:
+                            role_pool.give_back(c, slot, person_ids)
+
+        # Passengers per clique, while its crew can still be given back to the flights after it
+        for i in clique:
+            slot = slots[i]
+            if slot.flight_number in plans:
+                continue
+            passengers = context.find_available_passengers(slot.flight_number, requirements[i]["passengers"], rng=rngs[slot.flight_number])
+            if passengers == "Error":
+                plans[slot.flight_number] = "Not enough available passengers"
+                for role_pool, c, person_ids in taken[i]:
+                    role_pool.give_back(c, slot, person_ids)
+                continue
+            plans[slot.flight_number] = dict(rosters[slot.flight_number], passengers=passengers)
+    return plans, unfilled
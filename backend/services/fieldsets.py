@@ -0,0 +1,37 @@
+from sqlalchemy.orm import load_only
+
+# Sparse fieldsets for list endpoints: ?fields=name,age returns only those keys, and loads only the columns
+# they are built from. A list describes its fields as {name: (columns, get)}, where get(row, *context) returns
+# the value and columns are the entity attributes it reads. Without ?fields= every field is returned.
+
+
+def column_field(column):
+    # A field that is the value of one column
+    return (column,), lambda row, *context: getattr(row, column.key)
+
+
+def select_fields(fields, value):
+    # The subset of fields named in value, a comma separated ?fields=, in the order asked for; all of them
+    # without one. ValueError for names the list does not have
+    if not value or not value.strip():
+        return fields
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(fields)}")
+    return {name: fields[name] for name in names}
+
+
+def selected_columns(selected):
+    # In order, without duplicates; dict keys compare attributes by identity where == would build SQL
+    return list(dict.fromkeys(column for field_columns, _ in selected.values() for column in field_columns))
+
+
+def load_fields(query, selected, *always):
+    # query loading only the entity columns the selected fields read, and always; primary keys are always loaded
+    columns = list(dict.fromkeys(list(always) + selected_columns(selected)))
+    return query.options(load_only(*columns)) if columns else query
+
+
+def serialize(row, selected, *context):
+    return {name: get(row, *context) for name, (_, get) in selected.items()}
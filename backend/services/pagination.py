@@ -0,0 +1,36 @@
+import base64
+import json
+
+# Keyset (cursor) pagination: a page is "the next per_page rows after the last key seen", answered by the index
+# on the key, so page 500 costs what page 1 costs. Cursors are opaque to clients: base64 of the last key.
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps({"after": key}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # The key a cursor points after; ValueError for anything that is not a cursor we issued
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return payload["after"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(query, key_column, per_page, cursor=None, offset=0, key=None):
+    # query must be ordered by key_column alone. Returns (rows, next_cursor), next_cursor None on the last page.
+    # Without a cursor the page starts at offset, for clients jumping to a page they have no cursor for.
+    if cursor is not None:
+        try:
+            after = key_column.type.python_type(decode_cursor(cursor))
+        except TypeError as e:
+            raise ValueError("Invalid cursor") from e
+        query = query.filter(key_column > after)
+    elif offset:
+        query = query.offset(offset)
+    rows = query.limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, encode_cursor(key(rows[-1]) if key else getattr(rows[-1], key_column.key))
@@ -0,0 +1,245 @@
+import fnmatch
+import json
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import RLock
+from urllib.parse import urlencode
+from flask import request, make_response, Response
+from .write_tracker import on_committed_writes
+
+# Whole responses of read-heavy GET endpoints, keyed by endpoint and normalized query string. Each entry is
+# tagged with what it was built from: a table name for "any write to the table", or "<table>:rows" for "rows
+# added to or removed from the table" (enough for endpoints that only count rows). A commit drops exactly the
+# entries whose tags it wrote, so creating a pilot leaves the cached flight lists alone and rostering, which only
+# updates people, leaves the counts on /details alone. Entries also expire after RESPONSE_CACHE_TTL seconds
+# (default 60). Views whose body depends on more than the database, such as the clock, add it to the key with vary.
+#
+# Backends, chosen with RESPONSE_CACHE_BACKEND:
+#   lru    per-process LRU of RESPONSE_CACHE_SIZE entries (default 1024); the default
+#   redis  shared by every process, at RESPONSE_CACHE_REDIS_URL, or in a LocalRedis stand-in without one
+#   none   no caching
+# With several worker processes only redis sees every process's writes.
+
+
+def _row_tag(table):
+    return f"{table}:rows"
+
+
+def write_tags(writes):
+    # The tags a commit's {table: operations} invalidates
+    tags = set()
+    for table, operations in writes.items():
+        tags.add(table)
+        if 'insert' in operations or 'delete' in operations:
+            tags.add(_row_tag(table))
+    return tags
+
+
+class LRUBackend:
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = RLock()
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags), least recently used first
+        self._tagged = {}  # tag -> keys
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl, tags):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, frozenset(tags))
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tagged.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+
+class RedisBackend:
+    # Values are strings under prefix + key; each tag is a set of the keys carrying it
+
+    def __init__(self, client, prefix='response_cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl, tags):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+        for tag in tags:
+            self.client.sadd(self.prefix + 'tag:' + tag, key)
+            self.client.expire(self.prefix + 'tag:' + tag, ttl)
+
+    def invalidate_tags(self, tags):
+        tag_keys = [self.prefix + 'tag:' + tag for tag in tags]
+        keys = set()
+        for tag_key in tag_keys:
+            keys.update(key.decode() if isinstance(key, bytes) else key for key in self.client.smembers(tag_key))
+        self.client.delete(*tag_keys, *(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class LocalRedis:
+    # In-process stand-in for the few redis.Redis commands RedisBackend uses, for tests and single-process setups
+
+    def __init__(self):
+        self._lock = RLock()
+        self._values = {}  # key -> (value, expires_at or None)
+
+    def _live(self, key):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else entry[0].encode()
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._values[key] = (value, None if ex is None else time.monotonic() + ex)
+            return True
+
+    def sadd(self, key, *members):
+        with self._lock:
+            entry = self._live(key)
+            values = set() if entry is None else entry[0]
+            added = len(set(members) - values)
+            self._values[key] = (values | set(members), None if entry is None else entry[1])
+            return added
+
+    def smembers(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return set() if entry is None else {member.encode() for member in entry[0]}
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._values[key] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._values.pop(key, None) is not None)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            return [key for key in list(self._values) if self._live(key) is not None and fnmatch.fnmatchcase(key, match)]
+
+
+class ResponseCache:
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 60
+        self._generation = 0  # commits seen by this process
+
+    def init_app(self, app):
+        kind = app.config.get('RESPONSE_CACHE_BACKEND', 'lru')
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+        if kind == 'lru':
+            self.backend = LRUBackend(app.config.get('RESPONSE_CACHE_SIZE', 1024))
+        elif kind == 'redis':
+            url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+            if url:
+                import redis
+                client = redis.Redis.from_url(url)
+            else:
+                client = LocalRedis()
+            self.backend = RedisBackend(client)
+        elif kind == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND {kind!r}")
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def request_key(vary=None):
+        # Same arguments in any order, and with or without blank ones, give the same key
+        args = sorted((name, value) for name, value in request.args.items(multi=True) if value.strip())
+        key = f"{request.endpoint}?{urlencode(args)}"
+        return key if vary is None else f"{key}#{vary()}"
+
+    def cached(self, tables=(), rows=(), vary=None):
+        # Caches 200 responses of a GET view built from any column of tables and from the row counts of rows.
+        # Goes under @jwt_required() so the token is still checked on hits.
+        tags = tuple(tables) + tuple(_row_tag(table) for table in rows)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+                key = self.request_key(vary)
+                hit = self.backend.get(key)
+                if hit is not None:
+                    return Response(hit["body"], status=200, mimetype=hit["mimetype"], headers={"X-Cache": "HIT"})
+                generation = self._generation
+                response = make_response(view(*args, **kwargs))
+                # Not stored when a commit invalidated anything while it was built, it may predate that commit
+                if response.status_code == 200 and generation == self._generation:
+                    self.backend.set(key, {"body": response.get_data(as_text=True), "mimetype": response.mimetype}, self.ttl, tags)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, writes=None):
+        # Drops the entries the writes ({table: operations}) touch, or everything
+        if self.backend is None:
+            return
+        self._generation += 1
+        if writes is None:
+            self.backend.clear()
+        else:
+            self.backend.invalidate_tags(write_tags(writes))
+
+
+response_cache = ResponseCache()
+
+
+@on_committed_writes
+def _invalidate_responses(writes):
+    response_cache.invalidate(writes)
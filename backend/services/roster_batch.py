@@ -0,0 +1,216 @@
+from collections import namedtuple
+from datetime import timedelta
+import random
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Flight, Pilot, CabinCrew, Passenger, FlightSeatAssignment
+from .schedule_index import ScheduleIndex, schedule_index, mark_stale, IntervalSet
+from .availability_service import schedule_conflict
+from .seat_assignment_service import seat_plan_auto
+
+FlightSlot = namedtuple('FlightSlot', ['flight_number', 'start', 'end', 'distance', 'aircraft_type_id'])
+
+
+class RosterContext:
+    # State shared by every roster built in one batch: flight slots, candidate pools per role,
+    # and the bookings made so far that are not committed yet.
+
+    def __init__(self, pools=None, schedules=None):
+        self._flights = {}
+        self._pools = dict(pools or {})
+        # Pools given up front are a complete snapshot: a key missing from them is a role nobody has
+        self._pools_complete = pools is not None
+        self._held = {}            # (person_type, person_id) -> IntervalSet of in-batch bookings
+        self._held_by_flight = {}  # flight_number -> [(person_type, person_id)]
+        # Optional snapshot of committed schedules, {(person_type, person_id): IntervalSet}; lets the
+        # context run without a database, e.g. in a worker process. Otherwise the schedule index is used.
+        self._schedules = schedules
+
+    def load_flights(self, flight_numbers):
+        rows = db.session.query(Flight.flight_number, Flight.date_time, Flight.duration, Flight.distance, Flight.aircraft_type_id
+                                ).filter(Flight.flight_number.in_(flight_numbers)).all()
+        for flight_number, date_time, duration, distance, aircraft_type_id in rows:
+            self._flights[flight_number] = FlightSlot(flight_number, date_time, date_time + timedelta(minutes=duration), distance, aircraft_type_id)
+        return self._flights
+
+    def add_flights(self, slots):
+        for slot in slots:
+            self._flights[slot.flight_number] = slot
+
+    def flight(self, flight_number):
+        if flight_number not in self._flights:
+            self.load_flights([flight_number])
+        return self._flights.get(flight_number)
+
+    # Candidate search, same signatures and "Error" convention as availability_service
+
+    # Pools are loaded in id order, so a seeded rng picks the same people every run
+
+    def find_available_pilots(self, flight_id, pilot_type, num_needed, rng=random):
+        flight = self.flight(flight_id)
+        pool = self._pool(('pilot', pilot_type, flight.aircraft_type_id), lambda: db.session.query(Pilot.pilot_id, Pilot.allowed_range).filter(
+            Pilot.seniority_level == pilot_type, Pilot.vehicle_type_id == flight.aircraft_type_id).order_by(Pilot.pilot_id).all())
+        candidates = [pilot_id for pilot_id, allowed_range in pool if allowed_range >= flight.distance]
+        return self._pick(Pilot, candidates, flight, num_needed, rng)
+
+    def find_available_cabin_crew(self, flight_id, cabin_crew_type, num_needed, rng=random):
+        flight = self.flight(flight_id)
+        pool = self._pool(('cabin_crew', cabin_crew_type, flight.aircraft_type_id), lambda: [row[0] for row in db.session.query(CabinCrew.attendant_id).filter(
+            CabinCrew.attendant_type == cabin_crew_type, CabinCrew.vehicle_type_ids.op('@>')([flight.aircraft_type_id])).order_by(CabinCrew.attendant_id).all()])
+        return self._pick(CabinCrew, pool, flight, num_needed, rng)
+
+    def find_available_passengers(self, flight_id, num_needed, rng=random):
+        flight = self.flight(flight_id)
+        pool = self._pool(('passenger',), lambda: [row[0] for row in db.session.query(Passenger.passenger_id).order_by(Passenger.passenger_id).all()])
+        return self._pick(Passenger, pool, flight, num_needed, rng)
+
+    def is_available(self, person_type, person_id, start_time, end_time):
+        held = self._held.get((person_type, person_id))
+        if held is not None and held.overlaps(start_time, end_time):
+            return False
+        if self._schedules is not None:
+            committed = self._schedules.get((person_type, person_id))
+            return committed is None or not committed.overlaps(start_time, end_time)
+        return schedule_index.is_available(person_type, person_id, start_time, end_time)
+
+    def hold(self, flight_number, person_type, person_ids):
+        # Reserve people for a flight until the batch ends, so later flights in the batch see them as busy
+        flight = self.flight(flight_number)
+        for person_id in person_ids:
+            self._held.setdefault((person_type, person_id), IntervalSet()).insert(flight.start, flight.end, flight_number)
+            self._held_by_flight.setdefault(flight_number, []).append((person_type, person_id))
+
+    def release(self, flight_number):
+        # Undo the holds of a flight whose roster was rolled back
+        for key in set(self._held_by_flight.pop(flight_number, [])):
+            held = self._held.pop(key)
+            remaining = [entry for entry in held.entries if entry[2] != flight_number]
+            if remaining:
+                self._held[key] = IntervalSet()
+                for start, end, other_flight in remaining:
+                    self._held[key].insert(start, end, other_flight)
+
+    def _pool(self, key, load):
+        if key not in self._pools:
+            self._pools[key] = [] if self._pools_complete else load()
+        return self._pools[key]
+
+    def _confirm(self, person_type, person_ids, flight):
+        # The schedule index only sees this process's commits: one overlap query over person_schedule drops the
+        # people another process booked meanwhile, and has the index reloaded once this transaction ends
+        if self._schedules is not None or not person_ids:
+            return person_ids
+        id_column = ScheduleIndex.person_id_columns[person_type]
+        booked = set(row[0] for row in db.session.query(id_column).filter(
+            id_column.in_(person_ids), schedule_conflict(person_type, id_column, flight.start, flight.end)).all())
+        if not booked:
+            return person_ids
+        mark_stale(db.session, person_type)
+        return [person_id for person_id in person_ids if person_id not in booked]
+
+    def _pick(self, person_type, candidates, flight, num_needed, rng):
+        if num_needed <= 0:
+            return []
+        found = []
+        tried = set()
+        # Random probing is cheap while most candidates are free, fall back to a shuffled scan when it stops paying off
+        while len(found) < num_needed and len(tried) < len(candidates) // 2:
+            person_id = candidates[rng.randrange(len(candidates))]
+            if person_id in tried:
+                continue
+            tried.add(person_id)
+            if self.is_available(person_type, person_id, flight.start, flight.end):
+                found.append(person_id)
+        found = self._confirm(person_type, found, flight)
+        if len(found) < num_needed:
+            rest = [person_id for person_id in candidates if person_id not in tried]
+            rng.shuffle(rest)
+            position = 0
+            while len(found) < num_needed and position < len(rest):
+                batch = []
+                while len(found) + len(batch) < num_needed and position < len(rest):
+                    person_id = rest[position]
+                    position += 1
+                    if self.is_available(person_type, person_id, flight.start, flight.end):
+                        batch.append(person_id)
+                found += self._confirm(person_type, batch, flight)
+        if len(found) < num_needed:
+            return "Error"
+        self.hold(flight.flight_number, person_type, found)
+        return found
+
+
+class _RosterFailed(Exception):
+    pass
+
+
+def write_rosters(flight_numbers, write_one, chunk_size=50, context=None):
+    # Runs write_one(flight_number) for each flight inside its own savepoint and commits every chunk_size flights.
+    # A flight whose write fails or returns an error message is rolled back alone; its context holds are released.
+    results = []
+    uncommitted = 0
+    for flight_number in flight_numbers:
+        try:
+            with db.session.begin_nested():
+                message = write_one(flight_number)
+                if message != "Seats assigned successfully":
+                    raise _RosterFailed(message)
+        except _RosterFailed as e:
+            if context is not None:
+                context.release(flight_number)
+            results.append({"flight_number": flight_number, "status": "error", "message": str(e)})
+            continue
+        except SQLAlchemyError as e:
+            if context is not None:
+                context.release(flight_number)
+            results.append({"flight_number": flight_number, "status": "error", "message": f"Database error during seat assignment: {str(e)}"})
+            continue
+
+        results.append({"flight_number": flight_number, "status": "created", "message": message})
+        uncommitted += 1
+        if uncommitted >= chunk_size:
+            db.session.commit()
+            uncommitted = 0
+
+    db.session.commit()
+    return results
+
+
+def create_rosters(flight_numbers, chunk_size=50, dry_run=False, seed=None):
+    # Roster many flights sharing one RosterContext; a seed makes the whole batch reproducible
+    context = RosterContext()
+    flights = context.load_flights(flight_numbers)
+    rostered = set(row[0] for row in db.session.query(FlightSeatAssignment.flight_id).filter(
+        FlightSeatAssignment.flight_id.in_(flight_numbers)).distinct().all())
+
+    results = {}
+    to_roster = []
+    for flight_number in flight_numbers:
+        if flight_number not in flights:
+            results[flight_number] = {"flight_number": flight_number, "status": "error", "message": "Invalid flight number"}
+        elif flight_number in rostered:
+            results[flight_number] = {"flight_number": flight_number, "status": "error", "message": "A roster for this flight already created"}
+        else:
+            rostered.add(flight_number)
+            to_roster.append(flight_number)
+
+    if dry_run:
+        # Proposals only: holds stay in the context so later flights plan around earlier ones, nothing is written
+        for flight_number in to_roster:
+            proposal = seat_plan_auto(flight_number, flights[flight_number].aircraft_type_id, context=context, dry_run=True, seed=seed)
+            if isinstance(proposal, str):
+                context.release(flight_number)
+                results[flight_number] = {"flight_number": flight_number, "status": "error", "message": proposal}
+            else:
+                results[flight_number] = {"flight_number": flight_number, "status": "proposed", "roster": proposal}
+        return [results[flight_number] for flight_number in flight_numbers]
+
+    written = write_rosters(
+        to_roster,
+        lambda flight_number: seat_plan_auto(flight_number, flights[flight_number].aircraft_type_id, context=context, seed=seed),
+        chunk_size=chunk_size, context=context
+    )
+    for result in written:
+        results[result["flight_number"]] = result
+
+    # One result per requested flight, in request order; repeated flight numbers report the first outcome
+    return [results[flight_number] for flight_number in flight_numbers]
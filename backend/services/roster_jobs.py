@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import random
+from threading import BoundedSemaphore
+from sqlalchemy import text
+from models import db, RosterJob
+from .roster_batch import create_rosters
+
+# Background rostering: jobs are rows in roster_job, so any web worker can report their status, and they run on a
+# small thread pool owned by the process that accepted them. ROSTER_JOB_WORKERS (default 2) bounds how many rosters are built
+# at once, ROSTER_JOB_QUEUE_LIMIT (default 100) how many jobs this process accepts before submit() refuses new ones.
+# Each process holds an advisory lock on its owner token for as long as it lives and stamps its jobs with the token;
+# jobs still queued or running whose owner's lock is free were cut off by a restart or crash and are marked failed.
+
+OWNER_LOCK_CLASS = 7261  # First key of the (class, owner) advisory locks
+
+
+class RosterJobQueue:
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._slots = None
+        self._eager = False
+        self._owner = None
+        self._owner_connection = None
+
+    def init_app(self, app):
+        # Needs the roster_job table, so runs after create_all() and the migrations
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._app = app
+        self._executor = ThreadPoolExecutor(max_workers=app.config.get('ROSTER_JOB_WORKERS', 2), thread_name_prefix='roster-job')
+        self._slots = BoundedSemaphore(app.config.get('ROSTER_JOB_QUEUE_LIMIT', 100))
+        # Eager mode runs jobs inside submit(), the default for testing apps
+        self._eager = app.config.get('ROSTER_JOBS_EAGER', app.config.get('TESTING', False))
+        with app.app_context():
+            self._hold_owner_lock()
+            self.fail_interrupted()
+
+    def _hold_owner_lock(self):
+        # On a connection of its own, outside any transaction, so the lock lasts until the process exits
+        if self._owner_connection is not None:
+            self._owner_connection.close()
+        self._owner_connection = db.engine.connect()
+        while True:
+            owner = random.SystemRandom().randrange(1, 2 ** 31)
+            locked = self._owner_connection.execute(text("SELECT pg_try_advisory_lock(:lock_class, :owner)"),
+                                                    {'lock_class': OWNER_LOCK_CLASS, 'owner': owner}).scalar()
+            self._owner_connection.commit()
+            if locked:
+                self._owner = owner
+                return
+
+    def fail_interrupted(self):
+        # Marks failed the queued and running jobs of owners that no longer hold their lock; returns how many
+        failed = 0
+        owners = [row[0] for row in db.session.query(RosterJob.owner).filter(RosterJob.status.in_(('queued', 'running'))).distinct().all()]
+        for owner in owners:
+            if owner is not None and not db.session.execute(text("SELECT pg_try_advisory_xact_lock(:lock_class, :owner)"),
+                                                            {'lock_class': OWNER_LOCK_CLASS, 'owner': owner}).scalar():
+                continue  # Its process is alive and still working through the job
+            failed += RosterJob.query.filter(RosterJob.owner == owner, RosterJob.status.in_(('queued', 'running'))).update(
+                {'status': 'failed', 'error': 'Interrupted: the process running this job stopped before it finished',
+                 'finished_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return failed
+
+    def submit(self, flight_numbers, chunk_size=50, seed=None):
+        # Returns the queued job, or None when the queue is full
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            job = RosterJob(flight_numbers=list(flight_numbers), chunk_size=chunk_size, seed=seed, status='queued', owner=self._owner)
+            db.session.add(job)
+            db.session.commit()
+        except Exception:
+            self._slots.release()
+            raise
+
+        if self._eager:
+            self._run(job.id)
+            db.session.refresh(job)
+        else:
+            self._executor.submit(self._run, job.id)
+        return job
+
+    def _run(self, job_id):
+        try:
+            with self._app.app_context():
+                job = db.session.get(RosterJob, job_id)
+                job.status = 'running'
+                job.started_at = datetime.utcnow()
+                db.session.commit()
+                try:
+                    job.results = create_rosters(job.flight_numbers, chunk_size=job.chunk_size, seed=job.seed)
+                    job.status = 'finished'
+                except Exception as e:
+                    db.session.rollback()
+                    job = db.session.get(RosterJob, job_id)
+                    job.status = 'failed'
+                    job.error = str(e)
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+        finally:
+            self._slots.release()
+
+
+roster_jobs = RosterJobQueue()
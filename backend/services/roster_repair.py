@@ -0,0 +1,114 @@
+import random
+from sqlalchemy import delete, update
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Flight, Pilot, CabinCrew, PersonSchedule, FlightSeatAssignment
+from .availability_service import find_available_pilots, find_available_cabin_crew
+from .schedule_index import ScheduleIndex, stage_unbookings
+from .seat_assignment_service import write_roster, roster_rng
+from .workload_service import record_workload
+
+# Roster repair: when a crew member drops out for a time window, only their seats on the flights in that window
+# are handed to someone else. person_schedule is the reverse index from a person to their flights, and each
+# flight is repaired in its own short transaction.
+
+# seater_type -> (person type, pilot seniority or attendant type, whether the flight can go without the seat)
+_CREW_SEATS = {
+    "SeniorPilot": (Pilot, "senior", False),
+    "JuniorPilot": (Pilot, "junior", False),
+    "TraineePilot": (Pilot, "trainee", True),
+    "ChiefCabinCrew": (CabinCrew, "chief", False),
+    "RegularCabinCrew": (CabinCrew, "regular", False),
+    "ChefCabinCrew": (CabinCrew, "chef", True),
+}
+
+_NOT_ENOUGH = {
+    "senior": "Not enough available senior pilots",
+    "junior": "Not enough available junior pilots",
+    "chief": "Not enough available senior cabin crew",
+    "regular": "Not enough available regular cabin crew",
+}
+
+
+def affected_flights(person_type, person_id, start_time, end_time):
+    # Flights of the person overlapping [start_time, end_time), in departure order, via the person_schedule GiST index
+    rows = db.session.query(PersonSchedule.flight_id).filter(
+        PersonSchedule.person_type == person_type.schedule_type,
+        PersonSchedule.person_id == person_id,
+        PersonSchedule.during.op('&&')(db.func.tsrange(start_time, end_time))
+    ).order_by(PersonSchedule.during).all()
+    return [row[0] for row in rows]
+
+
+def _find_replacement(person_type, flight_number, kind, rng):
+    if person_type is Pilot:
+        return find_available_pilots(flight_number, kind, 1, rng=rng)
+    return find_available_cabin_crew(flight_number, kind, 1, rng=rng)
+
+
+def _repair_flight(person_type, person_id, flight_number, rng):
+    seater_types = [seater_type for seater_type, seat in _CREW_SEATS.items() if seat[0] is person_type]
+    assignments = FlightSeatAssignment.query.filter(
+        FlightSeatAssignment.flight_id == flight_number,
+        FlightSeatAssignment.seater_id == person_id,
+        FlightSeatAssignment.seater_type.in_(seater_types)
+    ).all()
+    flight = db.session.get(Flight, flight_number)
+
+    # Replacements are searched while the person is still booked, so they can never be picked themselves
+    seats = []
+    for assignment in assignments:
+        _, kind, optional = _CREW_SEATS[assignment.seater_type]
+        replacement = _find_replacement(person_type, flight_number, kind, rng)
+        if replacement == "Error" and not optional:
+            return {"flight_number": flight_number, "status": "error", "message": _NOT_ENOUGH[kind]}
+        seats.append((assignment, None if replacement == "Error" else replacement[0]))
+
+    id_column = ScheduleIndex.person_id_columns[person_type]
+    db.session.execute(
+        update(person_type)
+        .where(id_column == person_id)
+        .values(scheduled_flights=db.func.array_remove(person_type.scheduled_flights, flight_number))
+        .execution_options(synchronize_session='fetch')
+    )
+    db.session.execute(delete(PersonSchedule).where(
+        PersonSchedule.person_type == person_type.schedule_type,
+        PersonSchedule.person_id == person_id,
+        PersonSchedule.flight_id == flight_number
+    ))
+    stage_unbookings(db.session, person_type, [person_id], flight_number)
+    record_workload(person_type, [person_id], flight, sign=-1)
+
+    replaced = []
+    for assignment, replacement_id in seats:
+        if replacement_id is None:
+            db.session.delete(assignment)  # Optional seat, the flight goes without it
+        else:
+            assignment.seater_id = replacement_id
+            replaced.append(replacement_id)
+    write_roster(flight, [], {person_type: replaced})
+
+    return {
+        "flight_number": flight_number,
+        "status": "repaired",
+        "seats": [{"seat_map_id": assignment.seat_map_id, "seater_type": assignment.seater_type, "replacement_id": replacement_id}
+                  for assignment, replacement_id in seats],
+    }
+
+
+def repair_rosters(person_type, person_id, start_time, end_time, seed=None):
+    # Takes the person off every flight in the window and fills their seats; one commit per flight, so a flight
+    # that cannot be repaired keeps its roster and is reported while the others go through
+    results = []
+    for flight_number in affected_flights(person_type, person_id, start_time, end_time):
+        rng = roster_rng(seed, flight_number) if seed is not None else random
+        try:
+            result = _repair_flight(person_type, person_id, flight_number, rng)
+            if result["status"] == "repaired":
+                db.session.commit()
+            else:
+                db.session.rollback()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            result = {"flight_number": flight_number, "status": "error", "message": f"Database error during roster repair: {str(e)}"}
+        results.append(result)
+    return results
@@ -0,0 +1,296 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from threading import RLock
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import db, Flight, Pilot, CabinCrew, Passenger
+
+# Per-process index of every person's scheduled (start, end) intervals, keyed by person type and id.
+# Overlap checks are answered from memory; the index is kept in step with the database by staging
+# schedule changes at flush time and applying them once the transaction commits. Savepoints only mark where
+# their staged changes begin: a released savepoint leaves them pending for the outer commit, and a rolled
+# back one drops them, so other sessions never see bookings that are not committed. Other processes' commits are
+# not seen at all: callers that find the index stale against person_schedule mark the person type for a reload.
+
+_PENDING_KEY = 'schedule_index_pending'
+_SAVEPOINTS_KEY = 'schedule_index_savepoints'
+_STALE_KEY = 'schedule_index_stale'
+
+
+class IntervalSet:
+    __slots__ = ('starts', 'max_ends', 'entries')
+
+    def __init__(self):
+        self.starts = []    # interval starts, sorted
+        self.max_ends = []  # running maximum of interval ends, aligned with starts
+        self.entries = []   # (start, end, flight_number), aligned with starts
+
+    def insert(self, start, end, flight_number):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.entries.insert(i, (start, end, flight_number))
+        self.max_ends.insert(i, end)
+        running = self.max_ends[i - 1] if i > 0 else None
+        for j in range(i, len(self.entries)):
+            entry_end = self.entries[j][1]
+            running = entry_end if running is None or entry_end > running else running
+            self.max_ends[j] = running
+
+    def overlaps(self, start_time, end_time):
+        # Intervals starting before end_time are a prefix; one of them overlaps iff the latest end passes start_time
+        i = bisect_left(self.starts, end_time)
+        return i > 0 and self.max_ends[i - 1] > start_time
+
+    def flight_numbers(self):
+        return [entry[2] for entry in self.entries]
+
+
+class ScheduleIndex:
+    person_id_columns = {
+        Pilot: Pilot.pilot_id,
+        CabinCrew: CabinCrew.attendant_id,
+        Passenger: Passenger.passenger_id,
+    }
+
+    def __init__(self):
+        self._lock = RLock()
+        self._flights = None    # flight_number -> (start, end)
+        self._schedules = {}    # person_type -> {person_id: IntervalSet}
+
+    def invalidate(self, person_type=None):
+        with self._lock:
+            if person_type is None:
+                self._flights = None
+                self._schedules.clear()
+            else:
+                self._schedules.pop(person_type, None)
+
+    def flight_interval(self, flight_number):
+        with self._lock:
+            self._ensure_flights()
+            interval = self._flights.get(flight_number)
+            if interval is None:
+                flight = db.session.get(Flight, flight_number)
+                if flight is None:
+                    return None
+                interval = self._set_flight(flight_number, flight.date_time, flight.duration)
+            return interval
+
+    def is_available(self, person_type, person_id, start_time, end_time):
+        with self._lock:
+            schedule = self._people(person_type).get(person_id)
+            return schedule is None or not schedule.overlaps(start_time, end_time)
+
+    def scheduled_flights(self, person_type, person_id):
+        with self._lock:
+            schedule = self._people(person_type).get(person_id)
+            return schedule.flight_numbers() if schedule else []
+
+    def add(self, person_type, person_id, flight_number):
+        with self._lock:
+            if person_type not in self._schedules:
+                return  # Not loaded yet, the next load reads it from the database
+            interval = self.flight_interval(flight_number)
+            if interval is None:
+                return
+            schedule = self._schedules[person_type].setdefault(person_id, IntervalSet())
+            if flight_number not in schedule.flight_numbers():
+                schedule.insert(interval[0], interval[1], flight_number)
+
+    def replace(self, person_type, person_id, flight_numbers):
+        # Called after commit, when no SQL can be emitted: unknown flights force a reload instead
+        with self._lock:
+            if person_type not in self._schedules:
+                return
+            schedule = IntervalSet()
+            for flight_number in flight_numbers or []:
+                interval = self._flights.get(flight_number)
+                if interval is None:
+                    self._schedules.pop(person_type, None)
+                    return
+                schedule.insert(interval[0], interval[1], flight_number)
+            self._schedules[person_type][person_id] = schedule
+
+    def book(self, person_type, person_ids, flight_number):
+        # Called after commit like replace(): an unknown flight forces a reload instead of a query
+        with self._lock:
+            if person_type not in self._schedules:
+                return
+            interval = self._flights.get(flight_number)
+            if interval is None:
+                self._schedules.pop(person_type, None)
+                return
+            people = self._schedules[person_type]
+            for person_id in person_ids:
+                schedule = people.setdefault(person_id, IntervalSet())
+                if flight_number not in schedule.flight_numbers():
+                    schedule.insert(interval[0], interval[1], flight_number)
+
+    def unbook(self, person_type, person_ids, flight_number):
+        with self._lock:
+            people = self._schedules.get(person_type)
+            if people is None:
+                return
+            for person_id in person_ids:
+                schedule = people.get(person_id)
+                if schedule is None:
+                    continue
+                remaining = IntervalSet()
+                for start, end, other_flight in schedule.entries:
+                    if other_flight != flight_number:
+                        remaining.insert(start, end, other_flight)
+                people[person_id] = remaining
+
+    def update_flight(self, flight_number, date_time, duration):
+        with self._lock:
+            if self._flights is None:
+                return
+            previous = self._flights.pop(flight_number, None)
+            if isinstance(date_time, datetime) and isinstance(duration, int):
+                self._set_flight(flight_number, date_time, duration)
+            # Otherwise the values are still raw request input, flight_interval() re-reads them lazily
+            if previous is not None and previous != self._flights.get(flight_number):
+                # Flight moved, schedules holding it have stale intervals
+                self._schedules.clear()
+
+    def remove_flight(self, flight_number):
+        with self._lock:
+            if self._flights is not None and self._flights.pop(flight_number, None) is not None:
+                self._schedules.clear()
+
+    def _set_flight(self, flight_number, date_time, duration):
+        interval = (date_time, date_time + timedelta(minutes=duration))
+        self._flights[flight_number] = interval
+        return interval
+
+    def _ensure_flights(self):
+        if self._flights is None:
+            self._flights = {}
+            rows = db.session.query(Flight.flight_number, Flight.date_time, Flight.duration).all()
+            for flight_number, date_time, duration in rows:
+                self._set_flight(flight_number, date_time, duration)
+
+    def _people(self, person_type):
+        people = self._schedules.get(person_type)
+        if people is None:
+            self._ensure_flights()
+            people = {}
+            id_column = self.person_id_columns[person_type]
+            for person_id, flight_numbers in db.session.query(id_column, person_type.scheduled_flights).all():
+                schedule = IntervalSet()
+                for flight_number in flight_numbers or []:
+                    interval = self._flights.get(flight_number)
+                    if interval is not None:
+                        schedule.insert(interval[0], interval[1], flight_number)
+                if schedule.entries:
+                    people[person_id] = schedule
+            self._schedules[person_type] = people
+        return people
+
+
+schedule_index = ScheduleIndex()
+
+
+def _person_key(obj):
+    for person_type, id_column in ScheduleIndex.person_id_columns.items():
+        if isinstance(obj, person_type):
+            return person_type, getattr(obj, id_column.key)
+    return None
+
+
+def stage_bookings(session, person_type, person_ids, flight_number):
+    # Bulk UPDATEs bypass the flush, so their writers stage the new bookings here
+    session.info.setdefault(_PENDING_KEY, []).append(('book', person_type, person_ids, flight_number))
+
+
+def stage_unbookings(session, person_type, person_ids, flight_number):
+    session.info.setdefault(_PENDING_KEY, []).append(('unbook', person_type, person_ids, flight_number))
+
+
+def mark_stale(session, person_type):
+    # Reloads the person type once the transaction ends, committed or not; reloading now would read its own
+    # uncommitted bookings into the index
+    session.info.setdefault(_STALE_KEY, set()).add(person_type)
+
+
+def _reload_stale(session):
+    for person_type in session.info.pop(_STALE_KEY, ()):
+        schedule_index.invalidate(person_type)
+
+
+@event.listens_for(Session, 'after_flush')
+def _stage_schedule_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Flight):
+            state = inspect(obj)
+            if obj in session.new or state.attrs.date_time.history.has_changes() or state.attrs.duration.history.has_changes():
+                pending.append(('flight', obj.flight_number, obj.date_time, obj.duration))
+            continue
+        key = _person_key(obj)
+        if key is None:
+            continue
+        if obj in session.new or inspect(obj).attrs.scheduled_flights.history.has_changes():
+            pending.append(('person', key[0], key[1], list(obj.scheduled_flights or [])))
+    for obj in session.deleted:
+        if isinstance(obj, Flight):
+            pending.append(('remove_flight', obj.flight_number))
+
+
+@event.listens_for(Session, 'after_transaction_create')
+def _mark_savepoint(session, transaction):
+    if transaction.nested:
+        session.info.setdefault(_SAVEPOINTS_KEY, {})[transaction] = len(session.info.get(_PENDING_KEY, ()))
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _clear_savepoints(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_SAVEPOINTS_KEY, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_schedule_changes(session):
+    if session.in_nested_transaction():
+        # A released savepoint's changes stay pending, now part of the enclosing transaction
+        session.info.get(_SAVEPOINTS_KEY, {}).pop(session.get_nested_transaction(), None)
+        return
+    _reload_stale(session)
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    # Flight intervals first, so person schedules referencing new flights resolve from memory
+    for change in pending:
+        if change[0] == 'flight':
+            schedule_index.update_flight(*change[1:])
+        elif change[0] == 'remove_flight':
+            schedule_index.remove_flight(change[1])
+    for change in pending:
+        if change[0] == 'person':
+            schedule_index.replace(*change[1:])
+        elif change[0] == 'book':
+            schedule_index.book(*change[1:])
+        elif change[0] == 'unbook':
+            schedule_index.unbook(*change[1:])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_schedule_changes(session, previous_transaction):
+    # What the database rolled back: the innermost savepoint around previous_transaction, else the whole transaction
+    transaction = previous_transaction
+    while transaction.parent is not None and not transaction.nested:
+        transaction = transaction.parent
+    if not transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+        _reload_stale(session)
+        return
+    savepoints = session.info.get(_SAVEPOINTS_KEY, {})
+    mark = savepoints.pop(transaction, None) if transaction is previous_transaction else savepoints.get(transaction)
+    pending = session.info.get(_PENDING_KEY)
+    if mark is not None and pending is not None:
+        del pending[mark:]
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _reset_schedule_index(target, connection, **kw):
+    schedule_index.invalidate()
@@ -0,0 +1,187 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from models import db, Pilot, CabinCrew, Passenger, PersonSchedule, FlightSeatAssignment
+from .roster_batch import RosterContext, write_rosters
+from .schedule_index import IntervalSet
+from .seat_assignment_service import crew_requirements, select_roster, assign_seats, roster_rng
+from .crew_matching import CREW_ROLES, plan_horizon
+
+# Season-level rostering: flights are partitioned by overlapping time windows and aircraft type, each
+# partition is planned in a worker process against a snapshot of pools and schedules, the plans are
+# reconciled for cross-partition double-booking, and the parent process writes everything in chunks.
+# With matching=True the crew of the whole season is planned at once by crew_matching instead.
+
+_PERSON_TYPES = {Pilot.schedule_type: Pilot, CabinCrew.schedule_type: CabinCrew, Passenger.schedule_type: Passenger}
+
+# (assign_seats argument, person type, pilot seniority or attendant type, error when it cannot be filled)
+_ROLES = CREW_ROLES + (
+    ("passengers", Passenger, None, "Not enough available passengers"),
+)
+
+
+def load_snapshot():
+    # Candidate pools keyed like RosterContext looks them up, in id order, plus every committed schedule interval
+    pools = {}
+    for pilot_id, seniority_level, vehicle_type_id, allowed_range in db.session.query(
+            Pilot.pilot_id, Pilot.seniority_level, Pilot.vehicle_type_id, Pilot.allowed_range).order_by(Pilot.pilot_id).all():
+        pools.setdefault(('pilot', seniority_level, vehicle_type_id), []).append((pilot_id, allowed_range))
+    for attendant_id, attendant_type, vehicle_type_ids in db.session.query(
+            CabinCrew.attendant_id, CabinCrew.attendant_type, CabinCrew.vehicle_type_ids).order_by(CabinCrew.attendant_id).all():
+        for vehicle_type_id in vehicle_type_ids or []:
+            pools.setdefault(('cabin_crew', attendant_type, vehicle_type_id), []).append(attendant_id)
+    pools[('passenger',)] = [row[0] for row in db.session.query(Passenger.passenger_id).order_by(Passenger.passenger_id).all()]
+
+    schedules = {}
+    for person_type, person_id, flight_id, during in db.session.query(
+            PersonSchedule.person_type, PersonSchedule.person_id, PersonSchedule.flight_id, PersonSchedule.during).all():
+        schedules.setdefault((_PERSON_TYPES[person_type], person_id), IntervalSet()).insert(during.lower, during.upper, flight_id)
+    return pools, schedules
+
+
+def partition_flights(slots, num_partitions):
+    # Windows are maximal runs of flights chained by overlap, so flights in different windows can share anyone.
+    # Windows are dealt round-robin into buckets per aircraft type; only crew and passengers can then
+    # collide across partitions (pilots fly a single type), which reconcile_plans takes care of.
+    windows = []
+    window_end = None
+    for slot in sorted(slots, key=lambda slot: (slot.start, slot.flight_number)):
+        if windows and slot.start < window_end:
+            windows[-1].append(slot)
+            window_end = max(window_end, slot.end)
+        else:
+            windows.append([slot])
+            window_end = slot.end
+
+    aircraft_types = sorted(set(slot.aircraft_type_id for slot in slots))
+    buckets_per_type = max(1, num_partitions // max(1, len(aircraft_types)))
+    partitions = {}
+    for window_index, window in enumerate(windows):
+        for slot in window:
+            partitions.setdefault((slot.aircraft_type_id, window_index % buckets_per_type), []).append(slot)
+    return list(partitions.values())
+
+
+_worker_snapshot = None
+
+def _init_worker(pools, schedules):
+    global _worker_snapshot
+    _worker_snapshot = (pools, schedules)
+
+
+def _plan_partition(slots, seed):
+    # Every flight draws from its own generator derived from the run seed, never from the process-wide state
+    # that forked workers would share
+    pools, schedules = _worker_snapshot
+    context = RosterContext(pools=pools, schedules=schedules)
+    context.add_flights(slots)
+
+    plans = {}
+    for slot in slots:
+        rng = roster_rng(seed, slot.flight_number)
+        requirements = crew_requirements(slot.aircraft_type_id, rng)
+        if requirements is None:
+            plans[slot.flight_number] = "Invalid vehicle type ID"
+            continue
+        roster = select_roster(slot.flight_number, requirements, context.find_available_pilots,
+                               context.find_available_cabin_crew, context.find_available_passengers, rng)
+        if isinstance(roster, str):
+            context.release(slot.flight_number)
+        plans[slot.flight_number] = roster
+    return plans
+
+
+def _find(context, flight_number, person_type, kind, num_needed, rng):
+    if person_type is Pilot:
+        return context.find_available_pilots(flight_number, kind, num_needed, rng=rng)
+    if person_type is CabinCrew:
+        return context.find_available_cabin_crew(flight_number, kind, num_needed, rng=rng)
+    return context.find_available_passengers(flight_number, num_needed, rng=rng)
+
+
+def reconcile_plans(slots, plans, pools, schedules, seed=None):
+    # Replays every plan in time order against one context. People already taken by an overlapping flight
+    # of another partition are replaced from the pools; a flight that cannot be repaired reports the error.
+    context = RosterContext(pools=pools, schedules=schedules)
+    context.add_flights(slots)
+    replaced = 0
+    for slot in sorted(slots, key=lambda slot: (slot.start, slot.flight_number)):
+        roster = plans.get(slot.flight_number)
+        if roster is None or isinstance(roster, str):
+            continue
+        rng = roster_rng(seed, slot.flight_number) if seed is not None else random
+        fixed = {}
+        for key, person_type, kind, error in _ROLES:
+            kept = [person_id for person_id in roster[key] if context.is_available(person_type, person_id, slot.start, slot.end)]
+            context.hold(slot.flight_number, person_type, kept)
+            missing = len(roster[key]) - len(kept)
+            if missing:
+                replaced += missing
+                extra = _find(context, slot.flight_number, person_type, kind, missing, rng)
+                if extra == "Error":
+                    if error is not None:
+                        context.release(slot.flight_number)
+                        fixed = error
+                        break
+                    extra = []
+                kept += extra
+            fixed[key] = kept
+        plans[slot.flight_number] = fixed
+    return replaced
+
+
+def _plan_partitions(slots, pools, schedules, workers, seed):
+    partitions = partition_flights(slots, workers * 4)
+
+    plans = {}
+    if workers == 1 or len(partitions) == 1:
+        _init_worker(pools, schedules)
+        for partition in partitions:
+            plans.update(_plan_partition(partition, seed))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pools, schedules)) as executor:
+            for future in [executor.submit(_plan_partition, partition, seed) for partition in partitions]:
+                plans.update(future.result())
+
+    replaced = reconcile_plans(slots, plans, pools, schedules, seed)
+    return plans, replaced
+
+
+def build_season_rosters(flight_numbers, workers=None, chunk_size=200, seed=None, matching=False):
+    # Rosters every given flight that has no roster yet; returns one result per flight, the reconciliation count
+    # and, with matching, the crew slots that could not be filled. With a seed and the same number of workers
+    # the whole season comes out the same on every run.
+    workers = workers or os.cpu_count() or 1
+    writer = RosterContext()
+    flights = writer.load_flights(flight_numbers)
+    rostered = set(row[0] for row in db.session.query(FlightSeatAssignment.flight_id).filter(
+        FlightSeatAssignment.flight_id.in_(flight_numbers)).distinct().all())
+    slots = [slot for flight_number, slot in flights.items() if flight_number not in rostered]
+    if not slots:
+        return {"results": [], "replaced": 0, "unfilled": []}
+
+    pools, schedules = load_snapshot()
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    if matching:
+        # One global plan, known before anything is written
+        plans, unfilled = plan_horizon(slots, pools, schedules, seed)
+        replaced = 0
+    else:
+        plans, replaced = _plan_partitions(slots, pools, schedules, workers, seed)
+        unfilled = []
+
+    results = {flight_number: {"flight_number": flight_number, "status": "error", "message": roster}
+               for flight_number, roster in plans.items() if isinstance(roster, str)}
+    # Written in time order, reported in the order the flights were given
+    planned = [slot.flight_number for slot in sorted(slots, key=lambda slot: (slot.start, slot.flight_number)) if slot.flight_number not in results]
+    for result in write_rosters(
+        planned,
+        lambda flight_number: assign_seats(**plans[flight_number], flight_number=flight_number,
+                                           vehicle_type_id=flights[flight_number].aircraft_type_id, context=writer,
+                                           rng=roster_rng(seed, flight_number)),
+        chunk_size=chunk_size
+    ):
+        results[result["flight_number"]] = result
+    return {"results": [results[flight_number] for flight_number in dict.fromkeys(flight_numbers) if flight_number in results],
+            "replaced": replaced, "unfilled": unfilled}
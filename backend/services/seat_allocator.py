@@ -0,0 +1,99 @@
+from bisect import bisect_left, insort
+import random
+
+# Free seats of one flight, with seat groups bucketed by how many seats they still have free.
+# A party goes to the smallest group that fits it whole, so large groups stay open for large parties
+# and singles fill the leftover gaps. Capacities are kept sorted, finding a fit is a bisect.
+
+
+class SeatAllocator:
+
+    def __init__(self, seat_groups, rng=random):
+        # seat_groups: {seat_group: [seat_id, ...]}
+        self._rng = rng
+        self._free = {}          # seat_group -> free seat ids, next seat last
+        self._buckets = {}       # free capacity -> [seat_group]
+        self._positions = {}     # seat_group -> index in its bucket
+        self._capacities = []    # non-empty bucket capacities, sorted
+        for group, seats in seat_groups.items():
+            if seats:
+                self._free[group] = sorted(seats, reverse=True)
+                self._bucket_add(group, len(seats))
+
+    def free_seats(self):
+        return sum(len(seats) for seats in self._free.values())
+
+    def seat_party(self, party_size):
+        # Seats for a party, together when any group can hold it; otherwise split over the fullest groups.
+        # Returns fewer seats than asked only when the cabin is full.
+        if party_size <= 0:
+            return []
+        i = bisect_left(self._capacities, party_size)
+        if i < len(self._capacities):
+            return self._take(self._pick(self._capacities[i]), party_size)
+
+        seats = []
+        while len(seats) < party_size and self._capacities:
+            group = self._pick(self._capacities[-1])
+            seats += self._take(group, min(party_size - len(seats), len(self._free[group])))
+        return seats
+
+    def _pick(self, capacity):
+        bucket = self._buckets[capacity]
+        return bucket[self._rng.randrange(len(bucket))]
+
+    def _take(self, group, count):
+        free = self._free[group]
+        self._bucket_remove(group, len(free))
+        seats = [free.pop() for _ in range(count)]
+        if free:
+            self._bucket_add(group, len(free))
+        return seats
+
+    def _bucket_add(self, group, capacity):
+        bucket = self._buckets.get(capacity)
+        if bucket is None:
+            bucket = self._buckets[capacity] = []
+            insort(self._capacities, capacity)
+        self._positions[group] = len(bucket)
+        bucket.append(group)
+
+    def _bucket_remove(self, group, capacity):
+        # Swap with the last group of the bucket so removal is constant time
+        bucket = self._buckets[capacity]
+        position = self._positions.pop(group)
+        last = bucket.pop()
+        if last != group:
+            bucket[position] = last
+            self._positions[last] = position
+        if not bucket:
+            del self._buckets[capacity]
+            del self._capacities[bisect_left(self._capacities, capacity)]
+
+
+def group_parties(passenger_ids, affiliations):
+    # Splits the passengers of a flight into parties: each passenger with their affiliated passengers on the same
+    # flight that are not in a party yet. affiliations: {passenger_id: [affiliated passenger ids]}
+    on_flight = set(passenger_ids)
+    placed = set()
+    parties = []
+    for passenger_id in passenger_ids:
+        if passenger_id in placed:
+            continue
+        party = [passenger_id]
+        placed.add(passenger_id)
+        for affiliated_id in affiliations.get(passenger_id) or []:
+            if affiliated_id in on_flight and affiliated_id not in placed:
+                party.append(affiliated_id)
+                placed.add(affiliated_id)
+        parties.append(party)
+    return parties
+
+
+def allocate_seats(parties, seat_groups, rng=random):
+    # passenger_id -> seat id; larger parties are seated first while whole groups are still free
+    allocator = SeatAllocator(seat_groups, rng)
+    assigned_seats = {}
+    for party in sorted(parties, key=len, reverse=True):
+        assigned_seats.update(zip(party, allocator.seat_party(len(party))))
+    return assigned_seats
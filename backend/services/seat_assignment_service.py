@@ -1,215 +1,258 @@
-from models import db, Flight, Pilot, CabinCrew, Passenger, SeatMap, FlightSeatAssignment
+from models import db, Flight, Pilot, CabinCrew, Passenger, FlightSeatAssignment, PersonSchedule
 from .availability_service import find_available_pilots, find_available_cabin_crew, find_available_passengers  
+from .schedule_index import ScheduleIndex, stage_bookings
+from .seat_allocator import allocate_seats, group_parties
+from .seat_map_cache import seat_map_cache
+from .workload_service import record_workload
+from sqlalchemy import insert, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.attributes import flag_modified
-import numpy as np
 import random
 
 
-def seat_plan_auto(flight_number, vehicle_type_id):
-    # Default values to avoid UnboundLocalError
-    senior_pilot_num_needed = 0
-    junior_pilot_num_needed = 0
-    trainee_pilot_num_needed = 0
-    chief_cabin_crew_num_needed = 0
-    regular_cabin_crew_num_needed = 0
-    chef_num_needed = 0
-    passenger_num_needed = 0
+def roster_rng(seed, flight_number):
+    # Per-flight generator derived from a run seed, so a flight gets the same draws wherever it falls in a batch
+    return random.Random(f"{seed}:{flight_number}")
+
+
+def crew_requirements(vehicle_type_id, rng=random):
+    # Head count per role for one flight, keyed like the assign_seats arguments; None for unknown aircraft types
 
     # Boeing 737 or Airbus A320
     if vehicle_type_id == 1 or vehicle_type_id == 2:
-        senior_pilot_num_needed = 1
-        junior_pilot_num_needed = 1
-        trainee_pilot_num_needed = random.randint(0, 2)
-        chief_cabin_crew_num_needed = 2
-        regular_cabin_crew_num_needed = random.randint(4, 8)
-        chef_num_needed = random.randint(0, 2)
-        passenger_num_needed = max(10, int(np.random.normal(70, 20)))
-        if passenger_num_needed > 122:
-            passenger_num_needed = 122
+        passenger_num_needed = max(10, int(rng.gauss(70, 20)))
+        return {
+            "senior_pilots": 1,
+            "junior_pilots": 1,
+            "trainee_pilots": rng.randint(0, 2),
+            "chief_cabin_crews": 2,
+            "regular_cabin_crews": rng.randint(4, 8),
+            "chefs": rng.randint(0, 2),
+            "passengers": min(passenger_num_needed, 122),
+        }
 
     # Boeing 777
     elif vehicle_type_id == 3:
-        senior_pilot_num_needed = random.randint(1, 2)
-        junior_pilot_num_needed = random.randint(1, 2)
-        trainee_pilot_num_needed = random.randint(1, 2)
-        chief_cabin_crew_num_needed = 4
-        regular_cabin_crew_num_needed = random.randint(6, 10)
-        chef_num_needed = random.randint(0, 2)
-        passenger_num_needed = max(20, int(np.random.normal(100, 30)))
-        if passenger_num_needed > 160:
-            passenger_num_needed = 160
+        passenger_num_needed = max(20, int(rng.gauss(100, 30)))
+        return {
+            "senior_pilots": rng.randint(1, 2),
+            "junior_pilots": rng.randint(1, 2),
+            "trainee_pilots": rng.randint(1, 2),
+            "chief_cabin_crews": 4,
+            "regular_cabin_crews": rng.randint(6, 10),
+            "chefs": rng.randint(0, 2),
+            "passengers": min(passenger_num_needed, 160),
+        }
+
+    return None
 
-    # Handle unexpected vehicle_type_id
-    else:
-        return "Invalid vehicle type ID"
 
-    senior_pilots = find_available_pilots(flight_number, "senior", senior_pilot_num_needed)
+def select_roster(flight_number, requirements, find_pilots=find_available_pilots, find_cabin_crew=find_available_cabin_crew, find_passengers=find_available_passengers, rng=random):
+    # Picks people for every role, returns the assign_seats keyword arguments or an error message
+    senior_pilots = find_pilots(flight_number, "senior", requirements["senior_pilots"], rng=rng)
     if senior_pilots == "Error":
         return "Not enough available senior pilots"
 
-    junior_pilots = find_available_pilots(flight_number, "junior", junior_pilot_num_needed)
+    junior_pilots = find_pilots(flight_number, "junior", requirements["junior_pilots"], rng=rng)
     if junior_pilots == "Error":
         return "Not enough available junior pilots"
 
-    trainee_pilots = find_available_pilots(flight_number, "trainee", trainee_pilot_num_needed)
+    trainee_pilots = find_pilots(flight_number, "trainee", requirements["trainee_pilots"], rng=rng)
     if trainee_pilots == "Error":
         trainee_pilots = []
 
-    chief_cabin_crews = find_available_cabin_crew(flight_number, "chief", chief_cabin_crew_num_needed)
+    chief_cabin_crews = find_cabin_crew(flight_number, "chief", requirements["chief_cabin_crews"], rng=rng)
     if chief_cabin_crews == "Error":
         return "Not enough available senior cabin crew"
 
-    regular_cabin_crews = find_available_cabin_crew(flight_number, "regular", regular_cabin_crew_num_needed)
+    regular_cabin_crews = find_cabin_crew(flight_number, "regular", requirements["regular_cabin_crews"], rng=rng)
     if regular_cabin_crews == "Error":
         return "Not enough available regular cabin crew"
 
     chefs = []
-    if chef_num_needed > 0:
-        chefs = find_available_cabin_crew(flight_number, "chef", chef_num_needed)
+    if requirements["chefs"] > 0:
+        chefs = find_cabin_crew(flight_number, "chef", requirements["chefs"], rng=rng)
+        if chefs == "Error":
+            chefs = []
 
-    passengers = find_available_passengers(flight_number, passenger_num_needed)
+    passengers = find_passengers(flight_number, requirements["passengers"], rng=rng)
     if passengers == "Error":
         return "Not enough available passengers"
 
-    result = assign_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs,
-                          passengers, flight_number, vehicle_type_id)
-    return result
+    return {
+        "senior_pilots": senior_pilots,
+        "junior_pilots": junior_pilots,
+        "trainee_pilots": trainee_pilots,
+        "chief_cabin_crews": chief_cabin_crews,
+        "regular_cabin_crews": regular_cabin_crews,
+        "chefs": chefs,
+        "passengers": passengers,
+    }
 
 
-def assign_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs, passengers, flight_number, vehicle_type_id):
+def seat_plan_auto(flight_number, vehicle_type_id, context=None, dry_run=False, seed=None):
+    # With a seed every random choice, head counts, candidates and seats, is reproducible
+    rng = roster_rng(seed, flight_number) if seed is not None else random
+    requirements = crew_requirements(vehicle_type_id, rng)
+    # Handle unexpected vehicle_type_id
+    if requirements is None:
+        return "Invalid vehicle type ID"
 
-    seat_map = SeatMap.query.filter(SeatMap.aircraft_type_id == vehicle_type_id, SeatMap.seat_type == "pilot").first()
-    if not seat_map:
-        return "Seat map not found"
+    # Batch rostering searches the shared candidate pools of its RosterContext instead of the database
+    if context is not None:
+        roster = select_roster(flight_number, requirements, context.find_available_pilots, context.find_available_cabin_crew, context.find_available_passengers, rng)
+    else:
+        roster = select_roster(flight_number, requirements, find_available_pilots, find_available_cabin_crew, find_available_passengers, rng)
+    if isinstance(roster, str):
+        return roster
 
-    if(vehicle_type_id == 1 or vehicle_type_id == 2):     
-        seniorPilotIdx = SeatMap.query.filter(SeatMap.aircraft_type_id == vehicle_type_id, SeatMap.seat_type == "pilot").first().id
-        juniorPilotIdx = seniorPilotIdx + 1
-        traineePilotIdx = juniorPilotIdx + 1
-        chiefCabinCrewIdx = traineePilotIdx + 2
-        regularCabinCrewIdx = chiefCabinCrewIdx + 2
-        chefIdx = regularCabinCrewIdx + 8
-   
-    elif(vehicle_type_id == 3):
-        seniorPilotIdx = SeatMap.query.filter(SeatMap.aircraft_type_id == vehicle_type_id, SeatMap.seat_type == "pilot").first().id
-        juniorPilotIdx = seniorPilotIdx + 2
-        traineePilotIdx = juniorPilotIdx + 2
-        chiefCabinCrewIdx = traineePilotIdx + 2
-        regularCabinCrewIdx = chiefCabinCrewIdx + 4
-        chefIdx = regularCabinCrewIdx + 10
-        
-    for i in range(len(senior_pilots)):
-        db.session.add(FlightSeatAssignment(flight_id=flight_number, seat_map_id= seniorPilotIdx + i, seater_id=senior_pilots[i], seater_type="SeniorPilot"))
-        pilot = Pilot.query.get(senior_pilots[i])
-        pilot.scheduled_flights.append(flight_number)
-        flag_modified(pilot, 'scheduled_flights')
-
-    for i in range(len(junior_pilots)):
-        db.session.add(FlightSeatAssignment(flight_id=flight_number, seat_map_id= juniorPilotIdx + i, seater_id=junior_pilots[i], seater_type="JuniorPilot"))
-        pilot = Pilot.query.get(junior_pilots[i])
-        pilot.scheduled_flights.append(flight_number)
-        flag_modified(pilot, 'scheduled_flights')
-
-    for i in range(len(trainee_pilots)):
-        db.session.add(FlightSeatAssignment(flight_id=flight_number, seat_map_id= traineePilotIdx + i, seater_id=trainee_pilots[i], seater_type="TraineePilot"))
-        pilot = Pilot.query.get(trainee_pilots[i])
-        pilot.scheduled_flights.append(flight_number)
-        flag_modified(pilot, 'scheduled_flights')
-
-    for i in range(len(chief_cabin_crews)):
-        db.session.add(FlightSeatAssignment(flight_id=flight_number, seat_map_id= chiefCabinCrewIdx + i, seater_id=chief_cabin_crews[i], seater_type="ChiefCabinCrew"))
-        crew = CabinCrew.query.get(chief_cabin_crews[i])
-        crew.scheduled_flights.append(flight_number)
-        flag_modified(crew, 'scheduled_flights')
-
-    for i in range(len(regular_cabin_crews)):
-        db.session.add(FlightSeatAssignment(flight_id=flight_number, seat_map_id= regularCabinCrewIdx + i, seater_id=regular_cabin_crews[i], seater_type="RegularCabinCrew"))
-        crew = CabinCrew.query.get(regular_cabin_crews[i])
-        crew.scheduled_flights.append(flight_number)
-        flag_modified(crew, 'scheduled_flights')
-   
-    flight = Flight.query.get(flight_number)
-    if not flight:
-        return "Flight not found"
-    
-    if chefs:
-        menu_updated = False
-        for i, chef_id in enumerate(chefs):
-            db.session.add(FlightSeatAssignment(flight_id=flight_number, seat_map_id= chefIdx + i, seater_id=chef_id, seater_type="ChefCabinCrew"))
-            current_chef = CabinCrew.query.get(chef_id)
-            current_chef.scheduled_flights.append(flight_number)
-            flag_modified(current_chef, 'scheduled_flights')
-            unique_dishes = [dish for dish in current_chef.dish_recipes if dish not in flight.flight_menu]
-            if unique_dishes:
-                random_dish = random.choice(unique_dishes)
-                flight.flight_menu.append(random_dish)  # Add unique dish to the flight menu  
-                menu_updated = True
-        if menu_updated:
-            flag_modified(flight, "flight_menu")
-                
-    result = assign_seats_for_passengers(passengers, flight_number, vehicle_type_id)
+    # Dry run: the proposed roster and seating are returned as a dict and nothing is written
+    if dry_run:
+        return propose_seats(**roster, flight_number=flight_number, vehicle_type_id=vehicle_type_id, rng=rng)
+
+    result = assign_seats(**roster, flight_number=flight_number, vehicle_type_id=vehicle_type_id, context=context, rng=rng)
     return result
 
-def assign_seats_for_passengers(passenger_ids, flight_number, vehicle_type_id):
-    total_seats = 122 if vehicle_type_id in [1, 2] else 160
-    seat_maps = SeatMap.query.filter(
-        SeatMap.aircraft_type_id == vehicle_type_id,
-        SeatMap.seat_type.in_(['business', 'economy'])
-    ).order_by(SeatMap.id).all()
-
-    seat_groups = {}
-    for seat in seat_maps:
-        if seat.seat_group not in seat_groups:
-            seat_groups[seat.seat_group] = []
-        seat_groups[seat.seat_group].append(seat.id)
-
-    shuffled_seat_groups = list(seat_groups.items())
-    random.shuffle(shuffled_seat_groups)
-
-    passengers = {p.passenger_id: p for p in Passenger.query.filter(Passenger.passenger_id.in_(passenger_ids)).all()}
-    assigned_seats = {}
-    assigned_passengers = set()
-
-    for passenger_id in passenger_ids:
-        passenger = passengers.get(passenger_id)
-        if passenger_id in assigned_passengers:
+
+def write_roster(flight, seat_rows, bookings):
+    # A fixed number of statements whatever the roster size: one multi-row insert per table, and one
+    # array_append UPDATE plus one workload upsert per person type. bookings maps person type -> person ids, repeats allowed.
+    if seat_rows:
+        db.session.execute(insert(FlightSeatAssignment).values(seat_rows))
+
+    during = PersonSchedule.flight_range(flight)
+    schedule_rows = []
+    for person_type, person_ids in bookings.items():
+        person_ids = list(dict.fromkeys(person_ids))
+        if not person_ids:
             continue
+        db.session.execute(
+            update(person_type)
+            .where(ScheduleIndex.person_id_columns[person_type].in_(person_ids))
+            .values(scheduled_flights=db.func.array_append(person_type.scheduled_flights, flight.flight_number))
+            .execution_options(synchronize_session='fetch')
+        )
+        schedule_rows += [{"person_type": person_type.schedule_type, "person_id": person_id,
+                           "flight_id": flight.flight_number, "during": during} for person_id in person_ids]
+        stage_bookings(db.session, person_type, person_ids, flight.flight_number)
+        record_workload(person_type, person_ids, flight)
+    if schedule_rows:
+        db.session.execute(insert(PersonSchedule).values(schedule_rows))
 
-        affiliated_ids = passenger.affiliated_passenger_ids or []
-        affiliated_passengers = [passengers.get(aff_id) for aff_id in affiliated_ids if aff_id in passengers]
-
-        for group, seats in shuffled_seat_groups:
-            if all(ap_id not in assigned_passengers for ap_id in affiliated_ids) and len(seats) >= len(affiliated_passengers) + 1:
-                assigned_seats[passenger_id] = seats.pop(0)
-                assigned_passengers.add(passenger_id)
-                passenger.scheduled_flights.append(flight_number)
-                flag_modified(passenger, 'scheduled_flights')
-                for affiliated_passenger in affiliated_passengers:
-                    if affiliated_passenger:
-                        assigned_seats[affiliated_passenger.passenger_id] = seats.pop(0)
-                        assigned_passengers.add(affiliated_passenger.passenger_id)
-                        affiliated_passenger.scheduled_flights.append(flight_number)
-                        flag_modified(affiliated_passenger, 'scheduled_flights')
-                break
-            else:
-                if seats and passenger_id not in assigned_passengers:
-                    assigned_seats[passenger_id] = seats.pop(0)
-                    assigned_passengers.add(passenger_id)
-                    passenger.scheduled_flights.append(flight_number)
-                    flag_modified(passenger, 'scheduled_flights')
-                    break
+
+def _save_roster(flight, seat_rows, bookings, context=None):
+    if context is not None:
+        # Batch rostering runs inside a savepoint, the caller commits in chunks and handles failures
+        write_roster(flight, seat_rows, bookings)
+        return "Seats assigned successfully"
 
     try:
-        for passenger_id, seat_id in assigned_seats.items():
-            db.session.add(FlightSeatAssignment(
-                flight_id=flight_number,
-                seat_map_id=seat_id,
-                seater_id=passenger_id,
-                seater_type='Passenger'
-            ))
+        write_roster(flight, seat_rows, bookings)
         db.session.commit()
         return "Seats assigned successfully"
     except SQLAlchemyError as e:
         db.session.rollback()
-        return f"Database error during seat assignment: {str(e)}"
\ No newline at end of file
+        return f"Database error during seat assignment: {str(e)}"
+
+
+def plan_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs, passengers, flight, layout, rng=random):
+    # Seat rows, bookings per person type and the dishes chefs add to the menu, or an error message; writes nothing
+    seat_rows = []
+    bookings = {Pilot: [], CabinCrew: [], Passenger: []}
+    crew_seats = (
+        (Pilot, senior_pilots, "senior", "SeniorPilot"),
+        (Pilot, junior_pilots, "junior", "JuniorPilot"),
+        (Pilot, trainee_pilots, "trainee", "TraineePilot"),
+        (CabinCrew, chief_cabin_crews, "chief", "ChiefCabinCrew"),
+        (CabinCrew, regular_cabin_crews, "regular", "RegularCabinCrew"),
+        (CabinCrew, chefs, "chef", "ChefCabinCrew"),
+    )
+    for person_type, person_ids, seat_role, seater_type in crew_seats:
+        role_seats = layout.seats_for_role(seat_role)
+        if len(person_ids) > len(role_seats):
+            return f"Not enough {seat_role} seats on this aircraft"
+        for seat_id, person_id in zip(role_seats, person_ids):
+            seat_rows.append({"flight_id": flight.flight_number, "seat_map_id": seat_id, "seater_id": person_id, "seater_type": seater_type})
+            bookings[person_type].append(person_id)
+
+    new_dishes = []
+    if chefs:
+        dish_recipes = dict(db.session.query(CabinCrew.attendant_id, CabinCrew.dish_recipes).filter(CabinCrew.attendant_id.in_(chefs)).all())
+        for chef_id in chefs:
+            unique_dishes = [dish for dish in dish_recipes.get(chef_id) or [] if dish not in flight.flight_menu and dish not in new_dishes]
+            if unique_dishes:
+                new_dishes.append(rng.choice(unique_dishes))
+
+    for passenger_id, seat_id in _passenger_seat_plan(passengers, layout, rng).items():
+        seat_rows.append({"flight_id": flight.flight_number, "seat_map_id": seat_id, "seater_id": passenger_id, "seater_type": "Passenger"})
+        bookings[Passenger].append(passenger_id)
+
+    return seat_rows, bookings, new_dishes
+
+def assign_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs, passengers, flight_number, vehicle_type_id, context=None, rng=random):
+
+    flight = Flight.query.get(flight_number)
+    if not flight:
+        return "Flight not found"
+
+    layout = seat_map_cache.layout(vehicle_type_id)
+    if layout is None:
+        return "Seat map not found"
+
+    plan = plan_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs, passengers, flight, layout, rng)
+    if isinstance(plan, str):
+        return plan
+    seat_rows, bookings, new_dishes = plan
+
+    if new_dishes:
+        flight.flight_menu.extend(new_dishes)  # Add unique dishes to the flight menu
+        flag_modified(flight, "flight_menu")
+
+    return _save_roster(flight, seat_rows, bookings, context)
+
+def propose_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs, passengers, flight_number, vehicle_type_id, rng=random):
+    # Same plan as assign_seats, returned instead of written
+    flight = Flight.query.get(flight_number)
+    if not flight:
+        return "Flight not found"
+
+    layout = seat_map_cache.layout(vehicle_type_id)
+    if layout is None:
+        return "Seat map not found"
+
+    plan = plan_seats(senior_pilots, junior_pilots, trainee_pilots, chief_cabin_crews, regular_cabin_crews, chefs, passengers, flight, layout, rng)
+    if isinstance(plan, str):
+        return plan
+    seat_rows, bookings, new_dishes = plan
+
+    return {
+        "flight_number": flight_number,
+        "crew": {
+            "senior_pilots": senior_pilots,
+            "junior_pilots": junior_pilots,
+            "trainee_pilots": trainee_pilots,
+            "chief_cabin_crews": chief_cabin_crews,
+            "regular_cabin_crews": regular_cabin_crews,
+            "chefs": chefs,
+        },
+        "passengers": list(dict.fromkeys(bookings[Passenger])),
+        "seats": [{key: row[key] for key in ("seat_map_id", "seater_id", "seater_type")} for row in seat_rows],
+        "flight_menu": list(flight.flight_menu) + new_dishes,
+    }
+
+def assign_seats_for_passengers(passenger_ids, flight_number, vehicle_type_id, context=None, rng=random):
+    flight = Flight.query.get(flight_number)
+    if not flight:
+        return "Flight not found"
+    layout = seat_map_cache.layout(vehicle_type_id)
+    if layout is None:
+        return "Seat map not found"
+    assigned_seats = _passenger_seat_plan(passenger_ids, layout, rng)
+    seat_rows = [{"flight_id": flight_number, "seat_map_id": seat_id, "seater_id": passenger_id, "seater_type": "Passenger"}
+                 for passenger_id, seat_id in assigned_seats.items()]
+    return _save_roster(flight, seat_rows, {Passenger: list(assigned_seats)}, context)
+
+def _passenger_seat_plan(passenger_ids, layout, rng=random):
+    # passenger_id -> seat_map_id, keeping affiliated passengers in one seat group where possible
+    affiliations = dict(db.session.query(Passenger.passenger_id, Passenger.affiliated_passenger_ids).filter(Passenger.passenger_id.in_(passenger_ids)).all())
+    return allocate_seats(group_parties(passenger_ids, affiliations), layout.free_seat_groups(), rng)
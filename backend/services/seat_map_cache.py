@@ -0,0 +1,126 @@
+from collections import namedtuple
+from threading import RLock
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, SeatMap, DataVersion
+
+# Per-process cache of every aircraft type's seat map. Seat maps are fixed once populated, so they are
+# read in one query on first use and only dropped when a commit touches SeatMap rows. An unknown seat id
+# reloads the cache only if the seat_map data_version moved since it was loaded, as it does for other processes' writes.
+
+_CHANGED_KEY = 'seat_map_cache_changed'
+
+Seat = namedtuple('Seat', ['id', 'aircraft_type_id', 'seat_row', 'seat_number', 'seat_type', 'seat_group', 'seat_role'])
+
+
+class SeatLayout:
+    # Compiled, read-only layout of one aircraft type: seats per seat type, seats per crew role in seating order,
+    # passenger seat groups per class section, and group sizes. Seats with a role never go to passengers.
+    __slots__ = ('aircraft_type_id', 'seat_ids_by_type', 'role_seats', 'sections', 'passenger_seat_groups', 'group_sizes')
+
+    def __init__(self, aircraft_type_id, seats):
+        seat_ids_by_type = {}
+        role_seats = {}
+        sections = {}
+        passenger_seat_groups = {}
+        for seat in sorted(seats, key=lambda seat: seat.id):
+            seat_ids_by_type.setdefault(seat.seat_type, []).append(seat.id)
+            if seat.seat_role is not None:
+                role_seats.setdefault(seat.seat_role, []).append(seat.id)
+            elif seat.seat_type not in ('pilot', 'crew'):
+                passenger_seat_groups.setdefault(seat.seat_group, []).append(seat.id)
+                section = sections.setdefault(seat.seat_type, [])
+                if seat.seat_group not in section:
+                    section.append(seat.seat_group)
+        self.aircraft_type_id = aircraft_type_id
+        self.seat_ids_by_type = {seat_type: tuple(ids) for seat_type, ids in seat_ids_by_type.items()}
+        self.role_seats = {role: tuple(ids) for role, ids in role_seats.items()}
+        self.sections = {seat_type: tuple(groups) for seat_type, groups in sections.items()}
+        self.passenger_seat_groups = {group: tuple(ids) for group, ids in passenger_seat_groups.items()}
+        self.group_sizes = {group: len(ids) for group, ids in passenger_seat_groups.items()}
+
+    def seat_ids(self, seat_type):
+        return self.seat_ids_by_type.get(seat_type, ())
+
+    def seats_for_role(self, role):
+        return self.role_seats.get(role, ())
+
+    @property
+    def passenger_capacity(self):
+        return sum(self.group_sizes.values())
+
+    def free_seat_groups(self):
+        # Fresh mutable copy for a seat allocator
+        return {group: list(ids) for group, ids in self.passenger_seat_groups.items()}
+
+
+class SeatMapCache:
+
+    def __init__(self):
+        self._lock = RLock()
+        self._seats = None      # seat_map id -> Seat
+        self._layouts = None    # aircraft_type_id -> SeatLayout
+        self._version = None    # seat_map data_version read before loading
+
+    def invalidate(self):
+        with self._lock:
+            self._seats = None
+            self._layouts = None
+            self._version = None
+
+    def layout(self, aircraft_type_id):
+        with self._lock:
+            self._ensure_loaded()
+            return self._layouts.get(aircraft_type_id)
+
+    def seat(self, seat_map_id):
+        with self._lock:
+            self._ensure_loaded()
+            seat = self._seats.get(seat_map_id)
+            if seat is None and _seat_map_version() != self._version:
+                # Added since the cache was loaded, e.g. by another process: reload, layouts included
+                self.invalidate()
+                self._ensure_loaded()
+                seat = self._seats.get(seat_map_id)
+            return seat
+
+    def _ensure_loaded(self):
+        if self._seats is not None:
+            return
+        # Read first: a write landing in between leaves the version behind the rows, costing one extra reload
+        version = _seat_map_version()
+        rows = db.session.query(SeatMap.id, SeatMap.aircraft_type_id, SeatMap.seat_row, SeatMap.seat_number,
+                                SeatMap.seat_type, SeatMap.seat_group, SeatMap.seat_role).all()
+        seats = {row[0]: Seat(*row) for row in rows}
+        by_type = {}
+        for seat in seats.values():
+            by_type.setdefault(seat.aircraft_type_id, []).append(seat)
+        self._layouts = {aircraft_type_id: SeatLayout(aircraft_type_id, type_seats) for aircraft_type_id, type_seats in by_type.items()}
+        self._seats = seats
+        self._version = version
+
+
+def _seat_map_version():
+    return db.session.query(DataVersion.version).filter(DataVersion.scope == 'seat_map', DataVersion.key == 0).scalar() or 0
+
+
+seat_map_cache = SeatMapCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_seat_map_changes(session, flush_context):
+    if any(isinstance(obj, SeatMap) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _apply_seat_map_changes(session):
+    # Also on rollback: the cache may have been loaded with the flushed, now discarded, rows
+    if session.info.pop(_CHANGED_KEY, False):
+        seat_map_cache.invalidate()
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _reset_seat_map_cache(target, connection, **kw):
+    seat_map_cache.invalidate()
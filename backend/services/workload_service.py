@@ -0,0 +1,101 @@
+from datetime import timedelta
+from sqlalchemy.dialects.postgresql import insert
+from models import db, Pilot, CabinCrew, CrewWorkload
+from .schedule_index import ScheduleIndex
+
+# Crew workload counters: crew_workload holds flights and minutes per person and week. Roster writes add to
+# them, repairs take away, and a person's load is the sum over a rolling window of weeks, so neither selection
+# nor reporting has to look at scheduled_flights arrays or person_schedule.
+
+WORKLOAD_WINDOW_WEEKS = 4  # The week a flight departs in and the three before it
+
+CREW_TYPES = (Pilot, CabinCrew)
+
+
+def workload_window(date_time, weeks=WORKLOAD_WINDOW_WEEKS):
+    # (first, last) period_start of the rolling window ending in the week of date_time
+    last = CrewWorkload.period_of(date_time)
+    return last - timedelta(weeks=weeks - 1), last
+
+
+def record_workload(person_type, person_ids, flight, sign=1):
+    # Adds (sign=1) or takes back (sign=-1) one flight of the given people, one upsert for all of them
+    if person_type not in CREW_TYPES or not person_ids:
+        return
+    period_start = CrewWorkload.period_of(flight.date_time)
+    statement = insert(CrewWorkload).values([
+        {"person_type": person_type.schedule_type, "person_id": person_id, "period_start": period_start,
+         "flights": sign, "minutes": sign * flight.duration}
+        for person_id in person_ids
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[CrewWorkload.person_type, CrewWorkload.person_id, CrewWorkload.period_start],
+        set_={"flights": CrewWorkload.flights + statement.excluded.flights,
+              "minutes": CrewWorkload.minutes + statement.excluded.minutes}
+    ))
+
+
+def window_loads(person_type, first, last):
+    # Subquery of person_id, flights, minutes summed over the weeks [first, last]; people without flights have no row
+    return db.session.query(
+        CrewWorkload.person_id,
+        db.func.sum(CrewWorkload.flights).label('flights'),
+        db.func.sum(CrewWorkload.minutes).label('minutes')
+    ).filter(
+        CrewWorkload.person_type == person_type.schedule_type,
+        CrewWorkload.period_start.between(first, last)
+    ).group_by(CrewWorkload.person_id).subquery()
+
+
+def least_loaded_ids(person_type, id_column, num_needed, window, *criteria):
+    # The num_needed matching people with the fewest minutes, then flights, in the window; ties go to the lower id
+    loads = window_loads(person_type, *window)
+    rows = db.session.query(id_column).outerjoin(loads, loads.c.person_id == id_column).filter(*criteria).order_by(
+        db.func.coalesce(loads.c.minutes, 0), db.func.coalesce(loads.c.flights, 0), id_column
+    ).limit(num_needed).all()
+    return [row[0] for row in rows]
+
+
+def _percentile(values, fraction):
+    # values sorted; nearest-rank percentile
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _summary(values):
+    return {
+        "min": values[0] if values else 0,
+        "max": values[-1] if values else 0,
+        "mean": round(sum(values) / len(values), 2) if values else 0,
+        "p50": _percentile(values, 0.5),
+        "p90": _percentile(values, 0.9),
+    }
+
+
+def load_distribution(person_type, first, last, buckets=10, top=10):
+    # Spread of load over everyone of the person type in the weeks [first, last], people without flights included
+    people = db.session.query(db.func.count(ScheduleIndex.person_id_columns[person_type])).scalar()
+    loads = window_loads(person_type, first, last)
+    rows = db.session.query(loads.c.person_id, loads.c.flights, loads.c.minutes).filter(loads.c.flights > 0).all()
+    idle = people - len(rows)
+
+    flights = sorted([0] * idle + [int(row.flights) for row in rows])
+    minutes = sorted([0] * idle + [int(row.minutes) for row in rows])
+    width = max(1, -(-(minutes[-1] if minutes else 0) // buckets))
+    histogram = [{"minutes_from": i * width, "minutes_to": (i + 1) * width, "people": 0} for i in range(buckets)]
+    for value in minutes:
+        histogram[min(buckets - 1, value // width)]["people"] += 1
+
+    most_loaded = sorted(rows, key=lambda row: (-row.minutes, -row.flights, row.person_id))[:top]
+    return {
+        "person_type": person_type.schedule_type,
+        "first_week": first.isoformat(),
+        "last_week": last.isoformat(),
+        "people": people,
+        "idle": idle,
+        "flights": _summary(flights),
+        "minutes": _summary(minutes),
+        "histogram": histogram,
+        "most_loaded": [{"person_id": row.person_id, "flights": int(row.flights), "minutes": int(row.minutes)} for row in most_loaded],
+    }
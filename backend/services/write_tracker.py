@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db
+
+# Which tables a session's transaction wrote to, and how, handed to the registered listeners once it commits:
+# {table name: frozenset of 'insert', 'update', 'delete'}, or None when the schema is created or dropped and
+# everything derived from the database is stale. Caches that depend on tables register here to drop their entries.
+# Savepoints do not count: what a released savepoint wrote is only visible once the outer transaction commits,
+# and a rolled back savepoint keeps what the transaction wrote before it (dropping a little more than needed).
+
+_WRITTEN_KEY = 'write_tracker_written_tables'
+
+_listeners = []
+
+
+def on_committed_writes(listener):
+    # Registers listener(writes); usable as a decorator
+    _listeners.append(listener)
+    return listener
+
+
+def _notify(writes):
+    for listener in _listeners:
+        listener(writes)
+
+
+def _note_write(session, table, operation):
+    if table is not None:
+        session.info.setdefault(_WRITTEN_KEY, {}).setdefault(table.name, set()).add(operation)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_flushed_tables(session, flush_context):
+    for objects, operation in ((session.new, 'insert'), (session.dirty, 'update'), (session.deleted, 'delete')):
+        for obj in list(objects):
+            _note_write(session, getattr(obj, '__table__', None), operation)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_executed_tables(orm_execute_state):
+    # Bulk insert, update and delete statements run through the session bypass the flush
+    if orm_execute_state.is_insert:
+        operation = 'insert'
+    elif orm_execute_state.is_update:
+        operation = 'update'
+    elif orm_execute_state.is_delete:
+        operation = 'delete'
+    else:
+        return
+    _note_write(orm_execute_state.session, getattr(orm_execute_state.statement, 'table', None), operation)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_written_tables(session):
+    if session.in_nested_transaction():
+        return
+    written = session.info.pop(_WRITTEN_KEY, None)
+    if written:
+        _notify({table: frozenset(operations) for table, operations in written.items()})
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_written_tables(session):
+    if not session.in_nested_transaction():
+        session.info.pop(_WRITTEN_KEY, None)
+
+
+@event.listens_for(db.metadata, 'after_create')
+@event.listens_for(db.metadata, 'after_drop')
+def _reset_all(target, connection, **kw):
+    _notify(None)
@@ -0,0 +1,59 @@
+"""
+Season crew planning benchmark, no database needed: the horizon matching engine against the
+partition planner's greedy picks on the same synthetic season.
+Run from the backend directory: python -m tests.performance.bench_crew_matching
+"""
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from services.roster_batch import FlightSlot
+from services.crew_matching import plan_horizon
+from services.season_roster import _init_worker, _plan_partition
+
+
+def season(num_flights, pilots_per_role, rng, days=30):
+    start = datetime(2024, 1, 1)
+    slots = []
+    for flight_number in range(1, num_flights + 1):
+        departure = start + timedelta(minutes=rng.randrange(days * 24 * 60))
+        distance = rng.choice([800, 3000, 6000, 12000, 18000])
+        slots.append(FlightSlot(flight_number, departure, departure + timedelta(minutes=60 + distance // 10), distance, rng.randint(1, 3)))
+
+    pools = {('passenger',): list(range(1, 50001))}
+    pilot_id = 1
+    for vehicle_type_id in (1, 2, 3):
+        for pilot_type, count in (('senior', pilots_per_role), ('junior', pilots_per_role), ('trainee', pilots_per_role // 2)):
+            pools[('pilot', pilot_type, vehicle_type_id)] = [
+                (pilot_id + i, 2000 if pilot_type == 'trainee' else rng.choice([5000, 10000, 15000, 20000])) for i in range(count)]
+            pilot_id += count
+    attendant_id = 1
+    for attendant_type, count in (('chief', 500), ('regular', 1500), ('chef', 200)):
+        for _ in range(count):
+            for vehicle_type_id in sorted(rng.sample([1, 2, 3], rng.randint(1, 3))):
+                pools.setdefault(('cabin_crew', attendant_type, vehicle_type_id), []).append(attendant_id)
+            attendant_id += 1
+    return slots, pools
+
+
+def failures(plans):
+    return Counter(plan for plan in plans.values() if isinstance(plan, str))
+
+
+def run(num_flights=3000, seed=3):
+    for pilots_per_role in (40, 200):
+        slots, pools = season(num_flights, pilots_per_role, random.Random(seed))
+        print(f"{num_flights} flights, {pilots_per_role} pilots per role and aircraft type")
+
+        start = time.perf_counter()
+        plans, unfilled = plan_horizon(slots, pools, {}, seed)
+        print(f"  matching {time.perf_counter() - start:6.2f} s  failed {dict(failures(plans))}  unfilled slots {len(unfilled)}")
+
+        _init_worker(pools, {})
+        start = time.perf_counter()
+        plans = _plan_partition(slots, seed)
+        print(f"  greedy   {time.perf_counter() - start:6.2f} s  failed {dict(failures(plans))}")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,97 @@
+"""
+Microbenchmark for the passenger seat allocator, no database needed.
+Run from the backend directory: python -m tests.performance.bench_seat_allocator
+"""
+import random
+import time
+from services.seat_allocator import allocate_seats, group_parties
+
+
+def layout(sections):
+    # sections: [(rows, [group sizes across a row])] -> {seat_group: [seat_id]}
+    seat_groups = {}
+    seat_id = 1
+    for rows, group_sizes in sections:
+        for _ in range(rows):
+            for size in group_sizes:
+                seat_groups[len(seat_groups) + 1] = list(range(seat_id, seat_id + size))
+                seat_id += size
+    return seat_groups
+
+
+LAYOUTS = {
+    "narrow body (737/A320)": layout([(8, [2, 2]), (15, [3, 3])]),
+    "wide body (777)": layout([(10, [2, 2]), (15, [2, 4, 2])]),
+    "large wide body": layout([(12, [2, 2, 2]), (50, [3, 4, 3])]),
+}
+
+
+def make_flight(seat_groups, rng, fill=0.9, party_rate=0.3):
+    seats = sum(len(group) for group in seat_groups.values())
+    passenger_ids = list(range(1, int(seats * fill) + 1))
+    affiliations = {}
+    i = 0
+    while i < len(passenger_ids):
+        size = rng.choice([2, 2, 3, 4]) if rng.random() < party_rate else 1
+        party = passenger_ids[i:i + size]
+        for passenger_id in party:
+            affiliations[passenger_id] = [other for other in party if other != passenger_id]
+        i += size
+    return passenger_ids, affiliations
+
+
+def linear_scan(passenger_ids, affiliations, seat_groups, rng):
+    # The previous algorithm: first shuffled group that fits, seats.pop(0), affiliate checks per group
+    shuffled_seat_groups = [(group, list(seats)) for group, seats in seat_groups.items()]
+    rng.shuffle(shuffled_seat_groups)
+    assigned_seats = {}
+    assigned_passengers = set()
+    for passenger_id in passenger_ids:
+        if passenger_id in assigned_passengers:
+            continue
+        affiliated_ids = affiliations.get(passenger_id) or []
+        affiliated_on_flight = [aff_id for aff_id in affiliated_ids if aff_id in affiliations]
+        for group, seats in shuffled_seat_groups:
+            if all(ap_id not in assigned_passengers for ap_id in affiliated_ids) and len(seats) >= len(affiliated_on_flight) + 1:
+                assigned_seats[passenger_id] = seats.pop(0)
+                assigned_passengers.add(passenger_id)
+                for aff_id in affiliated_on_flight:
+                    assigned_seats[aff_id] = seats.pop(0)
+                    assigned_passengers.add(aff_id)
+                break
+            elif seats and passenger_id not in assigned_passengers:
+                assigned_seats[passenger_id] = seats.pop(0)
+                assigned_passengers.add(passenger_id)
+                break
+    return assigned_seats
+
+
+def allocator(passenger_ids, affiliations, seat_groups, rng):
+    return allocate_seats(group_parties(passenger_ids, affiliations), seat_groups, rng)
+
+
+def parties_together(assigned_seats, passenger_ids, affiliations, seat_groups):
+    group_of = {seat: group for group, seats in seat_groups.items() for seat in seats}
+    parties = [party for party in group_parties(passenger_ids, affiliations) if len(party) > 1]
+    together = sum(1 for party in parties
+                   if all(p in assigned_seats for p in party) and len({group_of[assigned_seats[p]] for p in party}) == 1)
+    return together / len(parties) if parties else 1.0
+
+
+def run(iterations=300, seed=7):
+    for name, seat_groups in LAYOUTS.items():
+        rng = random.Random(seed)
+        flights = [make_flight(seat_groups, rng) for _ in range(iterations)]
+        print(name, "-", sum(len(seats) for seats in seat_groups.values()), "seats")
+        for label, allocate in (("linear scan", linear_scan), ("seat allocator", allocator)):
+            rng = random.Random(seed)
+            start = time.perf_counter()
+            results = [allocate(passenger_ids, affiliations, seat_groups, rng) for passenger_ids, affiliations in flights]
+            elapsed = time.perf_counter() - start
+            seated = sum(len(result) for result in results) / sum(len(flight[0]) for flight in flights)
+            together = sum(parties_together(result, *flight, seat_groups) for result, flight in zip(results, flights)) / len(flights)
+            print(f"  {label:15} {elapsed / iterations * 1e6:9.1f} us/flight  seated {seated:6.1%}  parties together {together:6.1%}")
+
+
+if __name__ == '__main__':
+    run()
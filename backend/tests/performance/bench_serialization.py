@@ -0,0 +1,67 @@
+"""
+Serialization and compression benchmark, no database needed: bytes on the wire and CPU per request for the
+two biggest bodies, /airports (every IATA airport, as the populated database has) and extended_view of a
+full wide-body flight, with each JSON provider and content encoding.
+Run from the backend directory: python -m tests.performance.bench_serialization
+"""
+import random
+import time
+from flask import Flask, jsonify
+import airportsdata
+import pycountry
+from services.compression import Compression, brotli
+from services.json_provider import JSON_PROVIDERS, orjson
+
+
+def airports_payload():
+    def country_name(code):
+        country = pycountry.countries.get(alpha_2=code)
+        return country.name if country else code
+    return [{"airport_code": code, "city": airport["city"], "country": country_name(airport["country"])}
+            for code, airport in airportsdata.load('IATA').items()]
+
+
+def extended_view_payload(rng, passengers=300):
+    def person(person_id):
+        return {"id": person_id, "name": f"Person {person_id}", "age": rng.randint(18, 80), "gender": rng.choice(["male", "female"]),
+                "nationality": rng.choice(["Turkey", "Germany", "France", "Japan"]),
+                "scheduled_flights": sorted(rng.sample(range(1, 5000), 60))}
+    pilots = [dict(person(i), person_type="Senior Pilot", known_languages=["English", "Turkish"], vehicle_type_id=3,
+                   allowed_range=20000) for i in range(1, 7)]
+    crew = [dict(person(i), person_type="Regular Cabin Crew", known_languages=["English"], vehicle_type_ids=[1, 3],
+                 attendant_type="regular", dish_recipes=None) for i in range(1, 17)]
+    travellers = [dict(person(i), person_type="Passenger", parent_id=None, affiliated_passenger_ids=[i + 1])
+                  for i in range(1, passengers + 1)]
+    return [pilots, crew, travellers]
+
+
+def bench_app(provider, payloads):
+    app = Flask(__name__)
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    app.json = JSON_PROVIDERS[provider](app)
+    Compression().init_app(app)
+    for name, payload in payloads.items():
+        app.add_url_rule(f'/{name}', name, lambda payload=payload: jsonify(payload))
+    return app
+
+
+def run(requests=20):
+    payloads = {"airports": airports_payload(), "extended_view": extended_view_payload(random.Random(1))}
+    providers = [name for name in JSON_PROVIDERS if name != 'orjson' or orjson is not None]
+    encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    for name in payloads:
+        print(f"/{name}")
+        for provider in providers:
+            client = bench_app(provider, payloads).test_client()
+            for encoding in encodings:
+                headers = {'Accept-Encoding': encoding}
+                size = len(client.get(f'/{name}', headers=headers).data)
+                start = time.process_time()
+                for _ in range(requests):
+                    client.get(f'/{name}', headers=headers)
+                cpu = (time.process_time() - start) / requests * 1000
+                print(f"  {provider:8} {encoding:8} {size:10,d} bytes  {cpu:7.2f} ms CPU per request")
+
+
+if __name__ == '__main__':
+    run()
@@ -55,6 +55,17 @@ class UserBehavior(TaskSet):
             self.client.get("/api/flights?aircraft_type_id=1", headers={"Authorization": f"Bearer {UserBehavior.token}"})
             self.client.get("/api/flights?status=pending", headers={"Authorization": f"Bearer {UserBehavior.token}"})
 
+    @task(1)
+    def get_flights_with_indexed_filters(self):
+        # Flight number prefixes and airport codes are index range scans and equality matches; the named
+        # entries let locust's stats compare them with the unfiltered list above
+        if UserBehavior.token:
+            headers = {"Authorization": f"Bearer {UserBehavior.token}"}
+            for prefix in ("1", "10", "100", "1000"):
+                self.client.get(f"/api/flights?flight_number={prefix}", headers=headers, name=f"/api/flights?flight_number=[{len(prefix)} digits]")
+            self.client.get("/api/flights?source_airport=jfk", headers=headers, name="/api/flights?source_airport=[code]")
+            self.client.get("/api/flights?source_airport=JFK&destination_airport=LHR", headers=headers, name="/api/flights?source_airport=[code]&destination_airport=[code]")
+
 class WebsiteUser(HttpUser):
     tasks = [UserBehavior]
     wait_time = between(1, 2)
@@ -128,3 +128,33 @@ def test_get_airport_details_multiple_airports(client, init_database, auth_heade
     assert len(data) == 2
     assert any(airport['airport_code'] == 'AAA' for airport in data)
     assert any(airport['airport_code'] == 'ZZZ' for airport in data)
+
+def test_get_airport_details_cached_until_airport_write(client, init_database, auth_headers):
+    assert client.get('/api/airports', headers=auth_headers).headers['X-Cache'] == 'MISS'
+    response = client.get('/api/airports', headers=auth_headers)
+    assert response.headers['X-Cache'] == 'HIT'
+    assert len(response.get_json()) == 2
+
+    # Row counts on /details do not depend on airports, so writing one leaves that entry alone
+    client.get('/api/details', headers=auth_headers)
+    db.session.add(Airport(airport_code='BBB', name='Sample Airport 3', city='Sample City 3', country='BB',
+                           latitude=1.0, longitude=2.0))
+    db.session.commit()
+    response = client.get('/api/airports', headers=auth_headers)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(response.get_json()) == 3
+    assert client.get('/api/details', headers=auth_headers).headers['X-Cache'] == 'HIT'
+
+def test_get_airport_codes_not_modified(client, init_database, auth_headers):
+    response = client.get('/api/airport_codes', headers=auth_headers)
+    etag = response.headers['ETag']
+    response = client.get('/api/airport_codes', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    db.session.add(Airport(airport_code='CCC', name='Sample Airport 4', city='Sample City 4', country='CC',
+                           latitude=3.0, longitude=4.0))
+    db.session.commit()
+    response = client.get('/api/airport_codes', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'CCC' in response.get_json()
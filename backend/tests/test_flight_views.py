@@ -1,6 +1,6 @@
 import pytest
 from app import create_app, db
-from models import Flight, FlightSeatAssignment, Passenger, Pilot, CabinCrew, SeatMap, Airport, AircraftType, User
+from models import Flight, FlightSeatAssignment, Passenger, Pilot, CabinCrew, SeatMap, Airport, AircraftType, User, PersonSchedule, DataVersion
 from config import TestConfig
 import json
 from datetime import datetime
@@ -124,3 +124,46 @@ def test_invalid_flight_extended_view(client, init_database, auth_headers):
     data = response.get_json()
     assert data['error'] == 'Flight not found'
 
+
+def test_tabular_view_etag_follows_roster_and_not_schedules(client, init_database, auth_headers):
+    etag = client.get('/api/1/tabular_view', headers=auth_headers).headers['ETag']
+    conditional_headers = {**auth_headers, 'If-None-Match': etag}
+    assert client.get('/api/1/tabular_view', headers=conditional_headers).status_code == 304
+
+    # A crew member rostered onto another flight changes the extended view, but not the tabular one
+    extended_etag = client.get('/api/1/extended_view').headers['ETag']
+    other_flight = Flight(flight_number=2, airline_code='AB', date_time=datetime(2024, 5, 2, 12, 0, 0), duration=120, distance=1000,
+                          source_airport='XY', destination_airport='AB', aircraft_type_id=1, flight_menu=['Food', 'Drink'])
+    db.session.add(other_flight)
+    db.session.add(FlightSeatAssignment(flight_id=2, seater_id=1, seater_type='SeniorPilot', seat_map_id=1))
+    db.session.add(PersonSchedule.for_flight('pilot', 1, other_flight))
+    db.session.get(Pilot, 1).scheduled_flights = [1009, 1010, 1011, 2]
+    db.session.commit()
+    assert client.get('/api/1/tabular_view', headers=conditional_headers).status_code == 304
+    assert client.get('/api/1/extended_view', headers={'If-None-Match': extended_etag}).status_code == 200
+    # Schedule updates bump no table-wide counter, so concurrent roster writes do not queue behind one row lock
+    assert db.session.get(DataVersion, ('pilot', 0)) is None
+
+    db.session.add(SeatMap(id=3, seat_row='B', seat_number=1, seat_type='Economy', aircraft_type_id=1))
+    db.session.add(FlightSeatAssignment(flight_id=1, seater_id=1, seater_type='Passenger', seat_map_id=3))
+    db.session.commit()
+    response = client.get('/api/1/tabular_view', headers=conditional_headers)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()) == 3
+
+def test_flight_menu_follows_roster_not_flight_version(client, init_database, auth_headers):
+    flight_version = db.session.get(DataVersion, ('flight', 0)).version
+    menu_etag = client.get('/api/flights', headers=auth_headers).headers['ETag']
+    dates_etag = client.get('/api/flights?fields=date_time', headers=auth_headers).headers['ETag']
+
+    # A chef's dish lands in flight_menu with a roster write, as in assign_seats
+    flight = db.session.get(Flight, 1)
+    flight.flight_menu = flight.flight_menu + ['Baklava']
+    db.session.add(SeatMap(id=3, seat_row='B', seat_number=1, seat_type='Economy', aircraft_type_id=1))
+    db.session.add(FlightSeatAssignment(flight_id=1, seater_id=1, seater_type='Passenger', seat_map_id=3))
+    db.session.commit()
+
+    assert db.session.get(DataVersion, ('flight', 0)).version == flight_version
+    assert client.get('/api/flights', headers={**auth_headers, 'If-None-Match': menu_etag}).status_code == 200
+    assert client.get('/api/flights?fields=date_time', headers={**auth_headers, 'If-None-Match': dates_etag}).status_code == 304
@@ -1,9 +1,10 @@
 import pytest
 from app import create_app, db
-from models import Airport, Flight, AircraftType, User
+from models import Airport, Flight, AircraftType, User, RosterJob
+from services import roster_jobs
 from config import TestConfig
 from unittest.mock import patch
-from datetime import datetime
+from datetime import datetime, timedelta
 import bcrypt
 import os
 import dotenv
@@ -142,6 +143,50 @@ def test_create_flight_no_roster(mock_calculate_distance, mock_seat_plan_auto, c
     json_response = response.get_json()
     assert 'Flight succesfully created' in json_response['message']
 
+def test_create_flight_async_roster_job(client, init_database, auth_headers):
+    data = {
+        "flight_time": "2024-05-01T12:00:00",
+        "source": "LAX",
+        "destination": "SFO",
+        "vehicle_type_id": 1,
+        "create_roster": "Yes",
+        "async": True
+    }
+    response = client.post('/api/create_flight', headers=auth_headers, json=data)
+    assert response.status_code == 202
+    json_response = response.get_json()
+    assert response.headers['Location'] == json_response['status_url']
+
+    # Testing apps run jobs eagerly, so the job is already done when polled
+    response = client.get(json_response['status_url'], headers=auth_headers)
+    assert response.status_code == 200
+    job = response.get_json()
+    assert job['status'] == 'finished'
+    assert [result['flight_number'] for result in job['results']] == [json_response['flight_id']]
+
+def test_roster_jobs_of_a_stopped_process_are_failed(app, init_database):
+    with app.app_context():
+        live = roster_jobs.submit([1])  # Eager, so finished; reopened as if this process were still running it
+        live.status = 'running'
+        stopped = RosterJob(flight_numbers=[1], chunk_size=50, status='running', owner=1)
+        db.session.add(stopped)
+        db.session.commit()
+
+        assert roster_jobs.fail_interrupted() == 1
+        assert db.session.get(RosterJob, stopped.id).status == 'failed'
+        assert db.session.get(RosterJob, live.id).status == 'running'
+
+def test_roster_endpoints_reject_boolean_seed(client, init_database, auth_headers):
+    response = client.post('/api/create_flight', headers=auth_headers, json={
+        "flight_time": "2024-05-01T12:00:00", "source": "LAX", "destination": "SFO", "vehicle_type_id": 1, "create_roster": "No"})
+    flight_number = response.get_json()['flight_id']
+
+    # JSON true is a bool, which Python would otherwise take for the integer 1
+    for url, data in (('/api/create_roster_auto', {"flight_number": flight_number}), ('/api/create_roster_batch', {"flight_numbers": [flight_number]})):
+        response = client.post(url, headers=auth_headers, json=dict(data, seed=True))
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'seed must be an integer'}
+
 def test_get_flights(client, init_database, auth_headers):
     flight = Flight(
         airline_code="AA",
@@ -156,7 +201,7 @@ def test_get_flights(client, init_database, auth_headers):
     db.session.add(flight)
     db.session.commit()
 
-    response = client.get('/api/flights', headers=auth_headers)
+    response = client.get('/api/flights?include_total=true', headers=auth_headers)
     assert response.status_code == 200
     data = response.get_json()
     assert 'flights' in data
@@ -176,7 +221,7 @@ def test_get_flights_with_filters(client, init_database, auth_headers):
     db.session.add(flight)
     db.session.commit()
 
-    response = client.get('/api/flights?source_airport=LAX&destination_airport=SFO', headers=auth_headers)
+    response = client.get('/api/flights?source_airport=LAX&destination_airport=SFO&include_total=true', headers=auth_headers)
     assert response.status_code == 200
     data = response.get_json()
     assert 'flights' in data
@@ -184,3 +229,68 @@ def test_get_flights_with_filters(client, init_database, auth_headers):
     assert data['flights'][0]['source_airport'] == 'LAX'
     assert data['flights'][0]['destination_airport'] == 'SFO'
 
+def test_get_flights_with_fields(client, init_database, auth_headers):
+    db.session.add(Flight(airline_code="AA", date_time=datetime(2024, 5, 1, 12, 0, 0), duration=120, distance=600,
+                          source_airport="LAX", destination_airport="SFO", aircraft_type_id=1, flight_menu=["Chicken"]))
+    db.session.commit()
+
+    response = client.get('/api/flights?fields=flight_number,source_city,status', headers=auth_headers)
+    assert response.status_code == 200
+    flight = response.get_json()['flights'][0]
+    assert list(flight) == ['flight_number', 'source_city', 'status']
+    assert (flight['source_city'], flight['status']) == ('Los Angeles', 'passed')
+
+    # City filters still join the airport when its columns are not returned
+    response = client.get('/api/flights?fields=date_time&destination_city=San Francisco', headers=auth_headers)
+    assert response.get_json()['flights'] == [{'date_time': '2024-05-01T12:00:00'}]
+    response = client.get('/api/flights?fields=date_time&destination_city=Paris', headers=auth_headers)
+    assert response.get_json()['flights'] == []
+    assert client.get('/api/flights?fields=flight_number,menu', headers=auth_headers).status_code == 400
+
+def test_get_flights_with_cursor(client, init_database, auth_headers):
+    for hour in range(5):
+        db.session.add(Flight(airline_code="AA", date_time=datetime(2024, 5, 1, hour, 0, 0), duration=60, distance=600,
+                              source_airport="LAX", destination_airport="SFO", aircraft_type_id=1, flight_menu=[]))
+    db.session.commit()
+
+    seen = []
+    response = client.get('/api/flights?per_page=2', headers=auth_headers)
+    while True:
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'total' not in data
+        seen += [flight['flight_number'] for flight in data['flights']]
+        if data['next_cursor'] is None:
+            break
+        response = client.get(f"/api/flights?per_page=2&cursor={data['next_cursor']}", headers=auth_headers)
+    assert len(seen) == 5 and seen == sorted(seen)
+
+    response = client.get('/api/flights?cursor=not-a-cursor', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_get_flights_with_prefix_and_lowercase_code(client, init_database, auth_headers):
+    flight = Flight(airline_code="AA", date_time=datetime(2024, 5, 1, 12, 0, 0), duration=60, distance=600,
+                    source_airport="LAX", destination_airport="SFO", aircraft_type_id=1, flight_menu=[])
+    db.session.add(flight)
+    db.session.commit()
+    prefix = str(flight.flight_number)[:2]
+
+    response = client.get(f'/api/flights?flight_number={prefix}&source_airport=lax', headers=auth_headers)
+    assert [f['flight_number'] for f in response.get_json()['flights']] == [flight.flight_number]
+    response = client.get(f'/api/flights?flight_number={prefix}x', headers=auth_headers)
+    assert response.get_json()['flights'] == []
+
+def test_get_flights_by_status_uses_stored_end_time(client, init_database, auth_headers):
+    now = datetime.now()
+    for start in (now - timedelta(hours=5), now - timedelta(minutes=30), now + timedelta(hours=5)):
+        db.session.add(Flight(airline_code="AA", date_time=start, duration=60, distance=600,
+                              source_airport="LAX", destination_airport="SFO", aircraft_type_id=1, flight_menu=[]))
+    db.session.commit()
+    assert Flight.query.filter(Flight.end_time == Flight.date_time + timedelta(minutes=60)).count() == 3
+
+    for status in ('passed', 'active', 'pending'):
+        flights = client.get(f'/api/flights?status={status}', headers=auth_headers).get_json()['flights']
+        assert [flight['status'] for flight in flights] == [status]
+    statuses = [flight['status'] for flight in client.get('/api/flights', headers=auth_headers).get_json()['flights']]
+    assert statuses == ['passed', 'active', 'pending']
+
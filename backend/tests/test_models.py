@@ -1,8 +1,9 @@
 import pytest
 from app import create_app, db
 from config import TestConfig
-from models import AircraftType, Airport, CabinCrew, Flight, Passenger, Pilot, SeatMap, FlightSeatAssignment
+from models import AircraftType, Airport, CabinCrew, Flight, Passenger, Pilot, SeatMap, FlightSeatAssignment, PersonSchedule
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 
 
 @pytest.fixture(scope='module')
@@ -242,3 +243,29 @@ def test_flight_seat_assignment(session):
     assert flight_seat_assignment.flight_id == flight.flight_number
     assert flight_seat_assignment.seat_map_id == seat_map.id
     assert flight_seat_assignment.seater_id == passenger.passenger_id
+
+
+def test_person_schedule_rejects_overlap(session):
+    airport1 = Airport(airport_code="LAX", name="Los Angeles International Airport", city="Los Angeles",
+                       country="USA", latitude=33.9416, longitude=-118.4085)
+    airport2 = Airport(airport_code="SFO", name="San Francisco International Airport", city="San Francisco",
+                       country="USA", latitude=37.7749, longitude=-122.4194)
+    aircraft_type = AircraftType(name="Airbus A320", seat_count=138, crew_limit=16,
+                                 passenger_limit=122, standard_menu=["Chicken", "Vegetarian"])
+    session.add_all([airport1, airport2, aircraft_type])
+    session.commit()
+
+    flights = [Flight(airline_code="AA", date_time=datetime(2024, 5, 1, hour, 0, 0), duration=120, distance=600,
+                      source_airport="LAX", destination_airport="SFO", aircraft_type_id=aircraft_type.type_id,
+                      flight_menu=["Chicken"]) for hour in (12, 13, 14)]
+    session.add_all(flights)
+    session.commit()
+
+    # Back-to-back flights are fine, the ranges are half-open
+    session.add(PersonSchedule.for_flight('pilot', 1, flights[0]))
+    session.add(PersonSchedule.for_flight('pilot', 1, flights[2]))
+    session.commit()
+
+    session.add(PersonSchedule.for_flight('pilot', 1, flights[1]))
+    with pytest.raises(IntegrityError):
+        session.commit()
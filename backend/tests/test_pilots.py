@@ -3,6 +3,9 @@ from app import create_app, db
 from models import Pilot, User, AircraftType
 from config import TestConfig
 import bcrypt
+import csv
+import io
+import json
 import os
 import dotenv
 
@@ -100,6 +103,22 @@ def test_get_pilots_with_pagination(client, init_database, auth_headers):
     data = response.get_json()
     assert response.status_code == 200
     assert len(data['pilots']) == 1
+    assert client.get('/api/pilots?page=0', headers=auth_headers).get_json()['current_page'] == 1
+
+def test_get_pilots_cached_total_follows_writes(client, init_database, auth_headers):
+    total = client.get('/api/pilots?count=cached', headers=auth_headers).get_json()['total']
+    response = client.post('/api/create_pilot', headers=auth_headers, json={
+        'name': 'Alice Wonderland', 'age': 28, 'gender': 'Female', 'nationality': 'Canadian',
+        'known_languages': ['English'], 'vehicle_type_id': 1, 'allowed_range': 5000, 'seniority_level': 'junior'
+    })
+    assert response.status_code == 201
+    data = client.get('/api/pilots?count=cached&page=2', headers=auth_headers).get_json()
+    assert (data['total'], data['total_mode']) == (total + 1, 'cached')
+
+    data = client.get('/api/pilots?count=estimate', headers=auth_headers).get_json()
+    assert data['total_mode'] == 'estimate' and data['total'] >= 0
+    assert 'total' not in client.get('/api/pilots?count=none', headers=auth_headers).get_json()
+    assert client.get('/api/pilots?count=bogus', headers=auth_headers).status_code == 400
 
 def test_get_pilots_with_name_filter(client, init_database, auth_headers):
     response = client.get('/api/pilots?name=John', headers=auth_headers)
@@ -108,6 +127,30 @@ def test_get_pilots_with_name_filter(client, init_database, auth_headers):
     assert len(data['pilots']) == 1
     assert data['pilots'][0]['name'] == 'John Doe'
 
+def test_export_pilots_streams_every_filtered_row(client, init_database, auth_headers):
+    response = client.get('/api/export/pilots', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['name'] for row in rows] == ['John Doe', 'Jane Smith']
+    assert rows[0] == client.get('/api/pilots', headers=auth_headers).get_json()['pilots'][0]
+
+    response = client.get('/api/export/pilots?format=csv&name=Jane', headers=auth_headers)
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert response.mimetype == 'text/csv'
+    assert len(rows) == 1
+    assert (rows[0]['name'], json.loads(rows[0]['known_languages'])) == ('Jane Smith', ['English', 'French'])
+
+    assert client.get('/api/export/pilots?format=xml', headers=auth_headers).status_code == 400
+
+def test_get_pilots_with_fields(client, init_database, auth_headers):
+    data = client.get('/api/pilots?fields=name,aircraft_type&name=John', headers=auth_headers).get_json()
+    assert data['pilots'] == [{'name': 'John Doe', 'aircraft_type': 'Boeing 737'}]
+
+    response = client.get('/api/pilots?fields=name,salary', headers=auth_headers)
+    assert response.status_code == 400
+    assert 'salary' in response.get_json()['error']
+
 def test_get_pilots_with_age_filter(client, init_database, auth_headers):
     response = client.get('/api/pilots?min_age=40', headers=auth_headers)
     data = response.get_json()
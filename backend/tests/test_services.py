@@ -1,11 +1,25 @@
 import pytest
+import random
 from datetime import datetime, timedelta
 from unittest.mock import patch, Mock
+from sqlalchemy import insert
 from app import create_app
-from models import db, Flight, Pilot, CabinCrew, Passenger, SeatMap, Airport, AircraftType
+from models import db, Flight, Pilot, CabinCrew, Passenger, SeatMap, Airport, AircraftType, PersonSchedule, FlightSeatAssignment, CrewWorkload
 from services.availability_service import find_available_pilots, find_available_cabin_crew, find_available_passengers, scheduleIsAvailable
 from services.distance_service import calculate_distance
-from services.seat_assignment_service import seat_plan_auto
+from services.seat_assignment_service import seat_plan_auto, crew_requirements, select_roster, roster_rng, write_roster
+from services.roster_batch import create_rosters, write_rosters, FlightSlot, RosterContext
+from services.schedule_index import schedule_index, IntervalSet
+from services.season_roster import partition_flights
+from services.seat_allocator import allocate_seats, group_parties
+from services.seat_map_cache import seat_map_cache
+from services.roster_repair import repair_rosters
+from services.crew_matching import plan_horizon
+from services.workload_service import load_distribution, workload_window
+from services.count_service import CountCache
+from services.response_cache import LRUBackend, RedisBackend, LocalRedis, write_tags
+from services.json_provider import OrjsonProvider
+from services.compression import Compression
 from config import TestConfig
 
 @pytest.fixture(scope='module')
@@ -73,17 +87,37 @@ def populate_db():
         seat_map = SeatMap(id=i+1, seat_row='A', seat_number=i+1, seat_type='Economy', aircraft_type_id=1)
         db.session.add(seat_map)
 
-    for i in range(1, 4):  # Adding pilot seats
-        seat_map = SeatMap(id=11+i, seat_row='PL', seat_number=i, seat_type='pilot', aircraft_type_id=1)
+    for i, seat_role in enumerate(['senior', 'junior', 'trainee'], start=1):  # Adding pilot seats
+        seat_map = SeatMap(id=11+i, seat_row='PL', seat_number=i, seat_type='pilot', aircraft_type_id=1, seat_role=seat_role)
         db.session.add(seat_map)
 
-    for i in range(1, 13):  # Adding extra seats for testing, covering the potential seat_map_id 26
-        seat_map = SeatMap(id=14+i, seat_row='B', seat_number=i, seat_type='Economy', aircraft_type_id=1)
+    crew_roles = ['chief'] * 2 + ['regular'] * 8 + ['chef'] * 2
+    for i, seat_role in enumerate(crew_roles, start=1):  # Adding crew seats
+        seat_map = SeatMap(id=14+i, seat_row='CR', seat_number=i, seat_type='crew', aircraft_type_id=1, seat_role=seat_role)
         db.session.add(seat_map)
 
     db.session.commit()
 
 
+@pytest.fixture(scope='function')
+def batch_database(app, init_database):
+    # Lowercase seniority and attendant types, as the rostering code queries them: two people per role,
+    # flights 1, 2 and 4 overlap each other and flight 3 does not
+    for flight_number, date_time in ((2, datetime(2024, 5, 1, 13, 0, 0)), (3, datetime(2024, 5, 1, 18, 0, 0)), (4, datetime(2024, 5, 1, 12, 30, 0))):
+        db.session.add(Flight(flight_number=flight_number, airline_code='AB', date_time=date_time, duration=120, distance=1000,
+                              source_airport='XY', destination_airport='AB', aircraft_type_id=1, flight_menu=['Food', 'Drink']))
+    for pilot_id, seniority_level in zip(range(11, 15), ['senior', 'senior', 'junior', 'junior']):
+        db.session.add(Pilot(pilot_id=pilot_id, name=f'John Doe {pilot_id}', age=40, gender='Male', nationality='American',
+                             known_languages=['English'], seniority_level=seniority_level, vehicle_type_id=1, allowed_range=2000,
+                             scheduled_flights=[]))
+    for attendant_id, attendant_type in zip(range(11, 15), ['chief', 'chief', 'regular', 'regular']):
+        db.session.add(CabinCrew(attendant_id=attendant_id, name=f'Jane Doe {attendant_id}', age=30, gender='Female', nationality='Canadian',
+                                 known_languages=['English'], attendant_type=attendant_type, vehicle_type_ids=[1],
+                                 dish_recipes=[], scheduled_flights=[]))
+    db.session.commit()
+    yield db
+
+
 def test_schedule_is_available(app, init_database):
     with app.app_context():
         start_time = datetime(2024, 5, 1, 12, 0, 0)
@@ -91,12 +125,36 @@ def test_schedule_is_available(app, init_database):
         result = scheduleIsAvailable(start_time, end_time, Pilot, 1)
         assert result is True  # Updated based on your current data
 
+def test_schedule_is_available_tracks_commits(app, init_database):
+    with app.app_context():
+        start_time = datetime(2024, 5, 1, 13, 0, 0)
+        end_time = start_time + timedelta(hours=2)
+        assert scheduleIsAvailable(start_time, end_time, Pilot, 1) is True
+
+        pilot = db.session.get(Pilot, 1)
+        pilot.scheduled_flights = [1]
+        db.session.commit()
+
+        assert scheduleIsAvailable(start_time, end_time, Pilot, 1) is False
+        assert scheduleIsAvailable(start_time + timedelta(hours=1), end_time, Pilot, 1) is True
+
 def test_find_available_pilots(app, init_database):
     with app.app_context():
         result = find_available_pilots(1, 'Senior', 1)
         assert isinstance(result, list)
         assert len(result) == 1
 
+def test_find_available_pilots_skips_scheduled(app, init_database):
+    with app.app_context():
+        flight = db.session.get(Flight, 1)
+        for pilot in Pilot.query.filter(Pilot.pilot_id != 10).all():
+            pilot.scheduled_flights = [1]
+            db.session.add(PersonSchedule.for_flight('pilot', pilot.pilot_id, flight))
+        db.session.commit()
+
+        assert find_available_pilots(1, 'Senior', 1) == [10]
+        assert find_available_pilots(1, 'Senior', 2) == "Error"
+
 def test_find_available_cabin_crew(app, init_database):
     with app.app_context():
         result = find_available_cabin_crew(1, 'Chief', 1)
@@ -126,3 +184,295 @@ def test_seat_plan_auto(mock_find_available_pilots, mock_find_available_cabin_cr
         result = seat_plan_auto(1, 1)
         assert result == "Seats assigned successfully"
 
+@patch('services.seat_assignment_service.find_available_pilots')
+@patch('services.seat_assignment_service.find_available_cabin_crew')
+@patch('services.seat_assignment_service.find_available_passengers')
+def test_seat_plan_auto_dry_run_writes_nothing(mock_find_available_pilots, mock_find_available_cabin_crew, mock_find_available_passengers, app, init_database):
+    with app.app_context():
+        mock_find_available_pilots.return_value = [1]
+        mock_find_available_cabin_crew.return_value = [1]
+        mock_find_available_passengers.return_value = [1]
+
+        proposal = seat_plan_auto(1, 1, dry_run=True)
+        assert proposal["flight_number"] == 1
+        assert {"seat_map_id": 12, "seater_id": 1, "seater_type": "SeniorPilot"} in proposal["seats"]
+        assert FlightSeatAssignment.query.count() == 0
+        assert db.session.get(Pilot, 1).scheduled_flights == []
+        assert PersonSchedule.query.count() == 0
+
+def test_create_rosters_reports_each_flight(app, init_database):
+    with app.app_context():
+        results = create_rosters([1, 999])
+        assert results[0] == {"flight_number": 1, "status": "error", "message": "Not enough available senior pilots"}
+        assert results[1] == {"flight_number": 999, "status": "error", "message": "Invalid flight number"}
+
+@patch('services.seat_assignment_service.crew_requirements')
+def test_create_rosters_holds_people_across_overlapping_flights(mock_crew_requirements, app, batch_database):
+    mock_crew_requirements.return_value = {"senior_pilots": 1, "junior_pilots": 1, "trainee_pilots": 0, "chief_cabin_crews": 1,
+                                           "regular_cabin_crews": 1, "chefs": 0, "passengers": 2}
+    with app.app_context():
+        results = create_rosters([1, 2, 4, 3], seed=7)
+        assert [result["status"] for result in results] == ["created", "created", "error", "created"]
+        assert results[2]["message"] == "Not enough available senior pilots"
+        assert FlightSeatAssignment.query.filter_by(flight_id=4).count() == 0
+
+        seaters = {}
+        for assignment in FlightSeatAssignment.query.all():
+            seaters.setdefault(assignment.flight_id, set()).add((assignment.seater_type, assignment.seater_id))
+        assert len(seaters[1]) == len(seaters[2]) == len(seaters[3]) == 6
+        assert not seaters[1] & seaters[2]  # Overlapping flights never share a person
+
+        flight_times = {flight.flight_number: (flight.date_time, flight.date_time + timedelta(minutes=flight.duration)) for flight in Flight.query.all()}
+        for person in Pilot.query.all() + CabinCrew.query.all() + Passenger.query.all():
+            booked = sorted(flight_times[flight_number] for flight_number in person.scheduled_flights)
+            assert all(end <= next_start for (_, end), (next_start, _) in zip(booked, booked[1:]))
+
+def test_roster_context_skips_person_booked_outside_schedule_index(app, batch_database):
+    with app.app_context():
+        flight = db.session.get(Flight, 2)
+        assert schedule_index.is_available(Pilot, 11, flight.date_time, flight.date_time + timedelta(minutes=flight.duration))
+        # Booked as another process would: nothing reaches this process's schedule index
+        db.session.execute(insert(PersonSchedule).values(person_type='pilot', person_id=11, flight_id=2,
+                                                         during=PersonSchedule.flight_range(flight)))
+        db.session.commit()
+
+        for seed in range(5):
+            assert RosterContext().find_available_pilots(1, 'senior', 1, rng=random.Random(seed)) == [12]
+        assert RosterContext().find_available_pilots(1, 'senior', 2) == "Error"
+        db.session.commit()
+        assert not schedule_index.is_available(Pilot, 11, datetime(2024, 5, 1, 12, 0, 0), datetime(2024, 5, 1, 14, 0, 0))
+
+def test_write_rosters_keeps_rolled_back_flight_out_of_schedule_index(app, init_database):
+    with app.app_context():
+        db.session.add(Flight(flight_number=2, airline_code='AB', date_time=datetime(2024, 5, 2, 12, 0, 0),
+                              duration=120, distance=1000, source_airport='XY', destination_airport='AB',
+                              aircraft_type_id=1, flight_menu=['Food', 'Drink']))
+        db.session.commit()
+        first = (datetime(2024, 5, 1, 12, 0, 0), datetime(2024, 5, 1, 14, 0, 0))
+        second = (datetime(2024, 5, 2, 12, 0, 0), datetime(2024, 5, 2, 14, 0, 0))
+        assert schedule_index.is_available(Pilot, 1, *first)  # Loads pilots into the index
+
+        def write_one(flight_number):
+            # Pilot 1 flies flight 1; flight 2 books pilot 2 and then fails
+            if flight_number == 2:
+                assert schedule_index.is_available(Pilot, 1, *first)  # Released savepoint, chunk not committed yet
+            write_roster(db.session.get(Flight, flight_number), [], {Pilot: [flight_number]})
+            return "Seats assigned successfully" if flight_number == 1 else "Not enough available passengers"
+
+        results = write_rosters([1, 2], write_one, chunk_size=50)
+        assert [result["status"] for result in results] == ["created", "error"]
+        assert not schedule_index.is_available(Pilot, 1, *first)
+        assert schedule_index.is_available(Pilot, 2, *second)
+        assert db.session.get(Pilot, 2).scheduled_flights == []
+
+def test_snapshot_context_treats_missing_pool_as_empty():
+    # No app context: a snapshot-backed context must not fall back to the database
+    start = datetime(2024, 1, 1, 8, 0)
+    context = RosterContext(pools={('pilot', 'senior', 1): [(1, 2000)], ('passenger',): [1, 2]}, schedules={})
+    context.add_flights([FlightSlot(1, start, start + timedelta(hours=2), 500, 1)])
+    assert context.find_available_pilots(1, 'senior', 1) == [1]
+    assert context.find_available_pilots(1, 'trainee', 1) == "Error"
+    assert context.find_available_cabin_crew(1, 'chef', 1) == "Error"
+    assert context.find_available_cabin_crew(1, 'chef', 0) == []
+
+def test_partition_flights_keeps_overlapping_flights_together():
+    start = datetime(2024, 1, 1, 8, 0)
+    slots = [
+        FlightSlot(1, start, start + timedelta(hours=2), 500, 1),
+        FlightSlot(2, start + timedelta(hours=1), start + timedelta(hours=3), 500, 1),
+        FlightSlot(3, start + timedelta(hours=5), start + timedelta(hours=6), 500, 1),
+        FlightSlot(4, start, start + timedelta(hours=1), 500, 2),
+    ]
+    partitions = partition_flights(slots, 4)
+    groups = [sorted(slot.flight_number for slot in partition) for partition in partitions]
+    assert [1, 2] in groups
+    assert [3] in groups
+    assert [4] in groups
+
+def test_allocate_seats_uses_smallest_group_that_fits():
+    seat_groups = {1: [1, 2], 2: [3, 4, 5, 6], 3: [7]}
+    parties = group_parties([10, 11, 12, 13, 14], {10: [11, 12], 11: [10], 12: [10]})
+    assert parties == [[10, 11, 12], [13], [14]]
+
+    assigned_seats = allocate_seats(parties, seat_groups)
+    assert sorted(assigned_seats[p] for p in (10, 11, 12)) == [3, 4, 5]
+    assert sorted(assigned_seats.values()) == [3, 4, 5, 6, 7]  # singles fill the one-seat gaps, the pair stays free
+
+def test_seat_map_cache_reloads_after_seat_map_commit(app, init_database):
+    with app.app_context():
+        assert seat_map_cache.layout(1).seats_for_role('senior') == (12,)
+        assert seat_map_cache.seat(12).seat_row == 'PL'
+
+        db.session.add(SeatMap(id=40, seat_row='PL', seat_number=4, seat_type='pilot', aircraft_type_id=1))
+        db.session.commit()
+        assert seat_map_cache.layout(1).seat_ids('pilot') == (12, 13, 14, 40)
+        assert seat_map_cache.layout(1).seats_for_role('chef') == (25, 26)
+
+def test_seat_map_cache_reloads_on_unknown_seat(app, init_database):
+    with app.app_context():
+        assert seat_map_cache.seat(41) is None
+        seats = seat_map_cache._seats
+        assert seat_map_cache.seat(42) is None
+        assert seat_map_cache._seats is seats  # Nothing written since the load, so no reload
+        # Written without the ORM flush, as another process would, so nothing invalidates the cache
+        db.session.execute(insert(SeatMap).values(id=41, seat_row='B', seat_number=1, seat_type='Economy', aircraft_type_id=1))
+        db.session.commit()
+        assert seat_map_cache.seat(41).seat_row == 'B'
+        assert 41 in seat_map_cache.layout(1).seat_ids('Economy')
+
+def test_seeded_roster_is_reproducible():
+    start = datetime(2024, 1, 1, 8, 0)
+    pools = {('passenger',): list(range(1, 501))}
+    for pilot_type in ('senior', 'junior', 'trainee'):
+        pools[('pilot', pilot_type, 1)] = [(i, 2000) for i in range(1, 51)]
+    for cabin_crew_type in ('chief', 'regular', 'chef'):
+        pools[('cabin_crew', cabin_crew_type, 1)] = list(range(1, 51))
+
+    def roster(seed):
+        # Snapshot mode, no database involved
+        context = RosterContext(pools=pools, schedules={})
+        context.add_flights([FlightSlot(1, start, start + timedelta(hours=2), 500, 1)])
+        rng = roster_rng(seed, 1)
+        return select_roster(1, crew_requirements(1, rng), context.find_available_pilots,
+                             context.find_available_cabin_crew, context.find_available_passengers, rng)
+
+    assert roster(7) == roster(7)
+    assert roster(7) != roster(8)
+
+@patch('services.roster_repair.find_available_pilots')
+@patch('services.seat_assignment_service.find_available_pilots')
+@patch('services.seat_assignment_service.find_available_cabin_crew')
+@patch('services.seat_assignment_service.find_available_passengers')
+def test_repair_rosters_replaces_only_the_absent_pilot(mock_find_available_passengers, mock_find_available_cabin_crew, mock_find_available_pilots, mock_find_replacement_pilots, app, init_database):
+    with app.app_context():
+        mock_find_available_pilots.return_value = [1]
+        mock_find_available_cabin_crew.return_value = [1]
+        mock_find_available_passengers.return_value = [1]
+        mock_find_replacement_pilots.return_value = [2]
+        assert seat_plan_auto(1, 1) == "Seats assigned successfully"
+
+        results = repair_rosters(Pilot, 1, datetime(2024, 5, 1, 0, 0), datetime(2024, 5, 2, 0, 0))
+        assert [result["status"] for result in results] == ["repaired"]
+        assert FlightSeatAssignment.query.filter_by(seat_map_id=12).one().seater_id == 2
+        assert FlightSeatAssignment.query.filter_by(seat_map_id=15).one().seater_id == 1  # cabin crew untouched
+        assert db.session.get(Pilot, 1).scheduled_flights == []
+        assert db.session.get(Pilot, 2).scheduled_flights == [1]
+        assert PersonSchedule.query.filter_by(person_type='pilot').one().person_id == 2
+
+def test_plan_horizon_keeps_long_range_pilot_for_long_haul():
+    # Pilot 2 is the only senior pilot allowed on flight 3; it can fly flight 3 only if it takes flight 1, not flight 2
+    start = datetime(2024, 1, 1, 0, 0)
+    slots = [
+        FlightSlot(1, start, start + timedelta(hours=10), 500, 1),
+        FlightSlot(2, start + timedelta(hours=5), start + timedelta(hours=15), 500, 1),
+        FlightSlot(3, start + timedelta(hours=12), start + timedelta(hours=20), 3000, 1),
+    ]
+    pools = {('passenger',): list(range(1, 501)), ('pilot', 'senior', 1): [(1, 1000), (2, 5000)]}
+    for pilot_type in ('junior', 'trainee'):
+        pools[('pilot', pilot_type, 1)] = [(i, 5000) for i in range(10, 60)]
+    for cabin_crew_type in ('chief', 'regular', 'chef'):
+        pools[('cabin_crew', cabin_crew_type, 1)] = list(range(1, 60))
+
+    for seed in range(5):
+        plans, unfilled = plan_horizon(slots, pools, {}, seed)
+        assert [plans[flight_number]["senior_pilots"] for flight_number in (1, 2, 3)] == [[2], [1], [2]]
+        assert unfilled == []
+
+def test_plan_horizon_gives_back_crew_of_flight_without_passengers():
+    # Every passenger is busy during flight 1, so it fails after its crew is matched; flight 3, in a later clique,
+    # still overlaps flight 1 and needs the only senior pilot
+    start = datetime(2024, 1, 1, 0, 0)
+    slots = [
+        FlightSlot(1, start, start + timedelta(hours=10), 500, 1),
+        FlightSlot(2, start + timedelta(hours=3), start + timedelta(hours=4), 500, 2),
+        FlightSlot(3, start + timedelta(hours=9, minutes=30), start + timedelta(hours=12), 500, 1),
+    ]
+    pools = {('passenger',): list(range(1, 501)), ('pilot', 'senior', 1): [(1, 5000)], ('pilot', 'senior', 2): [(2, 5000)]}
+    for vehicle_type_id, first_id in ((1, 10), (2, 100)):
+        for pilot_type in ('junior', 'trainee'):
+            pools[('pilot', pilot_type, vehicle_type_id)] = [(i, 5000) for i in range(first_id, first_id + 50)]
+        for cabin_crew_type in ('chief', 'regular', 'chef'):
+            pools[('cabin_crew', cabin_crew_type, vehicle_type_id)] = list(range(first_id, first_id + 50))
+    schedules = {}
+    for passenger_id in pools[('passenger',)]:
+        schedules[(Passenger, passenger_id)] = IntervalSet()
+        schedules[(Passenger, passenger_id)].insert(start + timedelta(hours=1), start + timedelta(hours=2), 99)
+
+    plans, unfilled = plan_horizon(slots, pools, schedules, 1)
+    assert plans[1] == "Not enough available passengers"
+    assert plans[3]["senior_pilots"] == [1]
+
+@patch('services.seat_assignment_service.find_available_pilots')
+@patch('services.seat_assignment_service.find_available_cabin_crew')
+@patch('services.seat_assignment_service.find_available_passengers')
+def test_workload_counters_drive_least_loaded_selection(mock_find_available_passengers, mock_find_available_cabin_crew, mock_find_available_pilots, app, init_database):
+    with app.app_context():
+        mock_find_available_pilots.return_value = [1]
+        mock_find_available_cabin_crew.return_value = [1]
+        mock_find_available_passengers.return_value = [1]
+        assert seat_plan_auto(1, 1) == "Seats assigned successfully"
+
+        workload = CrewWorkload.query.filter_by(person_type='pilot', person_id=1).one()
+        assert (workload.flights, workload.minutes) == (1, 120)
+        distribution = load_distribution(Pilot, *workload_window(datetime(2024, 5, 1, 12, 0)))
+        assert (distribution["people"], distribution["idle"]) == (10, 9)
+        assert distribution["most_loaded"] == [{"person_id": 1, "flights": 1, "minutes": 120}]
+
+        db.session.add(CrewWorkload(person_type='pilot', person_id=2, period_start=workload.period_start, flights=1, minutes=60))
+        db.session.add(Flight(flight_number=2, airline_code='AB', date_time=datetime(2024, 5, 2, 12, 0, 0), duration=60,
+                              distance=1000, source_airport='XY', destination_airport='AB', aircraft_type_id=1, flight_menu=[]))
+        db.session.commit()
+        app.config['CREW_SELECTION_POLICY'] = 'least_loaded'
+        try:
+            assert find_available_pilots(2, 'Senior', 9) == [3, 4, 5, 6, 7, 8, 9, 10, 2]  # pilot 1 flew most
+        finally:
+            app.config.pop('CREW_SELECTION_POLICY')
+
+def test_response_cache_backends_drop_entries_by_tag():
+    assert write_tags({'pilot': frozenset({'update'}), 'flight': frozenset({'insert'})}) == {'pilot', 'flight', 'flight:rows'}
+    for backend in (LRUBackend(max_entries=2), RedisBackend(LocalRedis())):
+        backend.set('flights?page=1', {"body": "[1]"}, 60, ['flight', 'airport'])
+        backend.set('details?', {"body": "{}"}, 60, ['pilot:rows'])
+        backend.invalidate_tags({'pilot', 'airport'})
+        assert backend.get('flights?page=1') is None
+        assert backend.get('details?') == {"body": "{}"}
+
+    lru = LRUBackend(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        lru.set(key, key, 60, ['flight'])
+    assert (lru.get('a'), lru.get('b'), lru.get('c')) == (None, 'b', 'c')
+
+def test_count_cache_is_bounded_and_drops_expired_counts():
+    cache = CountCache(max_entries=2)
+    cache.put(('pilots', 'a'), 1, {'pilot'}, 60)
+    cache.put(('pilots', 'b'), 2, {'pilot'}, 60)
+    assert cache.get(('pilots', 'a')) == 1  # Now the most recently used
+    cache.put(('pilots', 'c'), 3, {'pilot'}, 60)
+    assert (cache.get(('pilots', 'a')), cache.get(('pilots', 'b')), cache.get(('pilots', 'c'))) == (1, None, 3)
+
+    cache.put(('pilots', 'd'), 4, {'pilot'}, 0)
+    assert cache.get(('pilots', 'd')) is None
+    assert ('pilots', 'd') not in cache._entries
+
+def test_orjson_provider_and_negotiated_compression():
+    import gzip
+    from flask import Flask, jsonify
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    Compression().init_app(app)
+
+    @app.route('/flights')
+    def flights():
+        response = jsonify([{"flight_number": n, "date_time": datetime(2024, 5, 1, 12, 0)} for n in range(100)])
+        response.set_etag('v1')
+        return response
+
+    client = app.test_client()
+    plain = client.get('/flights')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_json()[0] == {"date_time": "2024-05-01T12:00:00", "flight_number": 0}
+
+    compressed = client.get('/flights', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] == 'W/"v1"'
+    assert gzip.decompress(compressed.data) == plain.data
@@ -16,6 +16,8 @@ for (let hour = 0; hour <= 23; hour++) {
   }
 }
 
+const ROSTER_JOB_POLL_MS = 1000;
+
 const FlightCreationForm = () => {
   const [date, setDate] = useState<any>("");
   const [hour, setHour] = useState<any>("");
@@ -130,6 +132,30 @@ const FlightCreationForm = () => {
     }, 3000);
   };
 
+  const waitForRosterJob = async (statusUrl: string) => {
+    // Polls the background roster job until it has finished or failed; null when it cannot be read
+    try {
+      while (true) {
+        const response = await fetchWithAuth(
+          `http://127.0.0.1:5000${statusUrl}`,
+        );
+        if (!response.ok) {
+          return null;
+        }
+        const job = await response.json();
+        if (job.status === "finished" || job.status === "failed") {
+          return job;
+        }
+        await new Promise((resolve) =>
+          setTimeout(resolve, ROSTER_JOB_POLL_MS),
+        );
+      }
+    } catch (error) {
+      console.error("Failed to fetch roster job", error);
+      return null;
+    }
+  };
+
   const createFlight = async () => {
     if (date && hour && destinationAirport && sourceAirport && aircraftType) {
       const selectedDate = new Date(date);
@@ -161,12 +187,11 @@ const FlightCreationForm = () => {
             destination,
             vehicle_type_id,
             create_roster: "Yes",
+            async: true,
           }),
         },
       );
 
-      setIsCreating(false);
-
       if (response.ok) {
         setDate("");
         setHour(null);
@@ -177,10 +202,26 @@ const FlightCreationForm = () => {
         setSelectedCitySource(null);
         setSelectedCountryDestination(null);
         setSelectedCityDestination(null);
-        addAlert("success", "Flight successfully created");
+        if (response.status === 202) {
+          // The flight exists, its roster is built by a background job
+          const { status_url } = await response.json();
+          const job = await waitForRosterJob(status_url);
+          const result = job?.results?.[0];
+          if (job?.status === "finished" && result?.status === "created") {
+            addAlert("success", "Flight successfully created");
+          } else {
+            addAlert(
+              "error",
+              `Flight created, but its roster failed: ${result?.message ?? job?.error ?? "job status unavailable"}`,
+            );
+          }
+        } else {
+          addAlert("success", "Flight successfully created");
+        }
       } else {
         addAlert("error", "Failed to create flight");
       }
+      setIsCreating(false);
     } else {
       addAlert("error", "All fields must be filled");
     }
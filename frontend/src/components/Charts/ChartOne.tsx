@@ -133,7 +133,7 @@ const ChartOne: React.FC = () => {
     const fetchData = async () => {
       try {
         const response = await fetchWithAuth(
-          "http://127.0.0.1:5000/api/flights?per_page=1000",
+          "http://127.0.0.1:5000/api/flights?per_page=1000&fields=date_time",
         );
         const data = await response.json();
         const flights = data.flights;
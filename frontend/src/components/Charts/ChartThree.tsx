@@ -60,7 +60,7 @@ const ChartThree: React.FC = () => {
     const fetchData = async () => {
       try {
         const response = await fetchWithAuth(
-          "http://127.0.0.1:5000/api/flights?per_page=1000",
+          "http://127.0.0.1:5000/api/flights?per_page=1000&fields=aircraft_type",
         );
         const flightsData = await response.json();
         const flights = flightsData.flights;
@@ -87,6 +87,8 @@ const CrewTable = () => {
       try {
         let url = new URL("http://127.0.0.1:5000/api/cabin-crew");
         let params = new URLSearchParams();
+        // Only the columns the table shows
+        params.append("fields", "attendant_id,name,age,gender,attendant_type,nationality,known_languages,aircraft_types");
 
         if (attendantId) params.append("attendant_id", attendantId.toString());
         if (name) params.append("name", name);
@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import Select from "react-select";
 import VirtualizedSelect from "./VirtualizedSelect";
 import Link from "next/link";
@@ -33,6 +33,8 @@ const FlightTable = () => {
   const [currentPage, setCurrentPage] = useState<number>(1);
   const [totalPages, setTotalPages] = useState<number>(1);
   const [totalCount, setTotalCount] = useState<number>(0);
+  // Cursor of each page reached with "next", so paging forward never makes the API skip rows
+  const pageCursors = useRef<Record<number, string>>({});
 
   const [airports, setAirports] = useState<any[]>([]);
 
@@ -132,6 +134,11 @@ const FlightTable = () => {
     try {
       let url = new URL("http://127.0.0.1:5000/api/flights");
       let params = new URLSearchParams();
+      // Only the columns the table shows
+      params.append(
+        "fields",
+        "flight_number,date_time,distance,source_airport,source_country,source_city,destination_airport,destination_country,destination_city,aircraft_type,status",
+      );
 
       if (startDate) params.append("min_date_time", startDate);
       if (endDate) params.append("max_date_time", endDate);
@@ -162,14 +169,22 @@ const FlightTable = () => {
       if (selectedAirportDestination)
         params.append("destination_airport", selectedAirportDestination);
       params.append("page", currentPage.toString());
+      const cursor = pageCursors.current[currentPage];
+      if (cursor) params.append("cursor", cursor);
+      // The total is counted once per filter, on the first page, and served from the count cache when fresh
+      if (currentPage === 1) params.append("count", "cached");
 
       url.search = params.toString();
 
       const response = await fetchWithAuth(url.toString());
       const data = await response.json();
       setFlights(data.flights);
-      setTotalPages(data.pages);
-      setTotalCount(data.total);
+      if (data.next_cursor)
+        pageCursors.current[currentPage + 1] = data.next_cursor;
+      if (data.total !== undefined) {
+        setTotalPages(data.pages);
+        setTotalCount(data.total);
+      }
     } catch (error) {
       console.error("Error:", error);
     }
@@ -180,6 +195,7 @@ const FlightTable = () => {
   }, [filterApplied, currentPage]);
 
   const handleFilterApply = () => {
+    pageCursors.current = {};
     setCurrentPage(1); // Reset to the first page
     setFilterApplied((prevValue) => prevValue + 1);
   };
@@ -72,6 +72,8 @@ const PassengerTable = () => {
       try {
         let url = new URL("http://127.0.0.1:5000/api/passengers");
         let params = new URLSearchParams();
+        // Only the columns the table shows
+        params.append("fields", "passenger_id,name,age,gender,nationality");
 
         if (passengerId) params.append("passenger_id", passengerId.toString());
         if (name) params.append("name", name);
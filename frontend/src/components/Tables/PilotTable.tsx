@@ -91,6 +91,8 @@ const PilotTable = () => {
       try {
         let url = new URL("http://127.0.0.1:5000/api/pilots");
         let params = new URLSearchParams();
+        // Only the columns the table shows
+        params.append("fields", "pilot_id,name,age,gender,seniority_level,allowed_range,nationality,known_languages,aircraft_type");
 
         if (pilotId) params.append("pilot_id", pilotId.toString());
         if (name) params.append("name", name);